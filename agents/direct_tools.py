@@ -0,0 +1,295 @@
+"""
+direct_tools.py — Single-tool intents answered without the ReAct loop
+=====================================================================
+"Any offers?", "subscribable products" or "my wallet balance" map onto one
+read-only tool with no arguments (or one trivially extracted argument, or
+the session user_id). Going through an agent costs two LLM calls on top of
+the router: one to pick the tool, one to turn its rows into a table.
+
+The router's structured output may instead name one of DIRECT_TOOLS plus
+its arguments. The graph's direct_tool node then runs the tool and renders
+the rows with a fixed template, so the router call is the only LLM call of
+the turn. Messages the keyword fast path routes (agents/router_rules.py)
+never reach the router LLM; match() maps them onto a tool through each
+tool's `intents` instead — exactly one tool's intents must match a short
+message with no why / not / action words — so those turns make no LLM call
+at all. Safety rails:
+
+  • only the read-only tools listed here, and only for the category the
+    router chose; write tools (add / cancel vacation …) always go to an agent
+  • user_id is never taken from the LLM — it is injected from the session
+  • unknown arguments are dropped; a missing required one cancels the shortcut
+  • a tool error ("Database connection failed.", "Query error: …") falls back
+    to the category's agent
+
+The tool call, its result and the rendered answer are appended to the thread
+like an agent turn, so follow-up questions see the same history.
+"""
+
+import csv
+import re
+import uuid
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+from langchain_core.messages import AIMessage, ToolMessage
+from langchain_core.runnables import RunnableConfig, RunnableLambda
+from langchain_core.tools import BaseTool
+
+from core.metrics import REGISTRY, Counter
+from tools.product_tools import (
+    get_active_offers, get_product_catalog, get_product_details, get_subscribable_products,
+)
+from tools.subscription_tools import check_active_subscriptions, get_upcoming_vacations
+from tools.wallet_tools import check_wallet_balance, get_running_schemes
+
+# outcome="answered" → rendered by the template | "fallback" → handed to the agent
+DIRECT_TOOL_CALLS = REGISTRY.register(Counter(
+    "cso_direct_tool_calls_total", "Router-selected tools run without an agent.", ("tool", "outcome")))
+
+# Larger results are cut in the rendered table (the full result stays in the ToolMessage)
+_MAX_ROWS = 50
+
+_TOON_HEADER = re.compile(r"^\w+\[(\d+)\]\{(.*)\}:$")
+_ERROR_PREFIXES = ("Database connection failed", "Query error", "Error")
+
+
+@dataclass(frozen=True)
+class DirectTool:
+    tool: BaseTool
+    category: str                                   # router category it may shortcut
+    title: str                                      # line above the table (str.format: args, first=row)
+    columns: Tuple[Tuple[str, str], ...] = ()       # (key, label); empty → every column
+    args: Tuple[str, ...] = ()                      # arguments the router may fill in
+    needs_user: bool = False                        # user_id injected from the session
+    empty: str = ""                                 # answer for a "no rows" result
+    intents: Tuple[str, ...] = ()                   # keyword fast-path regexes (argument-free lookups)
+
+    @property
+    def name(self) -> str:
+        return self.tool.name
+
+
+DIRECT_TOOLS: Dict[str, DirectTool] = {t.name: t for t in (
+    DirectTool(
+        get_active_offers, "product", "These offers are running right now:",
+        columns=(("offer_type", "Offer"), ("description", "Details"), ("min_qty", "Min Qty"),
+                 ("max_qty", "Max Qty"), ("free_product", "Free Product"), ("free_variant", "Variant"),
+                 ("free_qty", "Free Qty"), ("valid_from", "Valid From"), ("valid_to", "Valid To")),
+        empty="There are no active offers at the moment.",
+        intents=(r"\boffers?\b", r"\bpromotions?\b", r"\bdiscounts?\b"),
+    ),
+    DirectTool(
+        get_subscribable_products, "product", "These products can be added to a subscription plan:",
+        columns=(("product_name", "Product"), ("variant_name", "Variant"), ("variant_size", "Size"),
+                 ("unit", "Unit"), ("rate", "Rate (₹)"), ("mrp", "MRP (₹)")),
+        empty="No products are available for subscription right now.",
+        intents=(r"\bsubscrib(e|able)\b",),
+    ),
+    DirectTool(
+        get_product_catalog, "product", "Here is our product catalog:",
+        columns=(("product_name", "Product"), ("variant_name", "Variant"), ("variant_size", "Size"),
+                 ("unit", "Unit"), ("mrp", "MRP (₹)"), ("customer_price", "Price (₹)"),
+                 ("offer_price", "Offer Price (₹)")),
+        args=("search_name",),
+        empty="No products found matching your request.",
+        intents=(r"\bcatalog(ue)?\b", r"\bkya (kya )?milta\b", r"\bwhat do you sell\b"),
+    ),
+    DirectTool(
+        get_product_details, "product", "Here are the details for **{product_name}**:",
+        columns=(("variant_name", "Variant"), ("variant_size", "Size"), ("unit", "Unit"),
+                 ("container_name", "Container"), ("mrp", "MRP (₹)"), ("customer_price", "Price (₹)"),
+                 ("offer_price", "Offer Price (₹)"), ("gst", "GST %")),
+        args=("product_name",),
+        empty="I couldn't find a product matching **{product_name}**.",
+    ),
+    DirectTool(
+        check_wallet_balance, "wallet", "Your wallet balance is **₹{first[balance]}**. Latest entries:",
+        columns=(("posting_date", "Date"), ("particulars", "Particulars"), ("credit", "Credit (₹)"),
+                 ("debit", "Debit (₹)"), ("balance", "Balance (₹)")),
+        needs_user=True,
+        empty="No wallet transactions were found on your account yet.",
+        intents=(r"\bbalance\b",),
+    ),
+    DirectTool(
+        get_running_schemes, "wallet", "These wallet schemes are running right now:",
+        empty="There are no wallet schemes running at the moment.",
+        intents=(r"\bcashback\b", r"\bschemes?\b"),
+    ),
+    DirectTool(
+        check_active_subscriptions, "subscription", "Your active subscriptions:",
+        columns=(("product_name", "Product"), ("product_variant_name", "Variant"), ("plan_type", "Plan Type"),
+                 ("quantity", "Quantity"), ("rate", "Rate (₹)"), ("start_date", "Start Date"),
+                 ("end_date", "End Date")),
+        needs_user=True,
+        empty="You have no active subscriptions.",
+        intents=(r"\b(my|active|mere|meri) subscriptions?\b",),
+    ),
+    DirectTool(
+        get_upcoming_vacations, "subscription", "Your upcoming vacation days (no delivery on these dates):",
+        columns=(("vacation_date", "Vacation Date"), ("created_at", "Marked On")),
+        needs_user=True,
+        empty="You have no upcoming vacation days marked.",
+        intents=(r"\bupcoming vacations?\b", r"\bnext vacation\b"),
+    ),
+)}
+
+_INTENTS = {name: re.compile("|".join(f"(?:{p})" for p in spec.intents))
+            for name, spec in DIRECT_TOOLS.items() if spec.intents}
+
+# Keyword intents only stand in for the LLM on short lookups
+_INTENT_MAX_WORDS = 8
+# Diagnoses, complaints and actions need the agent even when a lookup's keywords match
+_NEEDS_AGENT = re.compile(
+    r"\b(why|kyun|kyon|how (do|can|to)|not|nahi|didn'?t|wasn'?t|wrong|problem|issue|"
+    r"add|mark|cancel|change|stop|pause|apply|applied)\b"
+)
+
+
+def router_prompt_section() -> str:
+    """DIRECT TOOLS block appended to the router system prompt."""
+    lines = [
+        "## DIRECT TOOLS (optional)",
+        "If the message is answered COMPLETELY by ONE of these read-only lookups, set `tool` to its name",
+        "and fill `tool_args` (only the arguments listed). Otherwise leave `tool` empty.",
+        "Never set a tool for actions, diagnoses, comparisons or questions that need reasoning.",
+    ]
+    for spec in DIRECT_TOOLS.values():
+        args = ", ".join(spec.args) if spec.args else "no arguments"
+        summary = (spec.tool.description or "").strip().splitlines()[0].rstrip(" —:")
+        lines.append(f"- {spec.name} (category={spec.category}; {args}) — {summary}")
+    return "\n".join(lines)
+
+
+def resolve(name: Optional[str], args: Optional[Dict[str, Any]], category: str,
+            user_id: Optional[int]) -> Optional[Dict[str, Any]]:
+    """Validated {"name", "args"} for the router's tool choice, or None to use the agent."""
+    spec = DIRECT_TOOLS.get((name or "").strip())
+    if spec is None or spec.category != category:
+        return None
+    call_args = {k: v for k, v in (args or {}).items() if k in spec.args and v not in (None, "")}
+    required = set(spec.tool.get_input_schema().model_json_schema().get("required", ())) - {"user_id"}
+    if not required <= set(call_args):
+        return None
+    if spec.needs_user:
+        if user_id is None:
+            return None
+        call_args["user_id"] = user_id
+    return {"name": spec.name, "args": call_args}
+
+
+def match(text: str, category: str, user_id: Optional[int]) -> Optional[Dict[str, Any]]:
+    """Direct tool for a keyword-routed message ({"name", "args"}), or None to use the agent."""
+    msg = " ".join((text or "").lower().replace("’", "'").split())
+    if not msg or len(msg.split()) > _INTENT_MAX_WORDS or _NEEDS_AGENT.search(msg):
+        return None
+    names = [name for name, regex in _INTENTS.items()
+             if DIRECT_TOOLS[name].category == category and regex.search(msg)]
+    return resolve(names[0], {}, category, user_id) if len(names) == 1 else None
+
+
+# ---------------------------------------------------------------------------
+# Rendering
+# ---------------------------------------------------------------------------
+
+def _rows(output: Any) -> Optional[List[Dict[str, Any]]]:
+    """Rows of a tool result (list of dicts or TOON text); None for plain messages."""
+    if isinstance(output, list) and output and isinstance(output[0], dict):
+        return output
+    if not isinstance(output, str):
+        return None
+    lines = output.strip().splitlines()
+    match = _TOON_HEADER.match(lines[0]) if lines else None
+    if not match:
+        return None
+    keys = match.group(2).split(",")
+    rows = []
+    for values in csv.reader(lines[1:]):
+        rows.append({k: ("" if v == "null" else v) for k, v in zip(keys, values)})
+    return rows
+
+
+def _cell(value: Any) -> str:
+    return str(value if value is not None else "").replace("|", "\\|").replace("\n", " ")
+
+
+def _table(rows: List[Dict[str, Any]], columns: Tuple[Tuple[str, str], ...]) -> str:
+    present = {k for row in rows for k in row}
+    columns = [(k, label) for k, label in columns if k in present] or [
+        (k, k.replace("_", " ").title()) for k in rows[0]]
+    lines = [
+        "| " + " | ".join(label for _, label in columns) + " |",
+        "|" + "|".join("---" for _ in columns) + "|",
+    ]
+    for row in rows[:_MAX_ROWS]:
+        lines.append("| " + " | ".join(_cell(row.get(k)) for k, _ in columns) + " |")
+    if len(rows) > _MAX_ROWS:
+        lines.append(f"\n…and {len(rows) - _MAX_ROWS} more.")
+    return "\n".join(lines)
+
+
+def render(spec: DirectTool, args: Dict[str, Any], output: Any) -> Optional[str]:
+    """Markdown answer for a tool result; None when the result is an error (→ agent)."""
+    rows = _rows(output)
+    if rows:
+        try:
+            title = spec.title.format(**args, first=rows[0])
+        except (KeyError, IndexError):
+            title = spec.title.split("{")[0].strip() or spec.name
+        return f"{title}\n\n{_table(rows, spec.columns)}"
+    text = str(output or "").strip()
+    if text.startswith(_ERROR_PREFIXES):
+        return None
+    if spec.empty:
+        return spec.empty.format(**args)
+    return text
+
+
+# ---------------------------------------------------------------------------
+# Graph node
+# ---------------------------------------------------------------------------
+
+def _update(call: Dict[str, Any], output: Any) -> dict:
+    spec = DIRECT_TOOLS[call["name"]]
+    answer = render(spec, call["args"], output)
+    if answer is None:
+        DIRECT_TOOL_CALLS.inc(tool=spec.name, outcome="fallback")
+        print(f"[DirectTool] {spec.name} failed, handing over to the agent: {str(output)[:200]}")
+        return {"direct_tool": None}
+    DIRECT_TOOL_CALLS.inc(tool=spec.name, outcome="answered")
+    call_id = f"call_{uuid.uuid4().hex[:24]}"
+    return {
+        "direct_tool": None,
+        "messages": [
+            AIMessage(content="", tool_calls=[{"name": spec.name, "args": call["args"], "id": call_id}]),
+            ToolMessage(content=str(output), tool_call_id=call_id, name=spec.name),
+            AIMessage(content=answer),
+        ],
+    }
+
+
+def _direct_tool(state, config: RunnableConfig):
+    call = state["direct_tool"]
+    try:
+        output = DIRECT_TOOLS[call["name"]].tool.invoke(call["args"], config=config)
+    except Exception as e:
+        output = f"Error: {e}"
+    return _update(call, output)
+
+
+async def _adirect_tool(state, config: RunnableConfig):
+    call = state["direct_tool"]
+    try:
+        output = await DIRECT_TOOLS[call["name"]].tool.ainvoke(call["args"], config=config)
+    except Exception as e:
+        output = f"Error: {e}"
+    return _update(call, output)
+
+
+direct_tool_node = RunnableLambda(_direct_tool, afunc=_adirect_tool, name="direct_tool")
+
+
+def answered(state) -> bool:
+    """True once the direct_tool node has appended its answer (vs handed over to the agent)."""
+    messages = state.get("messages") or []
+    return bool(messages) and isinstance(messages[-1], AIMessage) and not messages[-1].tool_calls
@@ -1,21 +1,26 @@
 # agents/escalation.py
-from core.llm_setup import get_llm
+from core.escalation_summary import submit
 from core.state import SupportState
 from langchain_core.messages import AIMessage
+from langchain_core.runnables import RunnableConfig, RunnableLambda
+
+ESCALATION_MESSAGE = "I have escalated this ticket to a human administrator. Please hold."
+
+
+def _human_escalation(state: SupportState, config: RunnableConfig):
+    """
+    Alerts the user that the ticket is with a human and ends the run.
+    The summary is written back to the thread later by the background worker
+    (core/escalation_summary.py); until then the router's summary stands.
+    """
+    thread_id = (config.get("configurable") or {}).get("thread_id")
+    if not submit(thread_id, state["messages"], state.get("history_summary", "")):
+        print(f"[Escalation] No summary worker for thread {thread_id}, keeping the router summary")
 
-def human_escalation_node(state: SupportState):
-    """Summarizes the conversation and pauses the graph execution."""
-    llm = get_llm(temperature=0)
-    
-    # We ask the LLM to summarize the entire state['messages'] array
-    prompt = f"Summarize the user's issue and why the agents failed to resolve it:\n{state['messages']}"
-    summary = llm.invoke(prompt)
-    
-    # Alert the user that the system is paused
-    alert_msg = AIMessage(content="I have escalated this ticket to a human administrator. Please hold.")
-    
     return {
-        "escalation_summary": summary.content,
         "needs_escalation": True,
-        "messages": [alert_msg]
-    }
\ No newline at end of file
+        "messages": [AIMessage(content=ESCALATION_MESSAGE)]
+    }
+
+
+human_escalation_node = RunnableLambda(_human_escalation, name="human_escalation")
@@ -0,0 +1,131 @@
+"""
+intent_classifier.py — Local embedding router (ROUTER_MODE=embedding)
+=====================================================================
+Classifies a customer message without any network LLM call: the message is
+embedded with the configured embedding model (core.rag_setup — a local
+HuggingFace model by default) and compared with a labelled set of English
+and Hinglish example utterances.
+
+  knn       (default) majority vote of the ROUTER_EMBEDDING_K most similar
+            examples, weighted by cosine similarity
+  centroid  nearest per-category mean vector
+
+The result has the same fields as the LLM router's TicketClassification, and
+the prompt's legal-keyword rule still sets needs_escalation. Routing takes a
+few milliseconds and no longer depends on Groq being up.
+
+Extend EXAMPLES (or pass your own to IntentClassifier) when a category is
+misrouted — every example is embedded once, on first use.
+"""
+
+import threading
+from collections import defaultdict
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+from agents.router_rules import mentions_escalation
+
+# category → example utterances (mirrors the router prompt's ROUTING RULES)
+EXAMPLES: Dict[str, Sequence[str]] = {
+    "order": (
+        "show my recent orders", "where is my order", "mera order kab aayega",
+        "track my order", "order status of my last order", "approved orders dikhao",
+        "why was my order cancelled", "order cancel kyun hua", "delivered orders",
+        "aaj kitna sale hua", "total revenue this month", "is mahine ka revenue",
+        "how much milk was sold today", "top selling products", "orders by route",
+        "orders dispatched by vehicle", "outstanding amount on my orders",
+        "failed deliveries yesterday", "order details for order code", "average order value",
+    ),
+    "subscription": (
+        "pause my subscription", "mere subscription ka status", "cancel my milk subscription",
+        "change my plan to alternate day", "mark vacation for tomorrow", "chhutti mark karo",
+        "vacation cancel karo", "kal delivery mat karo", "skip milk delivery on 10th march",
+        "I won't be home tomorrow", "upcoming vacations dikhao", "is mahine ki vacations",
+        "my daily milk did not arrive today", "not available for delivery next week",
+    ),
+    "product": (
+        "what products do you have", "kya kya milta hai", "milk ka rate kya hai",
+        "price of toned milk", "is paneer available", "paneer available hai",
+        "do you sell ghee", "koi offer chal raha hai", "any offers today",
+        "free milk offer kya hai", "which products can I subscribe to",
+        "daily delivery ke liye kya le sakte hain", "full cream milk ki detail batao",
+        "featured products dikhao", "what sizes does curd come in", "mrp of butter",
+    ),
+    "wallet": (
+        "mera wallet balance", "what is my wallet balance", "recharge my wallet",
+        "wallet recharge kaise kare", "cashback kab milega", "show my wallet ledger",
+        "which payment modes are accepted", "money deducted from wallet",
+    ),
+    "general": (
+        "hi", "hello", "thanks", "bye", "good morning", "how can I contact customer care",
+        "what is your refund policy", "company policy on returns", "who are you",
+        "helpline number", "what are your working hours",
+    ),
+}
+
+
+class IntentClassifier:
+    """k-NN / nearest-centroid classifier over embedded example utterances."""
+
+    def __init__(self, embedder=None, examples: Dict[str, Sequence[str]] = None,
+                 k: int = 5, method: str = "knn"):
+        if method not in ("knn", "centroid"):
+            raise ValueError(f"Unknown ROUTER_EMBEDDING_METHOD '{method}'. Valid: knn, centroid")
+        self._embedder = embedder
+        self.examples = examples or EXAMPLES
+        self.k = max(1, k)
+        self.method = method
+        self._matrix = None                       # (n_examples, dim), unit rows
+        self._labels: List[str] = []
+        self._centroids: Dict[str, np.ndarray] = {}
+        self._fit_lock = threading.Lock()
+
+    def _embed(self, texts: List[str]) -> np.ndarray:
+        if self._embedder is None:
+            from core.rag_setup import get_embedding_model
+            self._embedder = get_embedding_model()
+        vectors = np.asarray(self._embedder.embed_documents(texts), dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.where(norms == 0, 1.0, norms)
+
+    def fit(self) -> "IntentClassifier":
+        """Embed every example once (called lazily on first classify)."""
+        with self._fit_lock:
+            if self._matrix is not None:
+                return self
+            labels = [c for c, texts in self.examples.items() for _ in texts]
+            matrix = self._embed([t for texts in self.examples.values() for t in texts])
+            for category in self.examples:
+                rows = matrix[[i for i, label in enumerate(labels) if label == category]]
+                centroid = rows.mean(axis=0)
+                self._centroids[category] = centroid / (np.linalg.norm(centroid) or 1.0)
+            self._labels, self._matrix = labels, matrix
+        return self
+
+    def predict(self, text: str) -> Tuple[str, float]:
+        """Return (category, score) for one message."""
+        if self._matrix is None:
+            self.fit()
+        vec = self._embed([text or ""])[0]
+        if self.method == "centroid":
+            scores = {c: float(np.dot(vec, v)) for c, v in self._centroids.items()}
+            best = max(scores, key=scores.get)
+            return best, scores[best]
+
+        sims = self._matrix @ vec
+        top = np.argsort(-sims)[: self.k]
+        votes: Dict[str, float] = defaultdict(float)
+        for i in top:
+            votes[self._labels[i]] += max(float(sims[i]), 0.0)
+        best = max(votes, key=votes.get)
+        return best, float(max(sims[i] for i in top if self._labels[i] == best))
+
+    def classify(self, text: str) -> dict:
+        """TicketClassification-shaped dict: category, needs_escalation, summary."""
+        category, _ = self.predict(text)
+        return {
+            "category": category,
+            "needs_escalation": mentions_escalation(text),
+            "summary": (text or "")[:200],
+        }
@@ -1,7 +1,9 @@
 from core.llm_setup import get_llm
 from tools.order_tools import ALL_ORDER_TOOLS
 from langgraph.prebuilt import create_react_agent
-from langchain_core.messages import SystemMessage
+from core.tool_executor import tool_node
+from core.history import history_hook
+from core.state import AgentSupportState
 
 llm = get_llm(temperature=0)
 
@@ -85,30 +87,16 @@ Always pass `session_user_id` (from the message context) into every tool call.
 """
 
 # ---------------------------------------------------------------------------
-# pre_model_hook for LangGraph 1.0.9
-# Runs before every LLM call. Returns {"llm_input_messages": [...]} which is
-# used as LLM input WITHOUT modifying the stored state messages.
-# This trims conversation history to prevent Groq 12K TPM 413 errors.
+# pre_model_hook — fits the conversation into the provider's history token
+# budget (core/history.py) without modifying the stored messages; older turns
+# are carried as a rolling summary in state.
 # ---------------------------------------------------------------------------
 
-def _pre_model_hook(state):
-    """
-    LangGraph 1.0.9 pre_model_hook:
-    - Returns llm_input_messages = system prompt + last 6 conversation messages
-    - Does NOT modify state (history is preserved in checkpointer)
-    - Prevents 413 'Request too large' errors with Groq's 12K TPM limit
-    """
-    messages   = state["messages"] if isinstance(state, dict) else list(state)
-    other_msgs = [m for m in messages if not isinstance(m, SystemMessage)]
-    trimmed    = other_msgs[-6:] if len(other_msgs) > 6 else other_msgs
-    return {
-        "llm_input_messages": [SystemMessage(content=ORDER_AGENT_PROMPT)] + trimmed
-    }
-
-
 order_agent_node = create_react_agent(
     model=llm,
-    tools=ALL_ORDER_TOOLS,
+    tools=tool_node(ALL_ORDER_TOOLS),
     prompt=ORDER_AGENT_PROMPT,     # system message for full runs
-    pre_model_hook=_pre_model_hook, # trims history before every LLM call
+    pre_model_hook=history_hook(ORDER_AGENT_PROMPT),  # token-budget window + summary
+    state_schema=AgentSupportState,
+    version="v1",     # one tool-node run per AI message (core/tool_executor.py)
 )
@@ -1,7 +1,9 @@
 from core.llm_setup import get_llm
 from tools.product_tools import ALL_PRODUCT_TOOLS
 from langgraph.prebuilt import create_react_agent
-from langchain_core.messages import SystemMessage
+from core.tool_executor import tool_node
+from core.history import history_hook
+from core.state import AgentSupportState
 
 llm = get_llm(temperature=0)
 
@@ -148,28 +150,14 @@ Description: Rich in fat, ideal for tea/coffee.
 
 
 # ---------------------------------------------------------------------------
-# pre_model_hook — trims history to prevent Groq TPM errors
-# ---------------------------------------------------------------------------
-
-def _pre_model_hook(state):
-    """
-    Runs before every LLM call in the product agent.
-    - Trims conversation to last 6 messages to avoid Groq 12K TPM errors
-    - Does NOT modify stored state (history preserved in checkpointer)
-    """
-    messages = state["messages"] if isinstance(state, dict) else list(state)
-    other_msgs = [m for m in messages if not isinstance(m, SystemMessage)]
-    trimmed   = other_msgs[-6:] if len(other_msgs) > 6 else other_msgs
-    return {"llm_input_messages": [SystemMessage(content=PRODUCT_AGENT_PROMPT)] + trimmed}
-
-
-# ---------------------------------------------------------------------------
-# Compiled agent node
+# Compiled agent node — pre_model_hook fits history to the token budget
 # ---------------------------------------------------------------------------
 
 product_agent_node = create_react_agent(
     model=llm,
-    tools=ALL_PRODUCT_TOOLS,
+    tools=tool_node(ALL_PRODUCT_TOOLS),
     prompt=PRODUCT_AGENT_PROMPT,
-    pre_model_hook=_pre_model_hook,
+    pre_model_hook=history_hook(PRODUCT_AGENT_PROMPT),
+    state_schema=AgentSupportState,
+    version="v1",     # one tool-node run per AI message (core/tool_executor.py)
 )
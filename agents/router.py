@@ -1,8 +1,33 @@
+import asyncio
+import contextvars
+import random
+import time
 from core.llm_setup import get_llm
 from core.state import SupportState
+from core.config import settings
+from core.metrics import REGISTRY, Counter
+from agents.router_rules import FastRoute, classify, is_follow_up
+from agents.intent_classifier import IntentClassifier
+from agents.direct_tools import match, resolve, router_prompt_section
+from typing import Dict, Optional
 from pydantic import BaseModel, Field
 from langchain_core.messages import HumanMessage
 from langchain_core.tools import tool
+from langchain_core.runnables import RunnableLambda
+
+# Fast-path hit rate: path="fast" (keyword rules) vs path="llm" (structured_llm)
+# or path="embedding" (ROUTER_MODE=embedding); path="sticky" reused the thread's last category
+ROUTER_DECISIONS = REGISTRY.register(Counter(
+    "cso_router_decisions_total", "Router decisions by path.", ("path",)))
+# Keyword guess vs LLM answer for the same message. confident="false" are the
+# low-confidence fallbacks; confident="true" are shadow-sampled fast-path hits.
+ROUTER_AGREEMENT = REGISTRY.register(Counter(
+    "cso_router_fast_path_agreement_total", "Keyword classifier vs LLM router decisions.",
+    ("confident", "fast", "llm", "agree")))
+
+# Categories a follow-up may stick to. "general" is the catch-all for greetings
+# and would swallow real questions that follow a "hi".
+STICKY_CATEGORIES = {"order", "subscription", "wallet", "product"}
 
 # 1. Define the Output Schema (Pydantic)
 class TicketClassification(BaseModel):
@@ -19,21 +44,37 @@ class TicketClassification(BaseModel):
         "", 
         description="A brief summary of the customer's problem."
     )
+    tool: Optional[str] = Field(
+        None,
+        description="Optional: name of ONE direct tool that fully answers the message (see DIRECT TOOLS)."
+    )
+    tool_args: Dict[str, str] = Field(
+        default_factory=dict,
+        description="Arguments for `tool`, only those listed for it (never user_id)."
+    )
 
 # 2. Create the Router Agent
-def create_router_agent():
-    # ⚡ Router always uses Groq llama-3.1-8b-instant regardless of global LLM_PROVIDER
-    # Fast 8B model is perfect for 5-way classification and has low token usage
-    from langchain_groq import ChatGroq
-    from core.config import Config
-    llm = ChatGroq(
-        model="llama-3.1-8b-instant",
-        temperature=0,
-    )
-    
-    # Bind the Pydantic schema to the LLM
-    # This forces the LLM to return JSON that matches our TicketClassification model
-    structured_llm = llm.with_structured_output(TicketClassification)
+def create_router_agent(mode: str = None):
+    """
+    ROUTER_MODE=llm        → Groq structured-output classification (default)
+    ROUTER_MODE=embedding  → local embedding k-NN (agents/intent_classifier.py),
+                             no network LLM call at all
+    The keyword fast path runs first in both modes.
+    """
+    mode = (mode or settings.ROUTER_MODE).lower()
+    structured_llm = classifier = None
+    if mode == "embedding":
+        classifier = IntentClassifier(k=settings.ROUTER_EMBEDDING_K, method=settings.ROUTER_EMBEDDING_METHOD)
+    elif mode == "llm":
+        # ⚡ Router always uses Groq llama-3.1-8b-instant regardless of global LLM_PROVIDER
+        # Fast 8B model is perfect for 5-way classification and has low token usage
+        llm = get_llm(temperature=0, model_name="llama-3.1-8b-instant", provider="groq")
+
+        # Bind the Pydantic schema to the LLM
+        # This forces the LLM to return JSON that matches our TicketClassification model
+        structured_llm = llm.with_structured_output(TicketClassification)
+    else:
+        raise ValueError(f"Unknown ROUTER_MODE '{mode}'. Valid: llm, embedding")
 
     system_prompt = """
 You are the first-line Customer Support Router for a D2C Dairy application.
@@ -125,31 +166,149 @@ Your job is to analyze the customer's message and route it to the correct depart
 
 Always provide a brief summary of the issue.
 """
+    if structured_llm and settings.ROUTER_DIRECT_TOOLS:
+        # Static block (same for every request) so the prompt stays cacheable
+        system_prompt += "\n" + router_prompt_section() + "\n"
 
     # 3. Define the Router Node Logic
-    def router_node(state: SupportState):
+    def _build_messages(state: SupportState):
         # Get the latest message from the history
         latest_message = state["messages"][-1].content
         
         # Insert system prompt context at runtime (LangGraph nodes pass only state typically, 
         # so we merge the prompt and human message here or just pass the human message)
         # We can construct the list properly:
-        messages = [
+        return [
             {"role": "system", "content": system_prompt},
             {"role": "user", "content": latest_message}
         ]
-        
-        # Call the structured LLM
-        result = structured_llm.invoke(messages)
-        
+
+    def _to_update(result: TicketClassification, state: SupportState):
         # Update the state with the routing decision
+        direct = None
+        if settings.ROUTER_DIRECT_TOOLS and result.tool and not result.needs_escalation:
+            direct = resolve(result.tool, result.tool_args, result.category, state.get("user_id"))
         return {
             "ticket_category": result.category,
             "needs_escalation": result.needs_escalation,
-            "escalation_summary": result.summary
+            "escalation_summary": result.summary,
+            "routed_at": time.time(),
+            "direct_tool": direct,
+        }
+
+    # Keyword fast path (agents/router_rules.py) — clear-cut messages skip the LLM
+    def _fast_route(state: SupportState) -> FastRoute:
+        return classify(str(state["messages"][-1].content))
+
+    def _fast_update(state: SupportState, fast: FastRoute):
+        ROUTER_DECISIONS.inc(path="fast")
+        text = str(state["messages"][-1].content)
+        # No structured output to name a tool — map the lookup deterministically
+        direct = None
+        if settings.ROUTER_DIRECT_TOOLS and not fast.needs_escalation:
+            direct = match(text, fast.category, state.get("user_id"))
+        return {
+            "ticket_category": fast.category,
+            "needs_escalation": fast.needs_escalation,
+            "escalation_summary": text[:200],
+            "routed_at": time.time(),
+            "direct_tool": direct,
+        }
+
+    # Routing memory — a short follow-up ("and yesterday?", "show the items")
+    # within ROUTER_STICKY_TTL_S stays with the previous agent. A confident
+    # keyword match for another category, or escalation words, is a topic
+    # shift and goes through normal routing.
+    def _sticky_update(state: SupportState, fast: FastRoute):
+        previous, routed_at = state.get("ticket_category"), state.get("routed_at")
+        if (previous not in STICKY_CATEGORIES or routed_at is None or state.get("needs_escalation")
+                or time.time() - routed_at > settings.ROUTER_STICKY_TTL_S):
+            return None
+        text = str(state["messages"][-1].content)
+        if not is_follow_up(text, settings.ROUTER_STICKY_MAX_WORDS):
+            return None
+        if fast.needs_escalation or (fast.confident and fast.category != previous):
+            return None
+        ROUTER_DECISIONS.inc(path="sticky")
+        return {
+            "ticket_category": previous,
+            "needs_escalation": False,
+            "escalation_summary": text[:200],
+            "routed_at": time.time(),
+            "direct_tool": None,
         }
 
-    return router_node
+    def _pre_route(state: SupportState):
+        """Sticky / keyword decisions that need no classifier.
+
+        Returns (update, fast): update is None when the classifier must run;
+        fast is the keyword guess to compare against it (None for sticky hits).
+        """
+        fast = _fast_route(state) if settings.ROUTER_FAST_PATH or settings.ROUTER_STICKY else None
+        if settings.ROUTER_STICKY:
+            sticky = _sticky_update(state, fast)
+            if sticky:
+                return sticky, None
+        if not settings.ROUTER_FAST_PATH:
+            return None, None
+        if fast.confident:
+            return _fast_update(state, fast), fast
+        return None, fast
+
+    def _compare(fast: FastRoute, result: TicketClassification):
+        ROUTER_AGREEMENT.inc(
+            confident=str(fast.confident).lower(), fast=fast.category, llm=result.category,
+            agree=str(fast.category == result.category).lower(),
+        )
+
+    _shadow_tasks = set()   # strong refs so pending comparisons aren't garbage-collected
+
+    async def _shadow(state: SupportState, fast: FastRoute):
+        try:
+            _compare(fast, await structured_llm.ainvoke(_build_messages(state)))
+        except Exception as e:
+            print(f"[Router] Shadow comparison failed: {e}")
+
+    def _embedding_classify(state: SupportState) -> TicketClassification:
+        ROUTER_DECISIONS.inc(path="embedding")
+        return TicketClassification(**classifier.classify(str(state["messages"][-1].content)))
+
+    def router_node(state: SupportState):
+        update, fast = _pre_route(state)
+        if update:
+            return update
+        if classifier:
+            return _to_update(_embedding_classify(state), state)
+        # Call the structured LLM
+        result = structured_llm.invoke(_build_messages(state))
+        ROUTER_DECISIONS.inc(path="llm")
+        if fast:
+            _compare(fast, result)
+        return _to_update(result, state)
+
+    async def arouter_node(state: SupportState):
+        # Async twin used by app.ainvoke — awaits the Groq call instead of
+        # parking a worker thread on it
+        update, fast = _pre_route(state)
+        if update:
+            # Sample some fast-path hits against the LLM off the request path
+            if fast and structured_llm and random.random() < settings.ROUTER_FAST_PATH_SHADOW_RATE:
+                # Fresh context: the comparison outlives this node, so it must not
+                # report into the graph run's callbacks (stream, tracing, metrics)
+                task = contextvars.Context().run(asyncio.get_running_loop().create_task, _shadow(state, fast))
+                _shadow_tasks.add(task)
+                task.add_done_callback(_shadow_tasks.discard)
+            return update
+        if classifier:
+            # Local model inference is CPU-bound — keep it off the event loop
+            return _to_update(await asyncio.to_thread(_embedding_classify, state), state)
+        result = await structured_llm.ainvoke(_build_messages(state))
+        ROUTER_DECISIONS.inc(path="llm")
+        if fast:
+            _compare(fast, result)
+        return _to_update(result, state)
+
+    return RunnableLambda(router_node, afunc=arouter_node, name="router")
 
 # Expose the node for the graph
-router_node = create_router_agent()
\ No newline at end of file
+router_node = create_router_agent()
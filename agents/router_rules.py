@@ -0,0 +1,127 @@
+"""
+router_rules.py — Deterministic keyword fast path for the router
+================================================================
+The router's system prompt already spells out the routing keywords and the
+Hinglish mappings. This module compiles the same rules into regexes so that
+clear-cut messages ("hi", "mera wallet balance", "koi offer chal raha hai?")
+are classified in microseconds without the ~3 KB Groq prompt.
+
+classify(text) is deliberately conservative:
+
+  • a message made only of a greeting / thanks          → general
+  • escalation words (lawyer, legal, sue, complaint …)  → needs_escalation
+  • keywords of exactly ONE category                    → that category
+  • no keywords, or keywords of several categories      → not confident,
+    the caller falls back to the LLM
+
+Ambiguous pairs the prompt calls out ("price of milk" vs "milk sold today",
+"subscription plan" vs "subscription orders") match two categories and
+therefore always go to the LLM. Words that name no category on their own
+are not keywords at all: status words (approved, cancelled, failed,
+delivered — "my payment failed", "milk not delivered") and "available"
+("I won't be available tomorrow") only count next to the noun they qualify
+("failed orders", "not available for delivery").
+
+is_follow_up(text) backs sticky routing: a short message (or one opening with
+"and", "what about", "aur", "uska" …) within ROUTER_STICKY_TTL_S of the last
+routing decision stays with the previous agent unless classify() confidently
+names a different category or escalation words appear (a topic shift).
+"""
+
+import re
+from dataclasses import dataclass, field
+from typing import Dict, List, Tuple
+
+# Keep in sync with the ROUTING RULES / HINGLISH ROUTING GUIDE in agents/router.py
+_RULES: Dict[str, Tuple[str, ...]] = {
+    "order": (
+        r"\borders?\b", r"\bsales?\b", r"\bsold\b", r"\bdispatch(ed)?\b",
+        r"\brevenue\b", r"\bpouches\b",
+        r"\b(liters|litres)\b", r"\bvehicle\b", r"\btransporter\b", r"\broutes?\b", r"\btowns?\b",
+        r"\bhubs?\b", r"\boutstanding\b", r"\bamount due\b", r"\banalytics\b",
+        r"\btop (selling|customers?|products?)\b", r"\brepeat customers?\b", r"\baverage order value\b",
+    ),
+    "subscription": (
+        r"\bsubscription\b", r"\bvacations?\b", r"\bchhutti\b", r"\bholidays?\b", r"\bskip\b",
+        r"\bwon'?t be (home|available|here)\b", r"\bnot available for delivery\b", r"\bdelivery mat karo\b",
+    ),
+    "product": (
+        r"\bprices?\b", r"\bmrp\b", r"\brate\b", r"\bcatalog(ue)?\b",
+        r"\bkya (kya )?milta\b", r"\boffers?\b", r"\bpromotions?\b", r"\bdiscounts?\b",
+        r"\bvariants?\b", r"\bsizes?\b", r"\bfeatured\b", r"\bdo you sell\b", r"\bsubscrib(e|able)\b",
+        r"\bpaneer\b", r"\bghee\b", r"\bbutter\b", r"\bcurd\b", r"\bdahi\b", r"\bcream\b",
+        r"\bke liye kya le sakte\b",
+    ),
+    "wallet": (
+        r"\bwallet\b", r"\brecharge\b", r"\bcashback\b", r"\bledger\b", r"\bpayment modes?\b",
+    ),
+    "general": (
+        r"\bpolicy\b", r"\bfaq\b", r"\bcontact\b", r"\bcustomer care\b", r"\bhelpline\b",
+    ),
+}
+
+_ESCALATION = (r"\blawyer\b", r"\blegal\b", r"\bsue\b", r"\bcomplaint\b", r"\bconsumer court\b", r"\burgent action\b")
+
+# Openers that only make sense as a continuation of the previous question
+_FOLLOW_UP = re.compile(
+    r"^(and|also|but|then|what about|how about|same|only|just|aur|bhi|phir|toh|"
+    r"uska|iska|uske|iske|usme|isme|wahi|wo|woh|ye|yeh)\b"
+)
+
+_GREETING = re.compile(
+    r"^(hi+|hello+|hey+|hii+|namaste|namaskar|good (morning|afternoon|evening)|thanks?( you)?|"
+    r"thank u|thx|ok(ay)?|bye|goodbye|dhanyavaad|shukriya)( there| ji| sir| team)?[\s!.,?]*$"
+)
+
+
+def _alternation(patterns) -> "re.Pattern":
+    return re.compile("|".join(f"(?:{p})" for p in patterns))
+
+
+# One alternation per category — a single scan of the message each
+_COMPILED = {category: _alternation(patterns) for category, patterns in _RULES.items()}
+_COMPILED_ESCALATION = _alternation(_ESCALATION)
+
+
+@dataclass
+class FastRoute:
+    category: str                 # best guess ("general" when nothing matched)
+    needs_escalation: bool
+    confident: bool               # True → safe to skip the LLM
+    matches: Dict[str, List[str]] = field(default_factory=dict)   # category → matched keywords
+
+
+def _normalize(text: str) -> str:
+    return re.sub(r"\s+", " ", text.lower().replace("’", "'")).strip()
+
+
+def mentions_escalation(text: str) -> bool:
+    """The router prompt's legal-keyword rule (lawyer, legal, sue, complaint …)."""
+    return bool(_COMPILED_ESCALATION.search(_normalize(text or "")))
+
+
+def is_follow_up(text: str, max_words: int) -> bool:
+    """Short message ("and yesterday?", "show the items") or a continuation opener."""
+    msg = _normalize(text or "")
+    return bool(msg) and (len(msg.split()) <= max_words or bool(_FOLLOW_UP.match(msg)))
+
+
+def classify(text: str) -> FastRoute:
+    """Keyword classification of one customer message; see module docstring."""
+    msg = _normalize(text or "")
+    if _GREETING.match(msg):
+        return FastRoute("general", False, True, {"general": [msg]})
+
+    matches: Dict[str, List[str]] = {}
+    for category, regex in _COMPILED.items():
+        found = [m.group(0) for m in regex.finditer(msg)]
+        if found:
+            matches[category] = found
+    escalate = bool(_COMPILED_ESCALATION.search(msg))
+
+    if len(matches) == 1:
+        category = next(iter(matches))
+        return FastRoute(category, escalate, True, matches)
+    best = max(matches, key=lambda c: len(matches[c])) if matches else "general"
+    # Escalation wins in route_to_department regardless of category
+    return FastRoute(best, escalate, escalate, matches)
@@ -1,7 +1,9 @@
 from core.llm_setup import get_llm
-from tools.subscription_tools import ALL_SUBSCRIPTION_TOOLS
+from tools.subscription_tools import ALL_SUBSCRIPTION_TOOLS, BATCHED_SUBSCRIPTION_TOOLS
 from langgraph.prebuilt import create_react_agent
-from langchain_core.messages import SystemMessage
+from core.tool_executor import tool_node
+from core.history import history_hook
+from core.state import AgentSupportState
 
 llm = get_llm(temperature=0)
 
@@ -40,7 +42,7 @@ You handle two categories of queries:
 5. **add_vacation_date(user_id, vacation_date)**
    - Marks ONE date as vacation — delivery is SKIPPED on that day
    - vacation_date MUST be in YYYY-MM-DD format (e.g., "2026-03-10")
-   - For a DATE RANGE (e.g., "5th to 8th March"): call this tool ONCE PER DATE
+   - For a DATE RANGE (e.g., "5th to 8th March"): call this tool ONCE PER DATE, all in the SAME response
    - Cannot mark PAST dates
    - Use for: "Mark vacation for 10th March", "I won't be home on March 5th", "Skip delivery on 2026-03-15"
 
@@ -52,7 +54,7 @@ You handle two categories of queries:
 ---
 
 ## HOW TO GET user_id
-The user_id is injected into your system context at the start of every conversation.
+The user_id is given in the SESSION CONTEXT message at the start of every conversation.
 ALWAYS use that user_id when calling tools. NEVER ask the customer for their ID.
 
 ---
@@ -62,7 +64,7 @@ ALWAYS use that user_id when calling tools. NEVER ask the customer for their ID.
 - "today" → use today's actual date (provided in your context)
 - "tomorrow" → today + 1 day
 - "10th March" or "March 10" → resolve to current/next year as appropriate → "2026-03-10"
-- "5th to 8th March" → call add_vacation_date four times: 2026-03-05, 2026-03-06, 2026-03-07, 2026-03-08
+- "5th to 8th March" → call add_vacation_date four times in one response: 2026-03-05, 2026-03-06, 2026-03-07, 2026-03-08
 - "this month" → use current month and year as filter in get_vacation_dates
 
 ---
@@ -122,37 +124,21 @@ ALWAYS use that user_id when calling tools. NEVER ask the customer for their ID.
 
 
 # ---------------------------------------------------------------------------
-# pre_model_hook — injects user_id into system prompt + trims message history
-# Prevents Groq 12K TPM 413 errors while keeping user context available.
+# pre_model_hook — user_id + date context, history fitted to the token budget
+# The system prompt stays byte-identical across users, turns and days so
+# providers can serve it from their prompt cache; per-request values go in a
+# separate SESSION CONTEXT message (core/history.py).
 # ---------------------------------------------------------------------------
 
-def _pre_model_hook(state):
-    """
-    Runs before every LLM call in the subscription agent.
-    - Injects user_id and today's date into the system message
-    - Trims conversation to last 6 messages to avoid token limit errors
-    - Does NOT modify stored state (history is preserved in checkpointer)
-    """
+def _session_context(state) -> str:
     from datetime import date as _date
-
-    messages = state["messages"] if isinstance(state, dict) else list(state)
-    user_id  = state.get("user_id") if isinstance(state, dict) else None
-    today    = _date.today().isoformat()
-
-    context_note = (
-        f"\n\n## SESSION CONTEXT\n"
-        f"- user_id  : {user_id}\n"
-        f"- Today    : {today}\n"
+    return (
+        f"## SESSION CONTEXT\n"
+        f"- user_id  : {state.get('user_id')}\n"
+        f"- Today    : {_date.today().isoformat()}\n"
         "Use this user_id for ALL tool calls. Never ask the customer for it."
     )
 
-    system_msg = SystemMessage(content=SUBSCRIPTION_AGENT_PROMPT + context_note)
-
-    other_msgs = [m for m in messages if not isinstance(m, SystemMessage)]
-    trimmed    = other_msgs[-6:] if len(other_msgs) > 6 else other_msgs
-
-    return {"llm_input_messages": [system_msg] + trimmed}
-
 
 # ---------------------------------------------------------------------------
 # Compiled agent node
@@ -160,7 +146,9 @@ def _pre_model_hook(state):
 
 subscription_agent_node = create_react_agent(
     model=llm,
-    tools=ALL_SUBSCRIPTION_TOOLS,
+    tools=tool_node(ALL_SUBSCRIPTION_TOOLS, batched=BATCHED_SUBSCRIPTION_TOOLS),
     prompt=SUBSCRIPTION_AGENT_PROMPT,   # used for non-hook runs
-    pre_model_hook=_pre_model_hook,     # injects user_id + trims history
+    pre_model_hook=history_hook(SUBSCRIPTION_AGENT_PROMPT, context=_session_context),
+    state_schema=AgentSupportState,     # carries user_id into the hook
+    version="v1",                       # all calls of a message in one run → date ranges batch
 )
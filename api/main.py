@@ -1,34 +1,74 @@
 from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
-from typing import List, Dict, Any
-from langchain_core.messages import HumanMessage
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from pydantic import BaseModel, Field
+from typing import List, Dict, Any, Optional
+from langchain_core.messages import AIMessage, HumanMessage
 from core.graph import app  # The compiled LangGraph application
-from core.db import get_user_role, get_user_info
+from core.db import get_user_role, get_user_info, invalidate_user, pool_stats, user_cache_stats
+from core.llm_setup import llm_client_count
+from core.circuit_breaker import breaker_states
+from core.rate_limit import limiter_states
+from core.batch import run_batch, summarize
+from core.config import settings
+from core.retention import CheckpointRetention, RetentionWorker
+from core.chat_log import ChatLogWriter
+from core import escalation_summary
+from core import metrics
+from core.response_cache import CacheHit, ResponseCache, is_cacheable
+from core.turn import TurnResult, ahold_thread, arun_turn, arecent_category, arecord_turn, ais_paused, astream_turn
+from contextlib import asynccontextmanager
 import json
 import os
+import time
 from datetime import datetime
 
-LOG_FILE = "chat_history_log.jsonl"
+# Chat interactions are appended to CHAT_LOG_FILE by a background writer
+# (core/chat_log.py) — the request path only enqueues.
+_chat_log = ChatLogWriter()
+
 
 def append_to_chat_log(thread_id: str, user_id: int, user_message: str, ai_response: str, category: str):
-    """Saves chat interactions to a structured JSONL file for future fine-tuning/analysis."""
-    log_entry = {
+    """Queues a chat interaction for the structured JSONL log (fine-tuning/analysis)."""
+    _chat_log.enqueue({
         "timestamp": datetime.now().isoformat(),
         "thread_id": thread_id,
         "user_id": user_id,
         "user_message": user_message,
         "ai_response": ai_response,
         "category": category
-    }
-    try:
-        with open(LOG_FILE, "a", encoding="utf-8") as f:
-            f.write(json.dumps(log_entry, ensure_ascii=False) + "\n")
-    except Exception as e:
-        print(f"[Logger] Failed to write to chat log: {e}")
+    })
+
+# The graph is driven with the async API so it never blocks the event loop;
+# its checkpointer (core.checkpointer) serves async calls from worker threads.
+# One worker can keep hundreds of conversations in flight while they wait on
+# Groq / Gemini. A turn needs no get_state round trips: the run itself reports
+# whether it paused (core.turn) and the pause pre-check is a status-row lookup.
+_retention_worker = None
+
+
+@asynccontextmanager
+async def lifespan(_server: FastAPI):
+    global _retention_worker
+    _chat_log.start()
+    # Escalation summaries are written back to the thread off the request path
+    escalation_summary.start_worker(app)
+    # Background checkpoint compaction / TTL expiry / vacuum
+    if settings.CHECKPOINT_RETENTION_INTERVAL_S > 0:
+        _retention_worker = RetentionWorker()
+        _retention_worker.start()
+    yield
+    if _retention_worker:
+        _retention_worker.stop()
+    escalation_summary.stop_worker()
+    # Flush whatever is still queued before the worker exits
+    _chat_log.stop()
+
 
 server = FastAPI(
     title="Customer Support Orchestrator",
-    version="2.0 Modular Edition"
+    version="2.0 Modular Edition",
+    lifespan=lifespan,
 )
 
 
@@ -45,59 +85,143 @@ class ChatResponse(BaseModel):
     category: str
     
     
+def _chat_config(thread_id: str) -> dict:
+    return {
+        "configurable": {"thread_id": thread_id},
+        "recursion_limit": 20
+    }
+
+
+def _graph_input(request: ChatRequest, role: str) -> dict:
+    return {
+        "messages": [HumanMessage(content=request.message)],
+        "user_id": request.user_id,
+        "role": role,
+    }
+
+
+def _format_messages(final_state: dict) -> List[Dict[str, Any]]:
+    """Format response for the frontend - return ONLY the latest AI message."""
+    formatted_messages = []
+    all_msgs = final_state.get("messages", [])
+    if all_msgs:
+        last_msg = all_msgs[-1]
+        # Ensure it is an AI message (the final response)
+        if last_msg.type == "ai" or getattr(last_msg, "role", "") == "ai":
+            formatted_messages.append({"role": "ai", "content": last_msg.content})
+        else:
+             formatted_messages.append({"role": "ai", "content": getattr(last_msg, "content", str(last_msg))})
+    return formatted_messages
+
+
+# ---------------------------------------------------------------------------
+# Semantic response cache (core/response_cache.py) — repeated product / FAQ
+# questions are answered without the router, the ReAct loop or the DB.
+# Only context-free messages take part (is_cacheable): the key has no
+# thread history, so follow-ups and escalation wording always go to the graph.
+# ---------------------------------------------------------------------------
+
+_response_cache = ResponseCache() if settings.RESPONSE_CACHE_ENABLED else None
+
+
+async def _cacheable(request: ChatRequest) -> bool:
+    if _response_cache is None:
+        return False
+    try:
+        recent = await arecent_category(app, request.thread_id, settings.ROUTER_STICKY_TTL_S)
+    except Exception as e:
+        print(f"[Cache] Thread context lookup failed: {e}")
+        return False
+    return is_cacheable(request.message, recent)
+
+
+async def _cached_answer(request: ChatRequest, role: str, cacheable: bool) -> Optional[CacheHit]:
+    if not cacheable:
+        return None
+    try:
+        return await _response_cache.alookup(request.message, role)
+    except Exception as e:
+        print(f"[Cache] Lookup failed: {e}")
+        return None
+
+
+async def _record_cached_turn(request: ChatRequest, role: str, config: dict, hit: CacheHit):
+    """Append the cached Q/A to the thread so follow-up questions keep their context."""
+    async with ahold_thread(request.thread_id):
+        await app.aupdate_state(
+            config,
+            {
+                "messages": [HumanMessage(content=request.message), AIMessage(content=hit.response)],
+                "user_id": request.user_id,
+                "role": role,
+                "ticket_category": hit.category,
+                "needs_escalation": False,
+                "routed_at": time.time(),
+            },
+            as_node=f"{hit.category}_agent",
+        )
+    await arecord_turn(app, request.thread_id, "active", hit.category)
+    append_to_chat_log(request.thread_id, request.user_id, request.message, hit.response, hit.category)
+
+
+async def _remember_answer(request: ChatRequest, role: str, cacheable: bool, status: str,
+                           category: str, answer):
+    if not cacheable or status != "active" or not isinstance(answer, str):
+        return
+    try:
+        await _response_cache.astore(request.message, role, category, answer)
+    except Exception as e:
+        print(f"[Cache] Store failed: {e}")
+
+
+PAUSED_RESPONSE = ChatResponse(
+    status="paused",
+    messages=[{"role": "ai", "content": "Awaiting human review."}],
+    category="escalation"
+)
+
+
 @server.post("/api/v1/chat", response_model=ChatResponse)
 async def process_chat(request: ChatRequest):
     """
     Submits a message to the multi-tiered orchestrator.
     Maintains memory using thread_id.
     """
-    config = {
-        "configurable": {"thread_id": request.thread_id},
-        "recursion_limit": 20
-    }
+    config = _chat_config(request.thread_id)
     
     # 1. Check if the thread is currently paused waiting for human input
-    current_state = app.get_state(config)
-    if current_state.next and "human_escalation" in current_state.next:
-        return ChatResponse(
-            status="paused",
-            messages=[{"role": "ai", "content": "Awaiting human review."}],
-            category="escalation"
-        )
+    if await ais_paused(app, request.thread_id):
+        return PAUSED_RESPONSE
     
     # 2. Resolve role from DB (user_type=1 → admin, user_type=4 → customer)
-    role = get_user_role(request.user_id)
+    # (blocking MySQL lookup → threadpool so the event loop stays free)
+    role = await run_in_threadpool(get_user_role, request.user_id)
 
     # 3. Submit new user utterance with identity context in state
     try:
-        final_state = app.invoke(
-            {
-                "messages": [HumanMessage(content=request.message)],
-                "user_id": request.user_id,
-                "role": role,
-            },
-            config=config,
-        )
+        cacheable = await _cacheable(request)
+        hit = await _cached_answer(request, role, cacheable)
+        if hit:
+            await _record_cached_turn(request, role, config, hit)
+            return ChatResponse(
+                status="active",
+                messages=[{"role": "ai", "content": hit.response}],
+                category=hit.category
+            )
+
+        turn = await arun_turn(app, _graph_input(request, role), config)
         
         # 3. Format response for the frontend - return ONLY the latest AI message
-        formatted_messages = []
-        all_msgs = final_state.get("messages", [])
-        if all_msgs:
-            last_msg = all_msgs[-1]
-            # Ensure it is an AI message (the final response)
-            if last_msg.type == "ai" or getattr(last_msg, "role", "") == "ai":
-                formatted_messages.append({"role": "ai", "content": last_msg.content})
-            else:
-                 formatted_messages.append({"role": "ai", "content": getattr(last_msg, "content", str(last_msg))})
+        formatted_messages = _format_messages(turn.values)
             
-        # 4. Check if the interaction caused a new pause
-        new_state = app.get_state(config)
-        status = "paused" if new_state.next else "active"
-        category = final_state.get("ticket_category", "unknown")
+        # 4. The run reports whether the interaction caused a new pause
+        status, category = turn.status, turn.category
+        await arecord_turn(app, request.thread_id, status, category)
             
         # 5. Log the interaction to file
         ai_response_text = formatted_messages[0]["content"] if formatted_messages else ""
         append_to_chat_log(request.thread_id, request.user_id, request.message, ai_response_text, category)
+        await _remember_answer(request, role, cacheable, status, category, ai_response_text)
 
         return ChatResponse(
             status=status,
@@ -109,6 +233,270 @@ async def process_chat(request: ChatRequest):
         import traceback
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=f"LLM Routing Error: {str(e)}")
+
+
+# ---------------------------------------------------------------------------
+# Streaming chat (Server-Sent Events)
+# Same graph run as process_chat, but progress is pushed as it happens:
+#   event: category  → router decision, as soon as router_node returns
+#   event: tool      → tool start / end inside the specialised agent
+#   event: token     → answer tokens from the agent LLM
+#   event: done      → final ChatResponse payload (status, messages, category)
+#   event: error     → run failed; stream ends
+# ---------------------------------------------------------------------------
+
+# LLM calls in these nodes are internal (classification / summary) — never streamed
+_SILENT_NODES = {"router", "human_escalation", "pre_model_hook"}
+
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
+
+def _chunk_text(chunk) -> str:
+    """Extract plain text from an AIMessageChunk (str or Gemini-style content blocks)."""
+    content = getattr(chunk, "content", "")
+    if isinstance(content, str):
+        return content
+    return "".join(
+        block.get("text", "") if isinstance(block, dict) else str(block)
+        for block in content
+    )
+
+
+async def _stream_chat(request: ChatRequest, role: str, config: dict):
+    routed = direct_sent = False
+    turn = TurnResult()
+    try:
+        cacheable = await _cacheable(request)
+        hit = await _cached_answer(request, role, cacheable)
+        if hit:
+            await _record_cached_turn(request, role, config, hit)
+            yield _sse("category", {"category": hit.category, "needs_escalation": False})
+            yield _sse("token", {"text": hit.response})
+            yield _sse("done", ChatResponse(
+                status="active",
+                messages=[{"role": "ai", "content": hit.response}],
+                category=hit.category
+            ).model_dump())
+            return
+
+        # astream_turn fills `turn` from the root events (and records a pause at once)
+        async for ev in astream_turn(app, _graph_input(request, role), config, turn):
+            kind = ev["event"]
+            node = ev.get("metadata", {}).get("langgraph_node")
+
+            if not ev.get("parent_ids"):
+                continue
+
+            if kind == "on_chain_end" and ev["name"] == "router" and not routed:
+                routed = True
+                output = ev["data"].get("output") or {}
+                yield _sse("category", {
+                    "category": output.get("ticket_category", "unknown"),
+                    "needs_escalation": output.get("needs_escalation", False),
+                })
+
+            elif kind == "on_chain_end" and ev["name"] == "direct_tool" and not direct_sent:
+                # Template-rendered answer (agents/direct_tools.py) — no LLM tokens to stream
+                messages = (ev["data"].get("output") or {}).get("messages") or []
+                if messages:
+                    direct_sent = True
+                    yield _sse("token", {"text": messages[-1].content})
+
+            elif kind == "on_tool_start":
+                yield _sse("tool", {"tool": ev["name"], "status": "start", "input": ev["data"].get("input")})
+
+            elif kind == "on_tool_end":
+                yield _sse("tool", {"tool": ev["name"], "status": "end"})
+
+            elif kind == "on_chat_model_stream" and node not in _SILENT_NODES:
+                text = _chunk_text(ev["data"]["chunk"])
+                if text:
+                    yield _sse("token", {"text": text})
+
+        formatted_messages = _format_messages(turn.values)
+        status, category = turn.status, turn.category
+        await arecord_turn(app, request.thread_id, status, category)
+
+        ai_response_text = formatted_messages[0]["content"] if formatted_messages else ""
+        append_to_chat_log(request.thread_id, request.user_id, request.message, ai_response_text, category)
+        await _remember_answer(request, role, cacheable, status, category, ai_response_text)
+
+        yield _sse("done", ChatResponse(
+            status=status,
+            messages=formatted_messages,
+            category=category
+        ).model_dump())
+
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        yield _sse("error", {"detail": f"LLM Routing Error: {str(e)}"})
+
+
+@server.post("/api/v1/chat/stream")
+async def process_chat_stream(request: ChatRequest):
+    """
+    Streaming variant of /api/v1/chat (text/event-stream).
+    Emits the routed category, tool progress and answer tokens as they arrive.
+    """
+    config = _chat_config(request.thread_id)
+
+    if await ais_paused(app, request.thread_id):
+        async def _paused():
+            yield _sse("done", PAUSED_RESPONSE.model_dump())
+        return StreamingResponse(_paused(), media_type="text/event-stream")
+
+    role = await run_in_threadpool(get_user_role, request.user_id)
+    return StreamingResponse(
+        _stream_chat(request, role, config),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+# ---------------------------------------------------------------------------
+# Batch chat — regression sweeps / bulk tickets in one round trip.
+# Every item runs on a fresh batch thread (live conversations are untouched)
+# and nothing is written to the chat log, so replays don't feed back into it.
+# ---------------------------------------------------------------------------
+
+class BatchChatRequest(BaseModel):
+    requests: List[ChatRequest] = Field(..., min_length=1, max_length=500)
+    concurrency: int = Field(8, ge=1, le=64)         # graph runs in flight
+    timeout_s: float = Field(60.0, gt=0, le=600)     # per item
+    group_by_thread: bool = False                    # replay same-thread items in order
+    dry_run: bool = False                            # skip tool writes (vacations) — regression sweeps
+
+class BatchChatResponse(BaseModel):
+    results: List[Dict[str, Any]]
+    report: Dict[str, Any]
+
+
+@server.post("/api/v1/chat/batch", response_model=BatchChatResponse)
+async def process_chat_batch(batch: BatchChatRequest):
+    """
+    Runs many chat requests through the orchestrator with bounded concurrency,
+    per-item timeouts and an aggregated latency / error report.
+    """
+    t0 = time.perf_counter()
+    results = await run_batch(
+        app,
+        batch.requests,
+        concurrency=batch.concurrency,
+        timeout_s=batch.timeout_s,
+        group_by_thread=batch.group_by_thread,
+        dry_run=batch.dry_run,
+    )
+    return BatchChatResponse(
+        results=[r.to_dict() for r in results],
+        report=summarize(results, time.perf_counter() - t0),
+    )
+
+
+# ---------------------------------------------------------------------------
+# Checkpoint store maintenance
+# ---------------------------------------------------------------------------
+
+@server.get("/api/v1/admin/checkpoints/stats")
+async def checkpoint_stats():
+    """Size and row counts of the checkpoint store, plus the last background pass."""
+    stats = await run_in_threadpool(lambda: CheckpointRetention().stats())
+    stats["last_maintenance"] = _retention_worker.last_report if _retention_worker else None
+    return stats
+
+
+@server.post("/api/v1/admin/checkpoints/maintenance")
+async def checkpoint_maintenance(vacuum: bool = False):
+    """Run one compaction / expiry pass now (optionally with VACUUM / ANALYZE)."""
+    return await run_in_threadpool(lambda: CheckpointRetention().run_once(vacuum=vacuum))
+
+
+# ---------------------------------------------------------------------------
+# LLM provider health — circuit breakers of the auto chain, rate limiters
+# ---------------------------------------------------------------------------
+
+@server.get("/api/v1/admin/llm/breakers")
+async def llm_breakers():
+    """Circuit breaker state per LLM provider (LLM_PROVIDER=auto)."""
+    return breaker_states()
+
+
+@server.get("/api/v1/admin/llm/rate-limits")
+async def llm_rate_limits():
+    """Client-side rate limiter per (provider, model): quota left, queue depth, throttled time."""
+    return limiter_states()
+
+
+@server.get("/api/v1/admin/db/pool")
+async def db_pool_stats():
+    """MySQL pool: open / in-use / idle connections, waiters, overflow, reconnects and timeouts."""
+    return pool_stats()
+
+
+@server.get("/api/v1/admin/users/cache")
+async def user_cache():
+    """Role / profile cache: entries, hits, misses, evictions and failed lookups (not cached)."""
+    return user_cache_stats()
+
+
+@server.post("/api/v1/admin/users/cache/invalidate")
+async def user_cache_invalidate(user_id: Optional[int] = None):
+    """Drop *user_id*'s cached role / profile after a change in sp_users, or every entry."""
+    return {"dropped": invalidate_user(user_id)}
+
+
+@server.get("/api/v1/admin/chat-log/stats")
+async def chat_log_stats():
+    """Queued / written / dropped counters of the background chat-log writer."""
+    return _chat_log.stats()
+
+
+@server.get("/api/v1/admin/escalation-summaries/stats")
+async def escalation_summary_stats():
+    """Escalated threads waiting for (or retrying) their background summary."""
+    return escalation_summary.worker_stats()
+
+
+# ---------------------------------------------------------------------------
+# Response cache admin — call invalidate after catalog / offer / policy updates
+# ---------------------------------------------------------------------------
+
+@server.get("/api/v1/admin/cache/stats")
+async def response_cache_stats():
+    """Entry counts, data versions and hit / miss totals of the response cache."""
+    return _response_cache.stats() if _response_cache else {"enabled": False}
+
+
+@server.post("/api/v1/admin/cache/invalidate")
+async def response_cache_invalidate(source: Optional[str] = None):
+    """Drop cached answers built from *source* (product / offer / policy), or all of them."""
+    if _response_cache is None:
+        return {"enabled": False}
+    try:
+        return {"dropped": _response_cache.invalidate(source)}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+# ---------------------------------------------------------------------------
+# Prometheus scrape endpoint — node / tool / LLM / DB pool-wait latencies
+# (core/metrics.py) plus the chat-log writer's queue counters
+# ---------------------------------------------------------------------------
+
+@server.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    log = _chat_log.stats()
+    gauges = {
+        "cso_chat_log_queued": ("Chat log entries waiting to be written.", log["queued"]),
+        "cso_chat_log_written": ("Chat log entries written since start.", log["written"]),
+        "cso_chat_log_dropped": ("Chat log entries dropped (queue full / write error).", log["dropped"]),
+        "cso_llm_clients": ("Shared chat model clients in the core.llm_setup registry.", llm_client_count()),
+    }
+    return PlainTextResponse(metrics.render(gauges), media_type="text/plain; version=0.0.4")
+
+
 if __name__ == "__main__":
     import uvicorn
     # Make sure to run from project root: python -m api.main
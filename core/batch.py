@@ -0,0 +1,191 @@
+"""
+batch.py — Bulk chat execution against the compiled graph
+==========================================================
+Runs many chat requests through an (async) compiled LangGraph app with:
+
+  • bounded concurrency       — at most N graph runs in flight
+  • isolated thread_ids       — every run gets a fresh batch thread, so a
+                                replay never touches live conversations
+  • per-item timeouts         — one hung provider call can't stall the batch
+  • an aggregated report      — latency percentiles, errors, categories
+  • dry_run=True              — tool writes (add / cancel vacation) are
+                                skipped via core.query.dry_run(); reads and
+                                answers are unchanged. A replay sends old
+                                messages as their original user_id, so
+                                scripts/replay_chat_log.py always sets it
+
+Used by POST /api/v1/chat/batch and scripts/replay_chat_log.py.
+Items only need `thread_id`, `message` and `user_id` attributes
+(api.main.ChatRequest or BatchItem below).
+"""
+
+import asyncio
+import statistics
+import time
+import uuid
+from collections import Counter
+from dataclasses import dataclass, asdict, field
+from typing import Any, Dict, List, Optional
+
+from contextlib import nullcontext
+
+from langchain_core.messages import HumanMessage
+from core import query
+from core.db import get_user_role, warm_user_cache
+
+
+@dataclass
+class BatchItem:
+    thread_id: str
+    message: str
+    user_id: int
+
+
+@dataclass
+class BatchResult:
+    index: int
+    thread_id: str            # original thread_id from the request
+    run_thread_id: str        # thread the item actually ran on
+    user_id: int
+    message: str
+    status: str               # "ok" | "paused" | "timeout" | "error"
+    category: str = "unknown"
+    response: str = ""
+    latency_s: float = 0.0
+    error: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+@dataclass
+class _Group:
+    run_thread_id: str
+    items: List[tuple] = field(default_factory=list)   # (index, item)
+
+
+def _last_ai_text(final_state: dict) -> str:
+    msgs = final_state.get("messages", [])
+    if not msgs:
+        return ""
+    content = getattr(msgs[-1], "content", str(msgs[-1]))
+    return content if isinstance(content, str) else str(content)
+
+
+async def _run_one(graph, index: int, item, run_thread_id: str, timeout_s: float) -> BatchResult:
+    result = BatchResult(
+        index=index,
+        thread_id=item.thread_id,
+        run_thread_id=run_thread_id,
+        user_id=item.user_id,
+        message=item.message,
+        status="ok",
+    )
+    config = {"configurable": {"thread_id": run_thread_id}, "recursion_limit": 20}
+    t0 = time.perf_counter()
+    try:
+        role = await asyncio.to_thread(get_user_role, item.user_id)
+        final_state = await asyncio.wait_for(
+            graph.ainvoke(
+                {
+                    "messages": [HumanMessage(content=item.message)],
+                    "user_id": item.user_id,
+                    "role": role,
+                },
+                config=config,
+            ),
+            timeout=timeout_s,
+        )
+        result.category = final_state.get("ticket_category", "unknown")
+        result.response = _last_ai_text(final_state)
+        if final_state.get("needs_escalation"):
+            result.status = "paused"
+    except asyncio.TimeoutError:
+        result.status = "timeout"
+        result.error = f"timed out after {timeout_s}s"
+    except Exception as e:
+        result.status = "error"
+        result.error = f"{type(e).__name__}: {e}"
+    result.latency_s = time.perf_counter() - t0
+    return result
+
+
+def _plan_groups(requests, group_by_thread: bool, thread_prefix: str) -> List[_Group]:
+    """
+    Map requests onto fresh batch threads.
+    group_by_thread=False → one thread per item (fully independent, max parallelism)
+    group_by_thread=True  → items sharing a thread_id replay in order on one fresh
+                            thread, so multi-turn conversations keep their context
+    """
+    run_id = uuid.uuid4().hex[:8]
+    groups: Dict[Any, _Group] = {}
+    for index, item in enumerate(requests):
+        key = item.thread_id if group_by_thread else index
+        if key not in groups:
+            groups[key] = _Group(run_thread_id=f"{thread_prefix}-{run_id}-{len(groups)}")
+        groups[key].items.append((index, item))
+    return list(groups.values())
+
+
+async def run_batch(
+    graph,
+    requests,
+    *,
+    concurrency: int = 8,
+    timeout_s: float = 60.0,
+    group_by_thread: bool = False,
+    thread_prefix: str = "batch",
+    dry_run: bool = False,
+) -> List[BatchResult]:
+    """
+    Feed *requests* through *graph* (compiled with an async checkpointer).
+    Returns one BatchResult per request, in request order. dry_run=True
+    skips every MySQL write the tools would make.
+    """
+    sem = asyncio.Semaphore(max(1, concurrency))
+    groups = _plan_groups(requests, group_by_thread, thread_prefix)
+    # One IN (...) query for every user instead of a role lookup per item
+    await asyncio.to_thread(warm_user_cache, [item.user_id for item in requests])
+
+    async def _run_group(group: _Group) -> List[BatchResult]:
+        out = []
+        for index, item in group.items:
+            async with sem:
+                out.append(await _run_one(graph, index, item, group.run_thread_id, timeout_s))
+        return out
+
+    # Tasks copy the context when created, so the flag reaches every run's tools
+    with query.dry_run() if dry_run else nullcontext():
+        nested = await asyncio.gather(*(_run_group(g) for g in groups))
+    return sorted((r for rs in nested for r in rs), key=lambda r: r.index)
+
+
+def _percentile(sorted_vals: List[float], pct: float) -> float:
+    if not sorted_vals:
+        return 0.0
+    return sorted_vals[min(len(sorted_vals) - 1, int(len(sorted_vals) * pct))]
+
+
+def summarize(results: List[BatchResult], wall_s: float = 0.0) -> Dict[str, Any]:
+    """Aggregate latency / error / category stats for a finished batch."""
+    latencies = sorted(r.latency_s for r in results if r.status in ("ok", "paused"))
+    statuses = Counter(r.status for r in results)
+    errors = Counter(r.error.split(":")[0] for r in results if r.status == "error" and r.error)
+    return {
+        "total": len(results),
+        "ok": statuses.get("ok", 0),
+        "paused": statuses.get("paused", 0),
+        "timeouts": statuses.get("timeout", 0),
+        "errors": statuses.get("error", 0),
+        "error_types": dict(errors),
+        "categories": dict(Counter(r.category for r in results if r.status in ("ok", "paused"))),
+        "latency_s": {
+            "mean": statistics.fmean(latencies) if latencies else 0.0,
+            "p50": _percentile(latencies, 0.50),
+            "p95": _percentile(latencies, 0.95),
+            "p99": _percentile(latencies, 0.99),
+            "max": latencies[-1] if latencies else 0.0,
+        },
+        "wall_s": wall_s,
+        "throughput_rps": (len(results) / wall_s) if wall_s else 0.0,
+    }
@@ -0,0 +1,186 @@
+"""
+chat_log.py — Background, batched chat-log writer with rotation
+===============================================================
+Every chat turn is appended to CHAT_LOG_FILE (JSONL) for fine-tuning and
+analysis. The request path only enqueues the entry; a daemon thread drains
+the bounded queue and writes it in batches:
+
+  • flush          every CHAT_LOG_FLUSH_INTERVAL_S, or as soon as
+                   CHAT_LOG_BATCH_SIZE entries are waiting
+  • back-pressure  the queue holds at most CHAT_LOG_QUEUE_SIZE entries; when
+                   the disk can't keep up new entries are dropped (and
+                   counted) instead of slowing down chats
+  • rotation       by size (CHAT_LOG_MAX_BYTES) and/or at the first write of
+                   a new day (CHAT_LOG_ROTATE_DAILY); rotated files are
+                   renamed <name>.<YYYYmmdd-HHMMSS>.jsonl and optionally
+                   gzipped (CHAT_LOG_GZIP)
+  • multi-worker   each batch is appended (and rotation decided) under an
+                   flock on <file>.lock, so several uvicorn workers can
+                   share one log file without interleaving lines
+  • shutdown       stop() flushes everything still queued
+
+stats() returns queued / written / dropped counters for the admin endpoint.
+"""
+
+import gzip
+import json
+import os
+import queue
+import shutil
+import threading
+from contextlib import contextmanager
+from datetime import date, datetime
+from typing import Dict, List, Optional
+
+from core.config import settings
+
+try:
+    import fcntl
+except ImportError:   # Windows — single-worker only
+    fcntl = None
+
+
+class ChatLogWriter(threading.Thread):
+    """Daemon thread that owns all writes to the chat log file."""
+
+    def __init__(
+        self,
+        path: str = None,
+        *,
+        queue_size: int = None,
+        batch_size: int = None,
+        flush_interval_s: float = None,
+        max_bytes: int = None,
+        rotate_daily: bool = None,
+        gzip_rotated: bool = None,
+    ):
+        super().__init__(name="chat-log-writer", daemon=True)
+        self.path = path or settings.CHAT_LOG_FILE
+        self.batch_size = max(1, batch_size or settings.CHAT_LOG_BATCH_SIZE)
+        self.flush_interval_s = flush_interval_s if flush_interval_s is not None else settings.CHAT_LOG_FLUSH_INTERVAL_S
+        self.max_bytes = max_bytes if max_bytes is not None else settings.CHAT_LOG_MAX_BYTES
+        self.rotate_daily = rotate_daily if rotate_daily is not None else settings.CHAT_LOG_ROTATE_DAILY
+        self.gzip_rotated = gzip_rotated if gzip_rotated is not None else settings.CHAT_LOG_GZIP
+
+        self._queue: "queue.Queue[dict]" = queue.Queue(maxsize=queue_size or settings.CHAT_LOG_QUEUE_SIZE)
+        self._wake = threading.Event()
+        self._stop_event = threading.Event()
+        self._counters = {"written": 0, "dropped": 0, "flushes": 0, "rotations": 0, "write_errors": 0}
+        self._counter_lock = threading.Lock()
+
+    # -- request path ------------------------------------------------------
+
+    def enqueue(self, entry: dict) -> bool:
+        """Queue one log entry without blocking. Returns False if it was dropped."""
+        try:
+            self._queue.put_nowait(entry)
+        except queue.Full:
+            self._count("dropped")
+            return False
+        if self._queue.qsize() >= self.batch_size:
+            self._wake.set()
+        return True
+
+    # -- writer thread -----------------------------------------------------
+
+    def run(self):
+        while not self._stop_event.is_set():
+            self._wake.wait(self.flush_interval_s)
+            self._wake.clear()
+            self.flush()
+        self.flush()
+
+    def stop(self, timeout: float = 10.0):
+        """Stop the thread after writing everything still queued."""
+        self._stop_event.set()
+        self._wake.set()
+        if self.is_alive():
+            self.join(timeout)
+        else:
+            self.flush()
+
+    def flush(self) -> int:
+        """Drain the queue into the log file. Returns the number of entries written."""
+        written = 0
+        while True:
+            batch = self._drain(self.batch_size)
+            if not batch:
+                return written
+            try:
+                self._write(batch)
+                written += len(batch)
+                self._count("written", len(batch))
+                self._count("flushes")
+            except Exception as e:
+                self._count("write_errors")
+                self._count("dropped", len(batch))
+                print(f"[ChatLog] Failed to write {len(batch)} entries: {e}")
+
+    def _drain(self, limit: int) -> List[dict]:
+        batch = []
+        while len(batch) < limit:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, batch: List[dict]) -> None:
+        data = "".join(json.dumps(entry, ensure_ascii=False) + "\n" for entry in batch)
+        with self._file_lock():
+            self._maybe_rotate()
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(data)
+
+    # -- rotation ----------------------------------------------------------
+
+    @contextmanager
+    def _file_lock(self):
+        if fcntl is None:
+            yield
+            return
+        with open(self.path + ".lock", "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _maybe_rotate(self) -> Optional[str]:
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        if st.st_size == 0:
+            return None
+        too_big = self.max_bytes > 0 and st.st_size >= self.max_bytes
+        stale = self.rotate_daily and date.fromtimestamp(st.st_mtime) != date.today()
+        if not (too_big or stale):
+            return None
+
+        root, ext = os.path.splitext(self.path)
+        stamp = datetime.fromtimestamp(st.st_mtime).strftime("%Y%m%d-%H%M%S")
+        target = f"{root}.{stamp}{ext}"
+        n = 1
+        while os.path.exists(target) or os.path.exists(target + ".gz"):
+            target = f"{root}.{stamp}-{n}{ext}"
+            n += 1
+        os.replace(self.path, target)
+        if self.gzip_rotated:
+            with open(target, "rb") as src, gzip.open(target + ".gz", "wb") as dst:
+                shutil.copyfileobj(src, dst)
+            os.remove(target)
+            target += ".gz"
+        self._count("rotations")
+        print(f"[ChatLog] Rotated to {target}")
+        return target
+
+    # -- metrics -----------------------------------------------------------
+
+    def _count(self, name: str, n: int = 1) -> None:
+        with self._counter_lock:
+            self._counters[name] += n
+
+    def stats(self) -> Dict[str, int]:
+        with self._counter_lock:
+            return {"queued": self._queue.qsize(), **self._counters}
@@ -0,0 +1,531 @@
+"""
+checkpointer.py — Pluggable LangGraph checkpoint backends
+=========================================================
+CHECKPOINT_BACKEND selects where conversation state is persisted:
+
+  sqlite (default) → PooledSqliteSaver
+      WAL-mode SQLite file (CHECKPOINT_DB) with ONE connection PER THREAD,
+      instead of a single shared connection behind a global lock.
+      WAL lets readers run alongside the writer, busy_timeout makes
+      concurrent writers (threads or other uvicorn workers) wait instead
+      of failing with "database is locked".
+
+  mysql → MySQLSaver
+      Stores checkpoints in the existing MySQL database (tables
+      lg_checkpoints / lg_checkpoint_writes) through the pool in core.db.
+      Safe for any number of workers / hosts.
+
+Both savers implement the async API by running the sync methods in a worker
+thread, so the same instance serves app.invoke and app.ainvoke.
+
+Both also keep a tiny per-thread status row (thread_status /
+lg_thread_status: status, category, updated_at) next to the checkpoints.
+The API writes it after every turn, so "is this thread paused for a human?"
+is a single primary-key read instead of a get_state that deserialises the
+whole message history.
+"""
+
+import asyncio
+import json
+import random
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, AsyncIterator, Iterator, Optional, Sequence
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+    writes_sort_key,
+)
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+from langgraph.checkpoint.sqlite import SqliteSaver
+
+from core.config import settings
+
+
+# ---------------------------------------------------------------------------
+# Async adapters — shared by both backends
+# ---------------------------------------------------------------------------
+
+class _ThreadedAsyncMixin:
+    """Implements the BaseCheckpointSaver async API on top of the sync one."""
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[dict] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        # Materialise in the worker thread — the sync generator holds a cursor
+        rows = await asyncio.to_thread(
+            lambda: list(self.list(config, filter=filter, before=before, limit=limit))
+        )
+        for row in rows:
+            yield row
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await asyncio.to_thread(self.delete_thread, thread_id)
+
+    async def aget_delta_channel_history(self, *, config: RunnableConfig, channels: Sequence[str]):
+        return await asyncio.to_thread(
+            lambda: self.get_delta_channel_history(config=config, channels=channels)
+        )
+
+    async def aget_thread_status(self, thread_id: str) -> Optional[dict]:
+        return await asyncio.to_thread(self.get_thread_status, thread_id)
+
+    async def aput_thread_status(self, thread_id: str, status: str, category: Optional[str] = None) -> None:
+        await asyncio.to_thread(self.put_thread_status, thread_id, status, category)
+
+
+def _status_row(row) -> Optional[dict]:
+    if not row:
+        return None
+    status, category, updated_at = row
+    return {"status": status, "category": category, "updated_at": float(updated_at)}
+
+
+# ---------------------------------------------------------------------------
+# SQLite — WAL mode, one connection per thread
+# ---------------------------------------------------------------------------
+
+class PooledSqliteSaver(_ThreadedAsyncMixin, SqliteSaver):
+    """
+    SqliteSaver with a thread-local connection instead of one shared,
+    lock-guarded connection. All query logic is inherited unchanged.
+    """
+
+    def __init__(self, path: str, *, busy_timeout_ms: int = 5000, serde=None):
+        BaseCheckpointSaver.__init__(self, serde=serde)
+        self.jsonplus_serde = JsonPlusSerializer()
+        self.path = path
+        self.busy_timeout_ms = busy_timeout_ms
+        self.is_setup = False
+        self._local = threading.local()
+        self._setup_lock = threading.Lock()
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False, timeout=self.busy_timeout_ms / 1000)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")      # safe with WAL, far fewer fsyncs
+            conn.execute(f"PRAGMA busy_timeout={self.busy_timeout_ms}")
+            self._local.conn = conn
+        return conn
+
+    def setup(self) -> None:
+        if self.is_setup:
+            return
+        with self._setup_lock:
+            if not self.is_setup:
+                # thread_status first: SqliteSaver.setup sets is_setup, and other
+                # threads check it without the lock
+                self.conn.execute(_SQLITE_STATUS_SCHEMA)
+                self.conn.commit()
+                SqliteSaver.setup(self)
+
+    @contextmanager
+    def cursor(self, transaction: bool = True) -> Iterator[sqlite3.Cursor]:
+        self.setup()
+        conn = self.conn
+        cur = conn.cursor()
+        try:
+            yield cur
+        finally:
+            if transaction:
+                conn.commit()
+            cur.close()
+
+    # -- thread status -----------------------------------------------------
+
+    def get_thread_status(self, thread_id: str) -> Optional[dict]:
+        with self.cursor(transaction=False) as cur:
+            cur.execute(
+                "SELECT status, category, updated_at FROM thread_status WHERE thread_id = ?",
+                (str(thread_id),),
+            )
+            return _status_row(cur.fetchone())
+
+    def put_thread_status(self, thread_id: str, status: str, category: Optional[str] = None) -> None:
+        with self.cursor() as cur:
+            cur.execute(
+                "INSERT OR REPLACE INTO thread_status (thread_id, status, category, updated_at) "
+                "VALUES (?, ?, ?, ?)",
+                (str(thread_id), status, category, time.time()),
+            )
+
+    def delete_thread(self, thread_id: str) -> None:
+        SqliteSaver.delete_thread(self, thread_id)
+        with self.cursor() as cur:
+            cur.execute("DELETE FROM thread_status WHERE thread_id = ?", (str(thread_id),))
+
+
+_SQLITE_STATUS_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS thread_status (
+        thread_id  TEXT PRIMARY KEY,
+        status     TEXT NOT NULL,
+        category   TEXT,
+        updated_at REAL NOT NULL
+    )
+"""
+
+
+# ---------------------------------------------------------------------------
+# MySQL — reuses the application database via core.db's connection pool
+# ---------------------------------------------------------------------------
+
+_MYSQL_SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS lg_checkpoints (
+        thread_id            VARCHAR(150) NOT NULL,
+        checkpoint_ns        VARCHAR(255) NOT NULL DEFAULT '',
+        checkpoint_id        VARCHAR(64)  NOT NULL,
+        parent_checkpoint_id VARCHAR(64),
+        type                 VARCHAR(32),
+        checkpoint           LONGBLOB,
+        metadata             LONGBLOB,
+        created_at           TIMESTAMP    NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id)
+    ) ENGINE=InnoDB
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS lg_checkpoint_writes (
+        thread_id     VARCHAR(150) NOT NULL,
+        checkpoint_ns VARCHAR(255) NOT NULL DEFAULT '',
+        checkpoint_id VARCHAR(64)  NOT NULL,
+        task_id       VARCHAR(64)  NOT NULL,
+        task_path     VARCHAR(255) NOT NULL DEFAULT '',
+        idx           INT          NOT NULL,
+        channel       VARCHAR(255) NOT NULL,
+        type          VARCHAR(32),
+        value         LONGBLOB,
+        PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx)
+    ) ENGINE=InnoDB
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS lg_thread_status (
+        thread_id  VARCHAR(150) NOT NULL PRIMARY KEY,
+        status     VARCHAR(16)  NOT NULL,
+        category   VARCHAR(32),
+        updated_at DOUBLE       NOT NULL
+    ) ENGINE=InnoDB
+    """,
+)
+
+
+class MySQLSaver(_ThreadedAsyncMixin, BaseCheckpointSaver):
+    """Checkpoint saver backed by the application's MySQL database."""
+
+    def __init__(self, *, serde=None):
+        super().__init__(serde=serde)
+        self.is_setup = False
+        self._setup_lock = threading.Lock()
+
+    @contextmanager
+    def cursor(self):
+        from core.db import get_db_connection
+
+        self.setup()
+        conn = get_db_connection()
+        if not conn:
+            raise RuntimeError("[Checkpointer] MySQL connection unavailable")
+        cur = conn.cursor()
+        try:
+            yield cur
+        finally:
+            cur.close()
+            conn.close()   # returns connection to pool
+
+    def setup(self) -> None:
+        if self.is_setup:
+            return
+        from core.db import get_db_connection
+
+        with self._setup_lock:
+            if self.is_setup:
+                return
+            conn = get_db_connection()
+            if not conn:
+                raise RuntimeError("[Checkpointer] MySQL connection unavailable")
+            cur = conn.cursor()
+            try:
+                for ddl in _MYSQL_SCHEMA:
+                    cur.execute(ddl)
+            finally:
+                cur.close()
+                conn.close()
+            self.is_setup = True
+
+    # -- helpers -----------------------------------------------------------
+
+    def _pending_writes(self, cur, thread_id: str, checkpoint_ns: str, checkpoint_id: str):
+        cur.execute(
+            "SELECT task_id, channel, type, value, task_path, idx FROM lg_checkpoint_writes "
+            "WHERE thread_id = %s AND checkpoint_ns = %s AND checkpoint_id = %s",
+            (thread_id, checkpoint_ns, checkpoint_id),
+        )
+        rows = cur.fetchall()
+        return [
+            (task_id, channel, self.serde.loads_typed((type_, bytes(value))))
+            for task_id, channel, type_, value, _, _ in sorted(
+                rows, key=lambda r: writes_sort_key(r[4], r[0], r[5])
+            )
+        ]
+
+    def _to_tuple(self, cur, row) -> CheckpointTuple:
+        thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, type_, checkpoint, metadata = row
+        return CheckpointTuple(
+            {
+                "configurable": {
+                    "thread_id": thread_id,
+                    "checkpoint_ns": checkpoint_ns,
+                    "checkpoint_id": checkpoint_id,
+                }
+            },
+            self.serde.loads_typed((type_, bytes(checkpoint))),
+            json.loads(bytes(metadata)) if metadata is not None else {},
+            (
+                {
+                    "configurable": {
+                        "thread_id": thread_id,
+                        "checkpoint_ns": checkpoint_ns,
+                        "checkpoint_id": parent_checkpoint_id,
+                    }
+                }
+                if parent_checkpoint_id
+                else None
+            ),
+            self._pending_writes(cur, thread_id, checkpoint_ns, checkpoint_id),
+        )
+
+    # -- BaseCheckpointSaver API -------------------------------------------
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        thread_id = str(config["configurable"]["thread_id"])
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        cols = "thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, type, checkpoint, metadata"
+        with self.cursor() as cur:
+            if checkpoint_id := get_checkpoint_id(config):
+                cur.execute(
+                    f"SELECT {cols} FROM lg_checkpoints "
+                    "WHERE thread_id = %s AND checkpoint_ns = %s AND checkpoint_id = %s",
+                    (thread_id, checkpoint_ns, checkpoint_id),
+                )
+            else:
+                cur.execute(
+                    f"SELECT {cols} FROM lg_checkpoints "
+                    "WHERE thread_id = %s AND checkpoint_ns = %s "
+                    "ORDER BY checkpoint_id DESC LIMIT 1",
+                    (thread_id, checkpoint_ns),
+                )
+            row = cur.fetchone()
+            return self._to_tuple(cur, row) if row else None
+
+    def list(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[dict] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[CheckpointTuple]:
+        wheres, params = [], []
+        if config is not None:
+            wheres.append("thread_id = %s")
+            params.append(str(config["configurable"]["thread_id"]))
+            checkpoint_ns = config["configurable"].get("checkpoint_ns")
+            if checkpoint_ns is not None:
+                wheres.append("checkpoint_ns = %s")
+                params.append(checkpoint_ns)
+            if checkpoint_id := get_checkpoint_id(config):
+                wheres.append("checkpoint_id = %s")
+                params.append(checkpoint_id)
+        if before is not None:
+            wheres.append("checkpoint_id < %s")
+            params.append(get_checkpoint_id(before))
+
+        where = ("WHERE " + " AND ".join(wheres)) if wheres else ""
+        query = (
+            "SELECT thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, type, checkpoint, metadata "
+            f"FROM lg_checkpoints {where} ORDER BY checkpoint_id DESC"
+        )
+        # Metadata filters are applied in Python, so LIMIT can only be pushed
+        # down to SQL when there is no filter.
+        if limit is not None and not filter:
+            query += " LIMIT %s"
+            params.append(limit)
+
+        with self.cursor() as cur:
+            cur.execute(query, tuple(params))
+            rows = cur.fetchall()
+            emitted = 0
+            for row in rows:
+                tup = self._to_tuple(cur, row)
+                if filter and any(tup.metadata.get(k) != v for k, v in filter.items()):
+                    continue
+                yield tup
+                emitted += 1
+                if limit is not None and emitted >= limit:
+                    return
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"]["checkpoint_ns"]
+        type_, serialized_checkpoint = self.serde.dumps_typed(checkpoint)
+        serialized_metadata = json.dumps(
+            get_checkpoint_metadata(config, metadata), ensure_ascii=False
+        ).encode("utf-8", "ignore")
+        with self.cursor() as cur:
+            cur.execute(
+                "REPLACE INTO lg_checkpoints "
+                "(thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, type, checkpoint, metadata) "
+                "VALUES (%s, %s, %s, %s, %s, %s, %s)",
+                (
+                    str(thread_id),
+                    checkpoint_ns,
+                    checkpoint["id"],
+                    config["configurable"].get("checkpoint_id"),
+                    type_,
+                    serialized_checkpoint,
+                    serialized_metadata,
+                ),
+            )
+        return {
+            "configurable": {
+                "thread_id": thread_id,
+                "checkpoint_ns": checkpoint_ns,
+                "checkpoint_id": checkpoint["id"],
+            }
+        }
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        verb = "REPLACE" if all(w[0] in WRITES_IDX_MAP for w in writes) else "INSERT IGNORE"
+        rows = [
+            (
+                str(config["configurable"]["thread_id"]),
+                str(config["configurable"]["checkpoint_ns"]),
+                str(config["configurable"]["checkpoint_id"]),
+                task_id,
+                task_path,
+                WRITES_IDX_MAP.get(channel, idx),
+                channel,
+                *self.serde.dumps_typed(value),
+            )
+            for idx, (channel, value) in enumerate(writes)
+        ]
+        if not rows:
+            return
+        with self.cursor() as cur:
+            cur.executemany(
+                f"{verb} INTO lg_checkpoint_writes "
+                "(thread_id, checkpoint_ns, checkpoint_id, task_id, task_path, idx, channel, type, value) "
+                "VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)",
+                rows,
+            )
+
+    def delete_thread(self, thread_id: str) -> None:
+        with self.cursor() as cur:
+            cur.execute("DELETE FROM lg_checkpoints WHERE thread_id = %s", (str(thread_id),))
+            cur.execute("DELETE FROM lg_checkpoint_writes WHERE thread_id = %s", (str(thread_id),))
+            cur.execute("DELETE FROM lg_thread_status WHERE thread_id = %s", (str(thread_id),))
+
+    def get_thread_status(self, thread_id: str) -> Optional[dict]:
+        with self.cursor() as cur:
+            cur.execute(
+                "SELECT status, category, updated_at FROM lg_thread_status WHERE thread_id = %s",
+                (str(thread_id),),
+            )
+            return _status_row(cur.fetchone())
+
+    def put_thread_status(self, thread_id: str, status: str, category: Optional[str] = None) -> None:
+        with self.cursor() as cur:
+            cur.execute(
+                "REPLACE INTO lg_thread_status (thread_id, status, category, updated_at) "
+                "VALUES (%s, %s, %s, %s)",
+                (str(thread_id), status, category, time.time()),
+            )
+
+    def get_next_version(self, current: Optional[str], channel: None) -> str:
+        # Same monotonically increasing string versions as SqliteSaver
+        if current is None:
+            current_v = 0
+        elif isinstance(current, int):
+            current_v = current
+        else:
+            current_v = int(current.split(".")[0])
+        return f"{current_v + 1:032}.{random.random():016}"
+
+
+# ---------------------------------------------------------------------------
+# Factory
+# ---------------------------------------------------------------------------
+
+_checkpointer: Optional[BaseCheckpointSaver] = None
+_lock = threading.Lock()
+
+
+def build_checkpointer(backend: str = None) -> BaseCheckpointSaver:
+    """Build a new saver for *backend* (defaults to CHECKPOINT_BACKEND)."""
+    backend = (backend or settings.CHECKPOINT_BACKEND).lower()
+    if backend == "sqlite":
+        return PooledSqliteSaver(settings.CHECKPOINT_DB, busy_timeout_ms=settings.CHECKPOINT_BUSY_TIMEOUT_MS)
+    if backend == "mysql":
+        return MySQLSaver()
+    raise ValueError(f"Unknown CHECKPOINT_BACKEND '{backend}'. Valid: sqlite, mysql")
+
+
+def get_checkpointer() -> BaseCheckpointSaver:
+    """Process-wide checkpointer shared by every compiled graph."""
+    global _checkpointer
+    if _checkpointer is None:
+        with _lock:
+            if _checkpointer is None:
+                _checkpointer = build_checkpointer()
+                print(f"[Checkpointer] Using backend={settings.CHECKPOINT_BACKEND}")
+    return _checkpointer
@@ -0,0 +1,245 @@
+"""
+circuit_breaker.py — Per-provider circuit breakers for LLM_PROVIDER=auto
+========================================================================
+Without a breaker, every request tries the primary first, even while it is
+hard-down, and pays the full failure latency before the fallback runs. Each
+provider in the auto chain is wrapped in a GuardedModel that consults its
+provider's CircuitBreaker:
+
+  closed     normal traffic. Outcomes of the last LLM_BREAKER_WINDOW calls
+             are kept. Once at least LLM_BREAKER_MIN_CALLS are in the window
+             and the error rate reaches LLM_BREAKER_ERROR_RATE (or the EWMA
+             latency exceeds LLM_BREAKER_MAX_EWMA_S, when set) → open
+  open       calls fail immediately with CircuitOpenError, so the fallback
+             chain / hedged model routes straight to the healthy provider.
+             After LLM_BREAKER_COOLDOWN_S → half_open
+  half_open  ONE probe request is let through; success closes the breaker,
+             failure re-opens it for another cooldown
+
+Only provider faults count as failures: transport and timeout errors and the
+SDKs' API / HTTP-status errors. A reply that fails to parse or validate
+(with_structured_output) still means the provider answered, so it counts as
+a success; anything else (cancellation, local throttling, our own bugs)
+just frees the probe slot without an outcome.
+
+State is per process and is exposed on GET /api/v1/admin/llm/breakers and
+as cso_llm_breaker_state{provider} (0 closed, 1 half-open, 2 open).
+"""
+
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, Iterator, AsyncIterator, Optional
+
+import anthropic
+import groq
+import httpx
+from google.genai import errors as genai_errors
+from langchain_core.exceptions import ModelError, OutputParserException
+from langchain_core.runnables import Runnable, RunnableConfig
+from pydantic import ValidationError
+
+from core.config import settings
+from core.metrics import REGISTRY, Counter, Gauge
+
+CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+_STATE_VALUE = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+BREAKER_STATE = REGISTRY.register(Gauge(
+    "cso_llm_breaker_state", "LLM provider circuit breaker state (0 closed, 1 half-open, 2 open).",
+    ("provider",)))
+BREAKER_TRANSITIONS = REGISTRY.register(Counter(
+    "cso_llm_breaker_transitions_total", "LLM provider circuit breaker state changes.", ("provider", "state")))
+BREAKER_REJECTED = REGISTRY.register(Counter(
+    "cso_llm_breaker_rejected_total", "Calls short-circuited by an open breaker.", ("provider",)))
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling a provider whose breaker is open."""
+
+
+# OSError covers socket / timeout errors and requests' (HuggingFace) HTTP errors
+_PROVIDER_ERRORS = (OSError, httpx.HTTPError, ModelError, groq.APIError, anthropic.APIError, genai_errors.APIError)
+_PARSE_ERRORS = (OutputParserException, ValidationError)
+
+
+class CircuitBreaker:
+    """Error-rate / EWMA-latency breaker for one provider."""
+
+    def __init__(self, name: str, *, window: int = None, min_calls: int = None, error_rate: float = None,
+                 cooldown_s: float = None, max_ewma_s: float = None, alpha: float = None):
+        self.name = name
+        self.window = window or settings.LLM_BREAKER_WINDOW
+        self.min_calls = min_calls or settings.LLM_BREAKER_MIN_CALLS
+        self.error_rate = error_rate if error_rate is not None else settings.LLM_BREAKER_ERROR_RATE
+        self.cooldown_s = cooldown_s if cooldown_s is not None else settings.LLM_BREAKER_COOLDOWN_S
+        self.max_ewma_s = max_ewma_s if max_ewma_s is not None else settings.LLM_BREAKER_MAX_EWMA_S
+        self.alpha = alpha if alpha is not None else settings.LLM_BREAKER_EWMA_ALPHA
+
+        self.state = CLOSED
+        self.ewma_latency_s: Optional[float] = None
+        self._outcomes: deque = deque(maxlen=self.window)    # True = success
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._last_error = ""
+        self._lock = threading.Lock()
+        BREAKER_STATE.set(0, provider=name)
+
+    # -- state machine (caller holds the lock) -----------------------------------
+
+    def _transition(self, state: str) -> None:
+        if state == self.state:
+            return
+        self.state = state
+        if state == OPEN:
+            self._opened_at = time.monotonic()
+        if state == CLOSED:
+            self._outcomes.clear()
+        self._probe_in_flight = False
+        BREAKER_STATE.set(_STATE_VALUE[state], provider=self.name)
+        BREAKER_TRANSITIONS.inc(provider=self.name, state=state)
+        print(f"[Breaker] {self.name} → {state}")
+
+    def _failure_rate(self) -> float:
+        return self._outcomes.count(False) / len(self._outcomes) if self._outcomes else 0.0
+
+    # -- public API ----------------------------------------------------------
+
+    def allow(self) -> bool:
+        """True if a call may go to the provider now (claims the probe slot when half-open)."""
+        with self._lock:
+            if self.state == OPEN and time.monotonic() - self._opened_at >= self.cooldown_s:
+                self._transition(HALF_OPEN)
+            if self.state == CLOSED:
+                return True
+            if self.state == HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+        BREAKER_REJECTED.inc(provider=self.name)
+        return False
+
+    def record(self, success: bool, latency_s: float, error: BaseException = None) -> None:
+        with self._lock:
+            self.ewma_latency_s = latency_s if self.ewma_latency_s is None else (
+                self.alpha * latency_s + (1 - self.alpha) * self.ewma_latency_s)
+            if error is not None:
+                self._last_error = f"{type(error).__name__}: {error}"[:200]
+            if self.state == HALF_OPEN:
+                self._transition(CLOSED if success else OPEN)
+                return
+            self._outcomes.append(success)
+            if self.state == CLOSED and len(self._outcomes) >= self.min_calls:
+                too_slow = self.max_ewma_s > 0 and self.ewma_latency_s > self.max_ewma_s
+                if self._failure_rate() >= self.error_rate or too_slow:
+                    self._transition(OPEN)
+
+    def release(self) -> None:
+        """The call was cancelled before it finished — free the half-open probe slot."""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            retry_in = None
+            if self.state == OPEN:
+                retry_in = round(max(self.cooldown_s - (time.monotonic() - self._opened_at), 0.0), 1)
+            return {
+                "state": self.state,
+                "error_rate": round(self._failure_rate(), 3),
+                "calls_in_window": len(self._outcomes),
+                "ewma_latency_s": round(self.ewma_latency_s, 3) if self.ewma_latency_s is not None else None,
+                "retry_in_s": retry_in,
+                "last_error": self._last_error,
+            }
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(provider: str) -> CircuitBreaker:
+    with _breakers_lock:
+        breaker = _breakers.get(provider)
+        if breaker is None:
+            breaker = _breakers[provider] = CircuitBreaker(provider)
+        return breaker
+
+
+def breaker_states() -> Dict[str, Dict[str, Any]]:
+    with _breakers_lock:
+        breakers = list(_breakers.values())
+    return {b.name: b.snapshot() for b in breakers}
+
+
+class GuardedModel(Runnable):
+    """
+    Runs *bound* (a chat model or its tool binding) through a provider breaker.
+    A plain Runnable rather than a chat model, so it adds no LLM run of its own
+    to callbacks / metrics; the config is passed straight through.
+    """
+
+    def __init__(self, bound: Runnable, provider: str, breaker: CircuitBreaker = None):
+        self.bound = bound
+        self.provider = provider
+        self.breaker = breaker or get_breaker(provider)
+
+    def bind_tools(self, tools, **kwargs) -> "GuardedModel":
+        return GuardedModel(self.bound.bind_tools(tools, **kwargs), self.provider, self.breaker)
+
+    def with_structured_output(self, schema, **kwargs) -> "GuardedModel":
+        return GuardedModel(self.bound.with_structured_output(schema, **kwargs), self.provider, self.breaker)
+
+    def _check(self) -> None:
+        if not self.breaker.allow():
+            raise CircuitOpenError(f"LLM provider '{self.provider}' circuit is open")
+
+    def _done(self, start: float, error: BaseException = None) -> None:
+        if error is None or isinstance(error, _PARSE_ERRORS):
+            self.breaker.record(True, time.perf_counter() - start)      # the provider answered
+        elif isinstance(error, _PROVIDER_ERRORS):
+            self.breaker.record(False, time.perf_counter() - start, error)
+        else:
+            self.breaker.release()          # cancelled (losing hedge leg), RateLimitTimeout, our own bugs
+
+    def invoke(self, input, config: Optional[RunnableConfig] = None, **kwargs):
+        self._check()
+        start = time.perf_counter()
+        try:
+            result = self.bound.invoke(input, config, **kwargs)
+        except BaseException as e:
+            self._done(start, e)
+            raise
+        self._done(start)
+        return result
+
+    async def ainvoke(self, input, config: Optional[RunnableConfig] = None, **kwargs):
+        self._check()
+        start = time.perf_counter()
+        try:
+            result = await self.bound.ainvoke(input, config, **kwargs)
+        except BaseException as e:
+            self._done(start, e)
+            raise
+        self._done(start)
+        return result
+
+    def stream(self, input, config: Optional[RunnableConfig] = None, **kwargs) -> Iterator:
+        self._check()
+        start = time.perf_counter()
+        try:
+            yield from self.bound.stream(input, config, **kwargs)
+        except BaseException as e:
+            self._done(start, e)
+            raise
+        self._done(start)
+
+    async def astream(self, input, config: Optional[RunnableConfig] = None, **kwargs) -> AsyncIterator:
+        self._check()
+        start = time.perf_counter()
+        try:
+            async for chunk in self.bound.astream(input, config, **kwargs):
+                yield chunk
+        except BaseException as e:
+            self._done(start, e)
+            raise
+        self._done(start)
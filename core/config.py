@@ -16,6 +16,35 @@ class Config:
     AUTO_PRIMARY_MODEL     = os.getenv("AUTO_PRIMARY_MODEL",     "gemini-2.5-flash")
     AUTO_FALLBACK_PROVIDER = os.getenv("AUTO_FALLBACK_PROVIDER", "groq").lower()
     AUTO_FALLBACK_MODEL    = os.getenv("AUTO_FALLBACK_MODEL",    "llama-3.1-8b-instant")
+    # fallback → switch only after the primary raises | hedge → also fire the
+    # fallback once the primary exceeds its latency budget (core/hedging.py)
+    AUTO_STRATEGY          = os.getenv("AUTO_STRATEGY", "fallback").lower()
+    HEDGE_QUANTILE         = float(os.getenv("HEDGE_QUANTILE", 0.95))
+    HEDGE_INITIAL_BUDGET_S = float(os.getenv("HEDGE_INITIAL_BUDGET_S", 8))    # until enough samples
+    HEDGE_MIN_BUDGET_S     = float(os.getenv("HEDGE_MIN_BUDGET_S", 1))
+    HEDGE_MAX_BUDGET_S     = float(os.getenv("HEDGE_MAX_BUDGET_S", 30))
+    HEDGE_WINDOW           = int(os.getenv("HEDGE_WINDOW", 200))             # latency samples kept per model
+    # Per-provider circuit breakers for the auto chain (core/circuit_breaker.py)
+    LLM_BREAKER_ENABLED    = os.getenv("LLM_BREAKER_ENABLED", "true").lower() == "true"
+    LLM_BREAKER_WINDOW     = int(os.getenv("LLM_BREAKER_WINDOW", 20))        # recent calls considered
+    LLM_BREAKER_MIN_CALLS  = int(os.getenv("LLM_BREAKER_MIN_CALLS", 5))
+    LLM_BREAKER_ERROR_RATE = float(os.getenv("LLM_BREAKER_ERROR_RATE", 0.5))
+    LLM_BREAKER_COOLDOWN_S = float(os.getenv("LLM_BREAKER_COOLDOWN_S", 30))   # open → half-open probe
+    LLM_BREAKER_MAX_EWMA_S = float(os.getenv("LLM_BREAKER_MAX_EWMA_S", 0))    # 0 = don't trip on latency
+    LLM_BREAKER_EWMA_ALPHA = float(os.getenv("LLM_BREAKER_EWMA_ALPHA", 0.2))
+
+    # Client-side token-bucket rate limits per (provider, model) (core/rate_limit.py)
+    # (rpm, tpm) per provider, 0 = unlimited; Groq's free tier is the tight one
+    RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+    RATE_LIMITS = {
+        "groq":        (int(os.getenv("RATE_LIMIT_GROQ_RPM", 30)), int(os.getenv("RATE_LIMIT_GROQ_TPM", 12000))),
+        "gemini":      (int(os.getenv("RATE_LIMIT_GEMINI_RPM", 0)), int(os.getenv("RATE_LIMIT_GEMINI_TPM", 0))),
+        "anthropic":   (int(os.getenv("RATE_LIMIT_ANTHROPIC_RPM", 0)), int(os.getenv("RATE_LIMIT_ANTHROPIC_TPM", 0))),
+        "huggingface": (int(os.getenv("RATE_LIMIT_HUGGINGFACE_RPM", 0)), int(os.getenv("RATE_LIMIT_HUGGINGFACE_TPM", 0))),
+    }
+    RATE_LIMIT_MODEL_OVERRIDES = os.getenv("RATE_LIMIT_MODEL_OVERRIDES", "")   # "model=rpm/tpm,model=rpm/tpm"
+    RATE_LIMIT_MAX_WAIT_S = float(os.getenv("RATE_LIMIT_MAX_WAIT_S", 20))       # queued longer → RateLimitTimeout
+    RATE_LIMIT_COMPLETION_TOKENS = int(os.getenv("RATE_LIMIT_COMPLETION_TOKENS", 512))  # estimate when max_tokens unset
 
     # RAG Settings
     EMBEDDING_PROVIDER = os.getenv("EMBEDDING_PROVIDER", "huggingface").lower()
@@ -24,6 +53,103 @@ class Config:
     CHROMA_DB_DIR = os.getenv("CHROMA_DB_DIR", "./chroma_db")
     ANNOTATED_API_KEY = os.getenv("ANTHROPIC_API_KEY")
 
+    # LangGraph checkpointer (conversation memory)
+    # sqlite → WAL file with a connection per thread | mysql → tables in MYSQL_DATABASE
+    CHECKPOINT_BACKEND = os.getenv("CHECKPOINT_BACKEND", "sqlite").lower()
+    CHECKPOINT_DB = os.getenv("CHECKPOINT_DB", "checkpoint.db")
+    CHECKPOINT_BUSY_TIMEOUT_MS = int(os.getenv("CHECKPOINT_BUSY_TIMEOUT_MS", 5000))
+
+    # MySQL pool (core/db.py): kept-open connections, extra ones allowed under load
+    # (closed on release), and how long a checkout waits when all are in use
+    DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 5))
+    DB_POOL_MAX_OVERFLOW = int(os.getenv("DB_POOL_MAX_OVERFLOW", 5))
+    DB_POOL_TIMEOUT_S = float(os.getenv("DB_POOL_TIMEOUT_S", 5))
+    DB_POOL_PING_AFTER_S = float(os.getenv("DB_POOL_PING_AFTER_S", 5))   # idle longer → ping / reconnect on checkout
+    DB_CONNECT_TIMEOUT_S = int(os.getenv("DB_CONNECT_TIMEOUT_S", 10))
+
+    # Tool queries (core/query.py): MAX_EXECUTION_TIME hint on SELECTs (0 → none) and
+    # server-side prepared statements for the fixed-shape ones
+    DB_QUERY_TIMEOUT_MS = int(os.getenv("DB_QUERY_TIMEOUT_MS", 10000))
+    DB_PREPARED_STATEMENTS = os.getenv("DB_PREPARED_STATEMENTS", "true").lower() == "true"
+
+    # sp_users cache behind get_user_role / get_user_info (core/db.py)
+    USER_CACHE_TTL_S = float(os.getenv("USER_CACHE_TTL_S", 300))          # role changes apply within this
+    USER_CACHE_MAX_ENTRIES = int(os.getenv("USER_CACHE_MAX_ENTRIES", 10000))
+
+    # Checkpoint retention (see core/retention.py) — 0 disables each step
+    CHECKPOINT_KEEP_LAST = int(os.getenv("CHECKPOINT_KEEP_LAST", 10))                        # per thread
+    CHECKPOINT_THREAD_TTL_HOURS = float(os.getenv("CHECKPOINT_THREAD_TTL_HOURS", 72))        # idle threads
+    CHECKPOINT_RETENTION_INTERVAL_S = float(os.getenv("CHECKPOINT_RETENTION_INTERVAL_S", 900))
+    CHECKPOINT_VACUUM_INTERVAL_S = float(os.getenv("CHECKPOINT_VACUUM_INTERVAL_S", 86400))
+
+    # Chat log (see core/chat_log.py) — fine-tuning / analysis transcript
+    CHAT_LOG_FILE = os.getenv("CHAT_LOG_FILE", "chat_history_log.jsonl")
+    CHAT_LOG_QUEUE_SIZE = int(os.getenv("CHAT_LOG_QUEUE_SIZE", 10000))        # entries; overflow is dropped
+    CHAT_LOG_BATCH_SIZE = int(os.getenv("CHAT_LOG_BATCH_SIZE", 200))          # flush when this many are queued
+    CHAT_LOG_FLUSH_INTERVAL_S = float(os.getenv("CHAT_LOG_FLUSH_INTERVAL_S", 2))
+    CHAT_LOG_MAX_BYTES = int(os.getenv("CHAT_LOG_MAX_BYTES", 50 * 1024 * 1024))  # 0 = no size rotation
+    CHAT_LOG_ROTATE_DAILY = os.getenv("CHAT_LOG_ROTATE_DAILY", "true").lower() == "true"
+    CHAT_LOG_GZIP = os.getenv("CHAT_LOG_GZIP", "true").lower() == "true"
+
+    # Semantic response cache (see core/response_cache.py) — product / general answers only
+    RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "true").lower() == "true"
+    RESPONSE_CACHE_THRESHOLD = float(os.getenv("RESPONSE_CACHE_THRESHOLD", 0.92))   # cosine similarity
+    RESPONSE_CACHE_TTL_S = float(os.getenv("RESPONSE_CACHE_TTL_S", 3600))
+    RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", 2000))
+
+    # Router keyword fast path (see agents/router_rules.py)
+    ROUTER_FAST_PATH = os.getenv("ROUTER_FAST_PATH", "true").lower() == "true"
+    ROUTER_FAST_PATH_SHADOW_RATE = float(os.getenv("ROUTER_FAST_PATH_SHADOW_RATE", 0.05))  # also ask the LLM, for comparison
+
+    # Router classifier: llm (Groq) | embedding (local k-NN, see agents/intent_classifier.py)
+    ROUTER_MODE = os.getenv("ROUTER_MODE", "llm").lower()
+    ROUTER_EMBEDDING_K = int(os.getenv("ROUTER_EMBEDDING_K", 5))
+    ROUTER_EMBEDDING_METHOD = os.getenv("ROUTER_EMBEDDING_METHOD", "knn").lower()   # knn | centroid
+
+    # Sticky routing: short follow-ups stay with the thread's last agent (skips the router classifier)
+    ROUTER_STICKY = os.getenv("ROUTER_STICKY", "true").lower() == "true"
+    ROUTER_STICKY_TTL_S = int(os.getenv("ROUTER_STICKY_TTL_S", 600))
+    ROUTER_STICKY_MAX_WORDS = int(os.getenv("ROUTER_STICKY_MAX_WORDS", 6))
+
+    # Direct tool execution: the LLM router may name one read-only tool that is
+    # run and rendered without the agent's ReAct loop (agents/direct_tools.py)
+    ROUTER_DIRECT_TOOLS = os.getenv("ROUTER_DIRECT_TOOLS", "true").lower() == "true"
+
+    # Agent tool node (core/tool_executor.py): tool calls of one AI message run
+    # concurrently up to this bound; same-tool writes with a batch implementation are coalesced
+    TOOL_MAX_CONCURRENCY = int(os.getenv("TOOL_MAX_CONCURRENCY", 4))
+    TOOL_BATCHING_ENABLED = os.getenv("TOOL_BATCHING_ENABLED", "true").lower() == "true"
+
+    # Provider prompt caching. Anthropic gets explicit cache_control breakpoints;
+    # Gemini 2.5 and Groq cache identical prompt prefixes implicitly.
+    PROMPT_CACHE_ENABLED = os.getenv("PROMPT_CACHE_ENABLED", "true").lower() == "true"
+    ANTHROPIC_CACHE_TTL = os.getenv("ANTHROPIC_CACHE_TTL", "5m")   # 5m | 1h
+
+    # Shared keep-alive HTTP pool for LLM clients (core/llm_setup.py registry)
+    LLM_HTTP_MAX_CONNECTIONS = int(os.getenv("LLM_HTTP_MAX_CONNECTIONS", 100))
+    LLM_HTTP_MAX_KEEPALIVE = int(os.getenv("LLM_HTTP_MAX_KEEPALIVE", 20))
+    LLM_HTTP_KEEPALIVE_EXPIRY_S = float(os.getenv("LLM_HTTP_KEEPALIVE_EXPIRY_S", 60))
+
+    # Agent history window (core/history.py): tokens of conversation sent per call,
+    # per provider; older turns are folded into a rolling summary
+    HISTORY_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", 0))             # >0 overrides the per-provider values
+    HISTORY_TOKEN_BUDGETS = {
+        "groq":        int(os.getenv("HISTORY_TOKEN_BUDGET_GROQ", 4000)),
+        "gemini":      int(os.getenv("HISTORY_TOKEN_BUDGET_GEMINI", 24000)),
+        "anthropic":   int(os.getenv("HISTORY_TOKEN_BUDGET_ANTHROPIC", 24000)),
+        "huggingface": int(os.getenv("HISTORY_TOKEN_BUDGET_HUGGINGFACE", 3000)),
+    }
+    HISTORY_KEEP_RATIO = float(os.getenv("HISTORY_KEEP_RATIO", 0.6))             # window kept after summarising
+    HISTORY_SUMMARY_ENABLED = os.getenv("HISTORY_SUMMARY_ENABLED", "true").lower() == "true"
+    HISTORY_SUMMARY_MAX_WORDS = int(os.getenv("HISTORY_SUMMARY_MAX_WORDS", 150))
+
+    # Escalation summaries (core/escalation_summary.py): written back by a background
+    # worker from a token-bounded transcript, retried with exponential backoff
+    ESCALATION_SUMMARY_TOKENS = int(os.getenv("ESCALATION_SUMMARY_TOKENS", 3000))
+    ESCALATION_SUMMARY_MAX_ATTEMPTS = int(os.getenv("ESCALATION_SUMMARY_MAX_ATTEMPTS", 4))
+    ESCALATION_SUMMARY_RETRY_S = float(os.getenv("ESCALATION_SUMMARY_RETRY_S", 5))
+    ESCALATION_SUMMARY_QUEUE_SIZE = int(os.getenv("ESCALATION_SUMMARY_QUEUE_SIZE", 1000))
+
     # Validation helper
     @staticmethod
     def _check_key(provider: str, label: str):
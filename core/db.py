@@ -1,9 +1,18 @@
 import os
+import threading
+import time
+from collections import OrderedDict, deque
 import mysql.connector
-from mysql.connector import Error, pooling
+from mysql.connector import Error
+from mysql.connector.errors import PoolError
 from dotenv import load_dotenv
-from typing import Optional
-from functools import lru_cache
+from typing import Callable, Deque, Dict, Optional, Tuple
+
+from core.config import settings
+from core.metrics import (
+    DB_POOL_WAIT, DB_POOL_IN_USE, DB_POOL_OPEN, DB_POOL_WAITERS,
+    DB_POOL_OVERFLOW, DB_POOL_RECONNECTS, DB_POOL_TIMEOUTS,
+)
 
 # user_type mapping from sp_users table
 # 1 = Admin  |  4 = Customer
@@ -13,121 +22,391 @@ USER_TYPE_CUSTOMER = 4
 load_dotenv(override=True)
 
 # ---------------------------------------------------------------------------
-# Connection Pool — created ONCE at module load time
-# Reuses TCP connections across all tool calls → eliminates ~200-400ms per query
+# Connection Pool — created ONCE per process, connections opened on demand
+# Reuses TCP connections across all tool calls → eliminates ~200-400ms per query.
+#
+# DB_POOL_SIZE connections are kept open; under load up to DB_POOL_MAX_OVERFLOW
+# more are opened and closed again when handed back, so the pool grows with a
+# burst and shrinks after it. Once size + overflow connections are checked out,
+# get_db_connection() waits up to DB_POOL_TIMEOUT_S for one to come back
+# instead of opening unpooled connections — a burst can never hold more than
+# size + overflow connections against MySQL.
 # ---------------------------------------------------------------------------
-_pool: Optional[pooling.MySQLConnectionPool] = None
 
-def _get_pool() -> Optional[pooling.MySQLConnectionPool]:
+class PoolTimeout(PoolError):
+    """No connection came back within DB_POOL_TIMEOUT_S."""
+
+
+def _connect():
+    return mysql.connector.connect(
+        host=os.getenv("MYSQL_HOST", "localhost"),
+        port=int(os.getenv("MYSQL_PORT", 3306)),
+        user=os.getenv("MYSQL_USER", "root"),
+        password=os.getenv("MYSQL_PASSWORD", ""),
+        database=os.getenv("MYSQL_DATABASE", ""),
+        connect_timeout=settings.DB_CONNECT_TIMEOUT_S,
+        autocommit=True,
+    )
+
+
+class PooledConnection:
+    """A checked-out MySQL connection; close() hands it back to the pool."""
+
+    def __init__(self, pool: "ConnectionPool", conn):
+        self._pool = pool
+        self._conn = conn
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    @property
+    def statements(self) -> "OrderedDict":
+        """Prepared-statement cursors kept with the underlying connection (core/query.py)."""
+        return self._pool._statement_cache(self._conn)
+
+    def close(self) -> None:
+        if self._conn is not None:
+            conn, self._conn = self._conn, None
+            self._pool._release(conn)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class ConnectionPool:
+    """Bounded MySQL pool with a blocking checkout (see the section comment above)."""
+
+    def __init__(self, size: int = None, max_overflow: int = None, timeout_s: float = None,
+                 ping_after_s: float = None, connect: Callable = _connect):
+        self.size = max(1, size or settings.DB_POOL_SIZE)
+        self.max_overflow = max(0, max_overflow if max_overflow is not None else settings.DB_POOL_MAX_OVERFLOW)
+        self.timeout_s = timeout_s if timeout_s is not None else settings.DB_POOL_TIMEOUT_S
+        self.ping_after_s = ping_after_s if ping_after_s is not None else settings.DB_POOL_PING_AFTER_S
+        self._connect = connect
+
+        self._idle: Deque[Tuple[object, float]] = deque()   # (connection, released at)
+        self._cond = threading.Condition()
+        self._open = 0          # idle + checked out
+        self._in_use = 0
+        self._waiters = 0
+        self._counters = {"checkouts": 0, "overflow": 0, "timeouts": 0, "reconnects": 0, "connect_errors": 0}
+        self._statements: Dict[int, OrderedDict] = {}        # id(connection) → prepared cursors
+
+    # -- checkout ------------------------------------------------------------
+
+    def get_connection(self) -> PooledConnection:
+        deadline = time.monotonic() + self.timeout_s
+        with self._cond:
+            self._waiters += 1
+            self._report()
+            try:
+                while True:
+                    if self._idle:
+                        conn, released_at = self._idle.pop()       # most recently used first
+                        break
+                    if self._open < self.size + self.max_overflow:
+                        conn, released_at = None, None
+                        self._open += 1
+                        if self._open > self.size:
+                            self._count("overflow")
+                            DB_POOL_OVERFLOW.inc()
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._count("timeouts")
+                        DB_POOL_TIMEOUTS.inc()
+                        raise PoolTimeout(
+                            f"No MySQL connection free within {self.timeout_s}s "
+                            f"({self._in_use} in use, {self._waiters - 1} other waiters)"
+                        )
+                    self._cond.wait(remaining)
+            finally:
+                self._waiters -= 1
+            self._in_use += 1
+            self._count("checkouts")
+            self._report()
+
+        try:
+            if conn is None:
+                conn = self._open_connection()
+            elif time.monotonic() - released_at >= self.ping_after_s and not conn.is_connected():
+                # Server closed it (wait_timeout, restart …) — one reconnect attempt
+                self._count("reconnects")
+                DB_POOL_RECONNECTS.inc()
+                self._statements.pop(id(conn), None)        # server-side statements died with the session
+                conn.reconnect(attempts=1, delay=0)
+        except Exception:
+            self._discard(conn)
+            raise
+        return PooledConnection(self, conn)
+
+    def _open_connection(self):
+        try:
+            return self._connect()
+        except Exception:
+            self._count("connect_errors")
+            raise
+
+    # -- release -------------------------------------------------------------
+
+    def _release(self, conn) -> None:
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except Exception:
+            self._discard(conn)
+            return
+        with self._cond:
+            self._in_use -= 1
+            if self._open > self.size:
+                self._open -= 1             # overflow connection → close, pool shrinks back
+            else:
+                self._idle.append((conn, time.monotonic()))
+                conn = None
+            self._report()
+            self._cond.notify()
+        if conn is not None:
+            self._close(conn)
+
+    def _discard(self, conn) -> None:
+        with self._cond:
+            self._in_use -= 1
+            self._open -= 1
+            self._report()
+            self._cond.notify()
+        if conn is not None:
+            self._close(conn)
+
+    def _close(self, conn) -> None:
+        self._statements.pop(id(conn), None)
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _statement_cache(self, conn) -> OrderedDict:
+        # Only touched by the thread holding *conn*; setdefault is atomic
+        return self._statements.setdefault(id(conn), OrderedDict())
+
+    # -- observability ---------------------------------------------------------
+
+    def _count(self, key: str) -> None:
+        self._counters[key] += 1
+
+    def _report(self) -> None:
+        DB_POOL_IN_USE.set(self._in_use)
+        DB_POOL_OPEN.set(self._open)
+        DB_POOL_WAITERS.set(self._waiters)
+
+    def stats(self) -> Dict[str, object]:
+        with self._cond:
+            return {
+                "size": self.size,
+                "max_overflow": self.max_overflow,
+                "timeout_s": self.timeout_s,
+                "open": self._open,
+                "in_use": self._in_use,
+                "idle": len(self._idle),
+                "waiters": self._waiters,
+                **self._counters,
+            }
+
+
+_pool: Optional[ConnectionPool] = None
+_pool_lock = threading.Lock()
+
+def _get_pool() -> ConnectionPool:
     global _pool
     if _pool is None:
-        try:
-            _pool = pooling.MySQLConnectionPool(
-                pool_name="cso_pool",
-                pool_size=5,            # 5 persistent connections
-                pool_reset_session=True,
-                host=os.getenv("MYSQL_HOST", "localhost"),
-                port=int(os.getenv("MYSQL_PORT", 3306)),
-                user=os.getenv("MYSQL_USER", "root"),
-                password=os.getenv("MYSQL_PASSWORD", ""),
-                database=os.getenv("MYSQL_DATABASE", ""),
-                connect_timeout=10,
-                autocommit=True,
-            )
-            print("[DB] Connection pool created (size=5)")
-        except Error as e:
-            print(f"[DB] Pool creation failed: {e}")
-            _pool = None
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool()
+                print(f"[DB] Connection pool created (size={_pool.size}, overflow={_pool.max_overflow}, "
+                      f"timeout={_pool.timeout_s}s)")
     return _pool
 
 
+def pool_stats() -> Dict[str, object]:
+    """Pool state for the admin endpoint."""
+    return _get_pool().stats()
+
+
 def get_db_connection():
     """
-    Return a connection from the pool.
-    Falls back to a direct connection if the pool is unavailable.
+    Return a connection from the pool (close() hands it back).
+    Waits up to DB_POOL_TIMEOUT_S when every connection is checked out and
+    returns None if none comes back in time or MySQL can't be reached.
+    Time spent obtaining the connection is recorded in cso_db_pool_wait_seconds.
     """
-    pool = _get_pool()
-    if pool:
-        try:
-            return pool.get_connection()
-        except Error as e:
-            print(f"[DB] Pool get_connection failed: {e} — falling back to direct")
-
-    # Fallback: direct connection (no pool)
+    t0 = time.perf_counter()
     try:
-        conn = mysql.connector.connect(
-            host=os.getenv("MYSQL_HOST", "localhost"),
-            port=int(os.getenv("MYSQL_PORT", 3306)),
-            user=os.getenv("MYSQL_USER", "root"),
-            password=os.getenv("MYSQL_PASSWORD", ""),
-            database=os.getenv("MYSQL_DATABASE", ""),
-            connect_timeout=10,
-            autocommit=True,
-        )
-        return conn if conn.is_connected() else None
+        conn = _get_pool().get_connection()
+    except PoolTimeout as e:
+        print(f"[DB] {e}")
+        return None
     except Error as e:
-        print(f"[DB] Direct connection failed: {e}")
+        print(f"[DB] Connection failed: {e}")
         return None
+    DB_POOL_WAIT.observe(time.perf_counter() - t0, source="pool")
+    return conn
 
 
 # ---------------------------------------------------------------------------
-# Role cache — avoid redundant DB lookups for the same user_id in a session
+# User cache — sp_users rows behind get_user_role / get_user_info
+# Entries expire after USER_CACHE_TTL_S (a demoted admin loses admin access
+# within that window) and the least recently used are evicted beyond
+# USER_CACHE_MAX_ENTRIES. Only answers from the DB are cached — an unknown
+# user_id is, a failed lookup is not. invalidate_user() drops entries after
+# a role change; warm_user_cache() loads many users with one IN (...) query.
 # ---------------------------------------------------------------------------
-@lru_cache(maxsize=256)
-def get_user_role(user_id: int) -> str:
-    """
-    Resolve user role from sp_users.user_type.
-    Cached per user_id for the lifetime of the process.
-    user_type = 1  →  'admin'
-    user_type = 4  →  'customer'
-    """
+
+_USER_COLUMNS = "id, first_name, last_name, user_type, store_name, primary_contact_number, role_name"
+_WARM_CHUNK = 500      # ids per IN (...) query
+
+
+class _UserCache:
+    """TTL + LRU map of user_id → sp_users row (None = no such user)."""
+
+    def __init__(self, ttl_s: float = None, max_entries: int = None):
+        self.ttl_s = ttl_s if ttl_s is not None else settings.USER_CACHE_TTL_S
+        self.max_entries = max(1, max_entries or settings.USER_CACHE_MAX_ENTRIES)
+        self._entries: "OrderedDict[int, Tuple[Optional[dict], float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "misses": 0, "evictions": 0, "errors": 0}
+
+    def get(self, user_id: int):
+        """(True, row) on a fresh hit, (False, None) otherwise."""
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and time.monotonic() < entry[1]:
+                self._entries.move_to_end(user_id)
+                self._counters["hits"] += 1
+                return True, entry[0]
+            if entry is not None:
+                del self._entries[user_id]
+            self._counters["misses"] += 1
+            return False, None
+
+    def put_many(self, rows: Dict[int, Optional[dict]]) -> None:
+        expires = time.monotonic() + self.ttl_s
+        with self._lock:
+            for user_id, row in rows.items():
+                self._entries[user_id] = (row, expires)
+                self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._counters["evictions"] += 1
+
+    def missing(self, user_ids) -> list:
+        now = time.monotonic()
+        with self._lock:
+            return [u for u in user_ids if u not in self._entries or self._entries[u][1] <= now]
+
+    def invalidate(self, user_id: Optional[int] = None) -> int:
+        with self._lock:
+            if user_id is None:
+                dropped = len(self._entries)
+                self._entries.clear()
+                return dropped
+            return 1 if self._entries.pop(user_id, None) is not None else 0
+
+    def error(self) -> None:
+        with self._lock:
+            self._counters["errors"] += 1
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            return {"entries": len(self._entries), "max_entries": self.max_entries,
+                    "ttl_s": self.ttl_s, **self._counters}
+
+
+_user_cache = _UserCache()
+
+
+def _fetch_users(user_ids: list) -> Optional[Dict[int, Optional[dict]]]:
+    """{user_id: row or None} from sp_users; None if the DB could not answer."""
     conn = get_db_connection()
     if not conn:
-        return "customer"  # fail-safe
+        return None
     cursor = conn.cursor(dictionary=True)
     try:
-        cursor.execute(
-            "SELECT user_type FROM sp_users WHERE id = %s LIMIT 1",
-            (user_id,)
-        )
-        row = cursor.fetchone()
-        if row:
-            utype = row.get("user_type")
-            if utype == USER_TYPE_ADMIN:
-                return "admin"
-            elif utype == USER_TYPE_CUSTOMER:
-                return "customer"
-        return "customer"
+        found: Dict[int, Optional[dict]] = {}
+        for i in range(0, len(user_ids), _WARM_CHUNK):
+            chunk = user_ids[i:i + _WARM_CHUNK]
+            cursor.execute(
+                f"SELECT {_USER_COLUMNS} FROM sp_users WHERE id IN ({', '.join(['%s'] * len(chunk))})",
+                tuple(chunk)
+            )
+            for row in cursor.fetchall():
+                found[row["id"]] = row
+        return {user_id: found.get(user_id) for user_id in user_ids}
     except Exception as e:
-        print(f"[get_user_role] Error: {e}")
-        return "customer"
+        print(f"[UserCache] Lookup failed: {e}")
+        return None
     finally:
         cursor.close()
         conn.close()   # returns connection to pool
 
 
+def _lookup_user(user_id: int) -> Tuple[bool, Optional[dict]]:
+    """(ok, row): ok=False when the DB lookup failed (nothing is cached then)."""
+    hit, row = _user_cache.get(user_id)
+    if hit:
+        return True, row
+    rows = _fetch_users([user_id])
+    if rows is None:
+        _user_cache.error()
+        return False, None
+    _user_cache.put_many(rows)
+    return True, rows[user_id]
+
+
+def get_user_role(user_id: int) -> str:
+    """
+    Resolve user role from sp_users.user_type (cached, see above).
+    user_type = 1  →  'admin'
+    user_type = 4  →  'customer'
+    Falls back to 'customer' when the user is unknown or the DB fails.
+    """
+    ok, row = _lookup_user(user_id)
+    if not ok:
+        print(f"[get_user_role] DB lookup failed for user_id={user_id}, using 'customer'")
+    if row and row.get("user_type") == USER_TYPE_ADMIN:
+        return "admin"
+    return "customer"
+
+
 def get_user_info(user_id: int) -> Optional[dict]:
     """
-    Fetch basic profile info for a user from sp_users.
+    Fetch basic profile info for a user from sp_users (cached, see above).
     """
-    conn = get_db_connection()
-    if not conn:
-        return None
-    cursor = conn.cursor(dictionary=True)
-    try:
-        cursor.execute(
-            "SELECT id, first_name, last_name, user_type, store_name, "
-            "primary_contact_number, role_name "
-            "FROM sp_users WHERE id = %s LIMIT 1",
-            (user_id,)
-        )
-        return cursor.fetchone()
-    except Exception as e:
-        print(f"[get_user_info] Error: {e}")
-        return None
-    finally:
-        cursor.close()
-        conn.close()
+    _, row = _lookup_user(user_id)
+    return dict(row) if row else None
+
+
+def warm_user_cache(user_ids) -> int:
+    """Load every uncached id in one IN (...) query per 500 ids. Returns the number loaded."""
+    missing = _user_cache.missing(list(dict.fromkeys(user_ids)))
+    if not missing:
+        return 0
+    rows = _fetch_users(missing)
+    if rows is None:
+        _user_cache.error()
+        return 0
+    _user_cache.put_many(rows)
+    return len(rows)
+
+
+def invalidate_user(user_id: Optional[int] = None) -> int:
+    """Drop one user's cached row (after a role / profile change), or all. Returns entries dropped."""
+    return _user_cache.invalidate(user_id)
+
+
+def user_cache_stats() -> Dict[str, object]:
+    return _user_cache.stats()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,201 @@
+"""
+escalation_summary.py — Background escalation summaries
+=======================================================
+human_escalation_node used to call the LLM on str(state["messages"]), the
+full message repr with every tool dump, before the customer saw the
+"escalated" reply. The node now returns the hand-off message at once and
+only queues the thread here. The router's one-line escalation_summary stays
+in place until the worker replaces it:
+
+  • transcript     newest messages within ESCALATION_SUMMARY_TOKENS, tool
+                   results clipped, the thread's rolling history_summary in
+                   front (core.history.transcript)
+  • write-back     graph.update_state(..., as_node="human_escalation") once
+                   the thread is idle, under the thread's lock
+                   (core.turn.hold_thread) so no turn can commit between
+                   the check and the write; a thread that is mid-run or
+                   paused again is retried later
+  • retry          a failed LLM call or write is retried with exponential
+                   backoff (ESCALATION_SUMMARY_RETRY_S · 2^n) up to
+                   ESCALATION_SUMMARY_MAX_ATTEMPTS; the summary is kept
+                   between attempts, so a failed write doesn't re-run the LLM
+  • back-pressure  at most ESCALATION_SUMMARY_QUEUE_SIZE threads wait;
+                   beyond that the router summary is kept (counted as dropped)
+
+The API starts the worker in its lifespan (start_worker(app)). Without a
+running worker, submit() returns False and the router summary is kept.
+"""
+
+import heapq
+import queue
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from core.config import settings
+from core.history import transcript
+from core.metrics import REGISTRY, Counter, Gauge
+from core.turn import hold_thread
+
+# outcome="written" | "retried" | "failed" | "dropped"
+ESCALATION_SUMMARIES = REGISTRY.register(Counter(
+    "cso_escalation_summaries_total", "Background escalation summaries by outcome.", ("outcome",)))
+ESCALATION_SUMMARY_QUEUE = REGISTRY.register(Gauge(
+    "cso_escalation_summary_queue_depth", "Escalated threads waiting for a summary (incl. retries)."))
+
+PAUSE_NODE = "human_escalation"
+
+_PROMPT = (
+    "A customer-support conversation for a dairy delivery app is being escalated to a human "
+    "administrator. Summarize the customer's issue, the facts needed to act on it (order codes, "
+    "dates, products, amounts) and why the automated agents could not resolve it. "
+    "Reply with the summary only.\n\n{transcript}"
+)
+
+
+class _Busy(Exception):
+    """The thread is running or paused again; write the summary later."""
+
+
+@dataclass
+class _Job:
+    thread_id: str
+    messages: list
+    history_summary: str = ""
+    summary: Optional[str] = None     # kept across retries once the LLM has answered
+    attempts: int = 0
+
+
+class EscalationSummaryWorker(threading.Thread):
+    """Daemon thread that summarizes escalated threads and writes the summary back."""
+
+    def __init__(self, graph, llm=None, *, queue_size: int = None, max_attempts: int = None,
+                 retry_s: float = None, token_budget: int = None):
+        super().__init__(name="escalation-summaries", daemon=True)
+        self.graph = graph
+        self._llm = llm
+        self.max_attempts = max(1, max_attempts or settings.ESCALATION_SUMMARY_MAX_ATTEMPTS)
+        self.retry_s = retry_s if retry_s is not None else settings.ESCALATION_SUMMARY_RETRY_S
+        self.token_budget = token_budget or settings.ESCALATION_SUMMARY_TOKENS
+
+        self._queue: "queue.Queue[Optional[_Job]]" = queue.Queue(maxsize=queue_size or settings.ESCALATION_SUMMARY_QUEUE_SIZE)
+        self._retries: List[Tuple[float, int, _Job]] = []   # heap of (due, seq, job)
+        self._seq = 0
+        self._stop_event = threading.Event()
+
+    @property
+    def llm(self):
+        if self._llm is None:
+            from core.llm_setup import get_llm
+            self._llm = get_llm(temperature=0)
+        return self._llm
+
+    # -- request path ------------------------------------------------------
+
+    def submit(self, thread_id: str, messages: list, history_summary: str = "") -> bool:
+        """Queue a summary for *thread_id* without blocking. False if it was dropped."""
+        try:
+            self._queue.put_nowait(_Job(thread_id, list(messages), history_summary or ""))
+        except queue.Full:
+            ESCALATION_SUMMARIES.inc(outcome="dropped")
+            return False
+        self._report_depth()
+        return True
+
+    # -- worker thread -----------------------------------------------------
+
+    def run(self):
+        while not self._stop_event.is_set():
+            try:
+                job = self._queue.get(timeout=self._idle_s())
+            except queue.Empty:
+                job = None
+            if job is not None:
+                self._process(job)
+            while self._retries and self._retries[0][0] <= time.monotonic() and not self._stop_event.is_set():
+                self._process(heapq.heappop(self._retries)[2])
+            self._report_depth()
+
+    def stop(self, timeout: float = 10.0):
+        """Stop the thread; jobs still waiting are abandoned (the router summary stays)."""
+        self._stop_event.set()
+        try:
+            self._queue.put_nowait(None)        # wake the thread from its queue wait
+        except queue.Full:
+            pass
+        if self.is_alive():
+            self.join(timeout)
+
+    def _idle_s(self) -> float:
+        if not self._retries:
+            return 1.0
+        return min(1.0, max(0.0, self._retries[0][0] - time.monotonic()))
+
+    def _report_depth(self):
+        ESCALATION_SUMMARY_QUEUE.set(self._queue.qsize() + len(self._retries))
+
+    def _process(self, job: _Job) -> None:
+        try:
+            if job.summary is None:
+                text = transcript(job.messages, self.token_budget, job.history_summary)
+                job.summary = str(self.llm.invoke(_PROMPT.format(transcript=text)).content).strip()
+            self._write(job)
+        except Exception as e:
+            job.attempts += 1
+            if job.attempts >= self.max_attempts:
+                ESCALATION_SUMMARIES.inc(outcome="failed")
+                print(f"[Escalation] Summary for thread {job.thread_id} failed after {job.attempts} attempts: {e}")
+                return
+            delay = self.retry_s * 2 ** (job.attempts - 1)
+            ESCALATION_SUMMARIES.inc(outcome="retried")
+            print(f"[Escalation] Summary for thread {job.thread_id} failed ({e}), retrying in {delay:.0f}s")
+            self._seq += 1
+            heapq.heappush(self._retries, (time.monotonic() + delay, self._seq, job))
+            return
+        ESCALATION_SUMMARIES.inc(outcome="written")
+
+    def _write(self, job: _Job) -> None:
+        config = {"configurable": {"thread_id": job.thread_id}}
+        try:
+            with hold_thread(job.thread_id, timeout=0):
+                if self.graph.get_state(config).next:
+                    raise _Busy("thread is running or paused")
+                self.graph.update_state(config, {"escalation_summary": job.summary}, as_node=PAUSE_NODE)
+        except TimeoutError:
+            raise _Busy("a turn is running on the thread") from None
+
+
+# ---------------------------------------------------------------------------
+# Process-wide worker (started by the API lifespan)
+# ---------------------------------------------------------------------------
+
+_worker: Optional[EscalationSummaryWorker] = None
+
+
+def start_worker(graph, **kwargs) -> EscalationSummaryWorker:
+    global _worker
+    _worker = EscalationSummaryWorker(graph, **kwargs)
+    _worker.start()
+    return _worker
+
+
+def stop_worker() -> None:
+    global _worker
+    if _worker is not None:
+        _worker.stop()
+        _worker = None
+
+
+def submit(thread_id: Optional[str], messages: list, history_summary: str = "") -> bool:
+    """Queue *thread_id* on the running worker; False if there is none (or it is full)."""
+    if not thread_id or _worker is None or not _worker.is_alive():
+        return False
+    return _worker.submit(thread_id, messages, history_summary)
+
+
+def worker_stats() -> Dict[str, object]:
+    """Queue depth / running flag for the admin endpoint."""
+    if _worker is None:
+        return {"running": False, "queued": 0, "retrying": 0}
+    return {"running": _worker.is_alive(), "queued": _worker._queue.qsize(), "retrying": len(_worker._retries)}
@@ -9,9 +9,10 @@ from agents.subscription import subscription_agent_node
 from agents.wallet import wallet_agent_node
 from agents.product import product_agent_node
 from agents.escalation import human_escalation_node
+from agents.direct_tools import answered, direct_tool_node
 
-from langgraph.checkpoint.sqlite import SqliteSaver
-import sqlite3
+from core.checkpointer import get_checkpointer
+from core.metrics import metrics_handler
 
 # 1. Initialize the Graph
 workflow = StateGraph(SupportState)
@@ -24,6 +25,7 @@ workflow.add_node("subscription_agent", subscription_agent_node)
 workflow.add_node("wallet_agent", wallet_agent_node)
 workflow.add_node("product_agent", product_agent_node)
 workflow.add_node("human_escalation", human_escalation_node)
+workflow.add_node("direct_tool", direct_tool_node)
 
 # 3. Define the custom Routing Logic (The Switchboard)
 def route_to_department(state: SupportState):
@@ -33,6 +35,10 @@ def route_to_department(state: SupportState):
     
     if needs_esc:
         return "human_escalation"    
+
+    # Router named a read-only tool → run it without the agent's ReAct loop
+    if state.get("direct_tool"):
+        return "direct_tool"
     
     if category == "order":
         return "order_agent"
@@ -45,8 +51,9 @@ def route_to_department(state: SupportState):
     else:
         return "general_agent"
 
-# Persistent Memory Checkpointer
-memory = SqliteSaver(sqlite3.connect("checkpoint.db", check_same_thread=False))
+# Persistent Memory Checkpointer — backend chosen by CHECKPOINT_BACKEND
+# (sqlite WAL / mysql). Serves both app.invoke and app.ainvoke.
+memory = get_checkpointer()
 
 # 4. Draw the Edges
 # Every conversation starts by going to the Router LLM
@@ -62,11 +69,27 @@ workflow.add_edge("subscription_agent", END)
 workflow.add_edge("wallet_agent", END)
 workflow.add_edge("product_agent", END)
 
+# A direct tool answer ends the turn; a failed tool hands over to the agent
+def after_direct_tool(state: SupportState):
+    return END if answered(state) else route_to_department(state)
+
+workflow.add_conditional_edges("direct_tool", after_direct_tool)
+
 # 5. Compile the executable application
-app = workflow.compile(
-    checkpointer=memory,
-    interrupt_before=["human_escalation"] # Graph freezes here
-)
+def compile_app(checkpointer):
+    """
+    Compile the workflow against *checkpointer*.
+    The saver must implement the async API (every core.checkpointer backend
+    does, as does AsyncSqliteSaver) to drive the graph with ainvoke / aget_state.
+    Every run reports node / tool / LLM latencies to core.metrics.
+    """
+    return workflow.compile(
+        checkpointer=checkpointer,
+        interrupt_before=["human_escalation"] # Graph freezes here
+    ).with_config(callbacks=[metrics_handler])
+
+
+app = compile_app(memory)
 
 if __name__ == "__main__":
     from langchain_core.messages import HumanMessage
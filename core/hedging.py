@@ -0,0 +1,287 @@
+"""
+hedging.py — Hedged requests for LLM_PROVIDER=auto (AUTO_STRATEGY=hedge)
+========================================================================
+With plain `primary.with_fallbacks([fallback])` a hung primary holds the
+request until it raises, which can take the whole 120 s timeout.
+HedgedChatModel instead gives the primary a latency budget:
+
+  • primary answers within the budget        → that answer, nothing else sent
+  • primary raises within the budget         → fallback alone (as before)
+  • budget expires with the primary pending  → fallback fired in parallel;
+    the first successful answer wins and the other leg is cancelled
+
+The budget is the HEDGE_QUANTILE (p95 by default) of the primary model's
+recent latencies, clamped to [HEDGE_MIN_BUDGET_S, HEDGE_MAX_BUDGET_S];
+until HEDGE_MIN_SAMPLES calls have been timed it is HEDGE_INITIAL_BUDGET_S.
+A leg that fails or is cancelled still records the time it ran — for a
+cancelled primary that is a lower bound of at least the budget, so the calls
+that got hedged keep the p95 up instead of only the fast ones counting.
+Latencies are tracked per (provider, model) and exported on /metrics:
+
+  cso_llm_latency_seconds{provider, model, quantile}   rolling p50 / p95 / p99
+  cso_llm_hedge_budget_seconds{provider, model}        current budget
+  cso_llm_hedge_total{outcome}                         how each call resolved
+
+Each leg runs as a child LLM run, so cso_llm_duration_seconds keeps its
+per-provider series (the cancelled leg is recorded as status="cancelled").
+Token streaming is not hedged: the legs run without the stream handlers of
+astream_events / astream, and streamed calls receive the winner's answer as
+one chunk.
+
+On the sync path (invoke) the legs run on worker threads, which cannot be
+interrupted: the losing leg is abandoned and runs to completion in the
+background, holding its worker and its provider request until then. Its
+latency is recorded when it finishes.
+"""
+
+import asyncio
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Dict, List, Optional, Tuple
+
+from langchain_core.callbacks import AsyncCallbackManager, AsyncCallbackManagerForLLMRun, CallbackManager
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.tracers._streaming import _StreamingCallbackHandler
+
+from core.config import settings
+from core.metrics import REGISTRY, Counter, Gauge
+
+HEDGE_MIN_SAMPLES = 20
+_QUANTILES = (0.5, 0.95, 0.99)
+
+LLM_LATENCY = REGISTRY.register(Gauge(
+    "cso_llm_latency_seconds", "Rolling chat model latency quantiles (hedging window).",
+    ("provider", "model", "quantile")))
+HEDGE_BUDGET = REGISTRY.register(Gauge(
+    "cso_llm_hedge_budget_seconds", "Current hedging budget of the primary model.", ("provider", "model")))
+HEDGE_OUTCOMES = REGISTRY.register(Counter(
+    "cso_llm_hedge_total", "Hedged LLM calls by outcome.", ("outcome",)))
+
+
+def _is_streaming(handler) -> bool:
+    return isinstance(handler, _StreamingCallbackHandler)
+
+
+def _child_config(run_manager) -> dict:
+    """Config that nests each leg's LLM run under the hedged run (metrics, tracing).
+
+    Stream handlers are left out: a streamed leg would send its tokens to the
+    client before it is known to win, so both legs' text would interleave.
+    """
+    if run_manager is None:
+        return {}
+    cls = AsyncCallbackManager if isinstance(run_manager, AsyncCallbackManagerForLLMRun) else CallbackManager
+    handlers = [h for h in run_manager.inheritable_handlers if not _is_streaming(h)]
+    return {"callbacks": cls(
+        handlers=handlers,
+        inheritable_handlers=handlers,
+        parent_run_id=run_manager.run_id,
+        tags=run_manager.inheritable_tags,
+        inheritable_tags=run_manager.inheritable_tags,
+        metadata=run_manager.inheritable_metadata,
+        inheritable_metadata=run_manager.inheritable_metadata,
+    )}
+
+
+def _quantile(ordered: List[float], q: float) -> float:
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class LatencyTracker:
+    """Rolling window of call latencies per (provider, model)."""
+
+    def __init__(self, window: int = 200):
+        self.window = window
+        self._samples: Dict[Tuple[str, str], deque] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, key: Tuple[str, str], seconds: float) -> None:
+        with self._lock:
+            samples = self._samples.setdefault(key, deque(maxlen=self.window))
+            samples.append(seconds)
+            ordered = sorted(samples)
+        provider, model = key
+        for q in _QUANTILES:
+            LLM_LATENCY.set(_quantile(ordered, q), provider=provider, model=model, quantile=str(q))
+
+    def quantile(self, key: Tuple[str, str], q: float) -> Optional[float]:
+        """None until HEDGE_MIN_SAMPLES latencies have been observed."""
+        with self._lock:
+            samples = self._samples.get(key)
+            if not samples or len(samples) < HEDGE_MIN_SAMPLES:
+                return None
+            return _quantile(sorted(samples), q)
+
+
+# Shared by every HedgedChatModel — agents using the same primary pool their samples
+LATENCY = LatencyTracker(settings.HEDGE_WINDOW)
+
+# Sync path only: legs run on worker threads (a losing leg is abandoned, not
+# interrupted — it finishes in the background and still records its latency)
+_executor = ThreadPoolExecutor(max_workers=32, thread_name_prefix="llm-hedge")
+
+
+class HedgedChatModel(BaseChatModel):
+    """primary, plus the fallback once the primary exceeds its latency budget."""
+
+    primary: Any
+    fallback: Any
+    primary_key: Tuple[str, str]
+    fallback_key: Tuple[str, str]
+    quantile: float = 0.95
+    initial_budget_s: float = 8.0
+    min_budget_s: float = 1.0
+    max_budget_s: float = 30.0
+    tracker: Any = None
+
+    @property
+    def _llm_type(self) -> str:
+        return "hedged"
+
+    def _get_ls_params(self, stop=None, **kwargs):
+        params = super()._get_ls_params(stop=stop, **kwargs)
+        params["ls_provider"] = "hedged"
+        params["ls_model_name"] = f"{self.primary_key[1]}|{self.fallback_key[1]}"
+        return params
+
+    def _tracker(self) -> LatencyTracker:
+        return self.tracker or LATENCY
+
+    def budget(self) -> float:
+        observed = self._tracker().quantile(self.primary_key, self.quantile)
+        if observed is None:
+            budget = self.initial_budget_s
+        else:
+            budget = min(max(observed, self.min_budget_s), self.max_budget_s)
+        HEDGE_BUDGET.set(budget, provider=self.primary_key[0], model=self.primary_key[1])
+        return budget
+
+    def bind_tools(self, tools, **kwargs):
+        return self.model_copy(update={
+            "primary": self.primary.bind_tools(tools, **kwargs),
+            "fallback": self.fallback.bind_tools(tools, **kwargs),
+        })
+
+    # -- legs --------------------------------------------------------------
+
+    # A failed or cancelled leg is timed too: what it ran for is a lower bound
+    # on its latency, and leaving it out would let the budget shrink to the
+    # fast calls only.
+
+    def _call(self, model, key, messages, config, stop, kwargs):
+        start = time.perf_counter()
+        try:
+            return model.invoke(messages, config, stop=stop, **kwargs)
+        finally:
+            self._tracker().observe(key, time.perf_counter() - start)
+
+    async def _acall(self, model, key, messages, config, stop, kwargs):
+        start = time.perf_counter()
+        try:
+            return await model.ainvoke(messages, config, stop=stop, **kwargs)
+        finally:
+            self._tracker().observe(key, time.perf_counter() - start)
+
+    @staticmethod
+    def _result(message) -> ChatResult:
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    @staticmethod
+    def _winner_chunk(message, run_manager) -> Optional[ChatGenerationChunk]:
+        """The winning answer as one chunk, when the hedged run itself is streamed."""
+        if run_manager is None or not any(_is_streaming(h) for h in run_manager.handlers):
+            return None
+        return ChatGenerationChunk(message=AIMessageChunk(content=message.content, id=message.id))
+
+    async def _awin(self, message, run_manager) -> ChatResult:
+        chunk = self._winner_chunk(message, run_manager)
+        if chunk is not None:
+            await run_manager.on_llm_new_token(message.text, chunk=chunk)
+        return self._result(message)
+
+    def _win(self, message, run_manager) -> ChatResult:
+        chunk = self._winner_chunk(message, run_manager)
+        if chunk is not None:
+            run_manager.on_llm_new_token(message.text, chunk=chunk)
+        return self._result(message)
+
+    @staticmethod
+    def _outcome(winner_is_primary: bool, hedged: bool) -> str:
+        if not hedged:
+            return "fallback_after_error"
+        return "hedged_primary_won" if winner_is_primary else "hedged_fallback_won"
+
+    # -- async (app.ainvoke / API) -------------------------------------------
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        config = _child_config(run_manager)
+        primary = asyncio.ensure_future(
+            self._acall(self.primary, self.primary_key, messages, config, stop, kwargs))
+        pending = {primary}
+        try:
+            done, _ = await asyncio.wait(pending, timeout=self.budget())
+            if primary in done and primary.exception() is None:
+                HEDGE_OUTCOMES.inc(outcome="primary")
+                return await self._awin(primary.result(), run_manager)
+
+            hedged = not done                   # primary still running → race it
+            error = None if hedged else primary.exception()
+            pending = {primary} if hedged else set()
+            fallback = asyncio.ensure_future(
+                self._acall(self.fallback, self.fallback_key, messages, config, stop, kwargs))
+            pending.add(fallback)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        HEDGE_OUTCOMES.inc(outcome=self._outcome(task is primary, hedged))
+                        return await self._awin(task.result(), run_manager)
+                    error = error or task.exception()
+            HEDGE_OUTCOMES.inc(outcome="failed")
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    # -- sync (app.invoke / scripts) -----------------------------------------
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        config = _child_config(run_manager)
+        primary = _executor.submit(self._call, self.primary, self.primary_key, messages, config, stop, kwargs)
+        done, _ = wait({primary}, timeout=self.budget())
+        if primary in done and primary.exception() is None:
+            HEDGE_OUTCOMES.inc(outcome="primary")
+            return self._win(primary.result(), run_manager)
+
+        hedged = not done
+        error = None if hedged else primary.exception()
+        pending = {primary} if hedged else set()
+        fallback = _executor.submit(self._call, self.fallback, self.fallback_key, messages, config, stop, kwargs)
+        pending.add(fallback)
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    HEDGE_OUTCOMES.inc(outcome=self._outcome(future is primary, hedged))
+                    return self._win(future.result(), run_manager)
+                error = error or future.exception()
+        HEDGE_OUTCOMES.inc(outcome="failed")
+        raise error
+
+
+def hedge(primary, fallback, primary_key: Tuple[str, str], fallback_key: Tuple[str, str]) -> HedgedChatModel:
+    """HedgedChatModel configured from the HEDGE_* settings."""
+    return HedgedChatModel(
+        primary=primary,
+        fallback=fallback,
+        primary_key=primary_key,
+        fallback_key=fallback_key,
+        quantile=settings.HEDGE_QUANTILE,
+        initial_budget_s=settings.HEDGE_INITIAL_BUDGET_S,
+        min_budget_s=settings.HEDGE_MIN_BUDGET_S,
+        max_budget_s=settings.HEDGE_MAX_BUDGET_S,
+    )
@@ -0,0 +1,228 @@
+"""
+history.py — Token-budget history window + rolling summary for ReAct agents
+===========================================================================
+Replaces the "last 6 messages" pre_model_hooks. history_hook(prompt) builds
+the hook the order / product / subscription agents pass to
+create_react_agent:
+
+  • the conversation is cut into turns (a HumanMessage and everything after
+    it), and whole turns are kept from the newest backwards while they fit
+    the provider's token budget (HISTORY_TOKEN_BUDGET_<PROVIDER>)
+  • the current turn is always kept; if it alone exceeds the budget, its
+    largest tool results are truncated instead of overflowing the TPM limit
+  • once older turns have to go, the window shrinks to HISTORY_KEEP_RATIO of
+    the budget and the turns leaving it are folded into `history_summary`
+    (state) with one LLM call. `summarized_count` records how many messages
+    the summary covers, so the next LLM calls reuse it instead of
+    re-summarising — a new summary is only needed when the window overflows
+    again. The summary call keeps the run's callbacks (metrics, tracing) but
+    not the stream handlers, so its text never reaches /chat/stream
+
+Tokens are estimated with langchain_core's count_tokens_approximately (about
+4 characters per token), which needs no provider tokenizer. The system
+prompt is not part of the budget.
+"""
+
+from typing import Callable, List, Optional, Sequence, Tuple
+
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage, ToolMessage
+from langchain_core.messages.utils import count_tokens_approximately
+from langchain_core.runnables import RunnableConfig, RunnableLambda
+from langchain_core.tracers._streaming import _StreamingCallbackHandler
+
+from core.config import settings
+
+SUMMARY_HEADER = "## EARLIER IN THIS CONVERSATION (summary)\n"
+
+_SUMMARY_PROMPT = (
+    "You maintain a running summary of a customer-support conversation for a dairy delivery app.\n"
+    "Update the summary with the new messages below. Keep every fact a later question may refer to: "
+    "order codes, dates, products, amounts, vacation dates, what the customer asked for and what was "
+    "already answered or done. Drop pleasantries. Reply with the summary only, at most {words} words.\n\n"
+    "## CURRENT SUMMARY\n{summary}\n\n## NEW MESSAGES\n{messages}"
+)
+
+
+def history_budget(provider: str = None) -> int:
+    """History token budget for *provider* (auto → the smaller of primary / fallback)."""
+    provider = provider or settings.LLM_PROVIDER
+    if settings.HISTORY_TOKEN_BUDGET:
+        return settings.HISTORY_TOKEN_BUDGET
+    if provider == "auto":
+        return min(history_budget(settings.AUTO_PRIMARY_PROVIDER), history_budget(settings.AUTO_FALLBACK_PROVIDER))
+    return settings.HISTORY_TOKEN_BUDGETS.get(provider, settings.HISTORY_TOKEN_BUDGETS["groq"])
+
+
+def _tokens(messages: Sequence[BaseMessage]) -> int:
+    return count_tokens_approximately(messages) if messages else 0
+
+
+def _turn_starts(messages: Sequence[BaseMessage], start: int) -> List[int]:
+    """Indexes ≥ start where a turn (HumanMessage) begins."""
+    return [i for i in range(start, len(messages)) if isinstance(messages[i], HumanMessage)]
+
+
+def _fit_current_turn(turn: List[BaseMessage], budget: int) -> List[BaseMessage]:
+    """Truncate the largest tool results of the current turn until it fits."""
+    turn = list(turn)
+    while _tokens(turn) > budget:
+        tools = [(len(str(m.content)), i) for i, m in enumerate(turn) if isinstance(m, ToolMessage)]
+        if not tools:
+            break
+        size, idx = max(tools)
+        excess_chars = (_tokens(turn) - budget) * 4 + 200
+        keep = max(size - excess_chars, 200)
+        if keep >= size:
+            break
+        content = str(turn[idx].content)
+        turn[idx] = turn[idx].model_copy(update={
+            "content": content[:keep] + f"\n…[truncated {size - keep} characters to fit the context budget]",
+        })
+    return turn
+
+
+def select_window(messages: Sequence[BaseMessage], covered: int, budget: int,
+                  keep_ratio: float) -> Tuple[int, List[BaseMessage]]:
+    """
+    Return (window_start, window) for messages[covered:].
+
+    window_start > covered means messages[covered:window_start] fell out of
+    the window and must be folded into the summary.
+    """
+    starts = _turn_starts(messages, covered)
+    if not starts:                                     # no human message yet (shouldn't happen)
+        return covered, list(messages[covered:])
+    current = starts[-1]
+    if _tokens(messages[covered:]) <= budget:
+        return covered, list(messages[covered:])
+
+    # Over budget: keep the current turn plus whole older turns up to keep_ratio
+    current_turn = _fit_current_turn(list(messages[current:]), budget)
+    target = int(budget * keep_ratio)
+    used = _tokens(current_turn)
+    window_start = current
+    for start in reversed(starts[:-1]):
+        size = _tokens(messages[start:window_start])
+        if used + size > target:
+            break
+        used += size
+        window_start = start
+    return window_start, list(messages[window_start:current]) + current_turn
+
+
+def _render(messages: Sequence[BaseMessage], max_chars: int = 1500) -> str:
+    lines = []
+    for m in messages:
+        content = str(m.content)
+        if len(content) > max_chars:
+            content = content[:max_chars] + " …"
+        if getattr(m, "tool_calls", None):
+            content += " [tool calls: " + ", ".join(tc["name"] for tc in m.tool_calls) + "]"
+        lines.append(f"{m.type}: {content}")
+    return "\n".join(lines)
+
+
+def transcript(messages: Sequence[BaseMessage], budget: int, summary: str = "",
+               tool_chars: int = 400) -> str:
+    """
+    Plain-text transcript of the newest *messages* that fit *budget* tokens,
+    tool results clipped to *tool_chars*; the thread's rolling *summary*
+    stands in for what was cut (used by core/escalation_summary.py).
+    """
+    lines, used = [], 0
+    for m in reversed(messages):
+        line = _render([m], max_chars=tool_chars if isinstance(m, ToolMessage) else 1500)
+        cost = count_tokens_approximately([HumanMessage(content=line)])
+        if lines and used + cost > budget:
+            break
+        lines.append(line)
+        used += cost
+    if len(lines) < len(messages):
+        lines.append(f"… ({len(messages) - len(lines)} earlier messages omitted)")
+    text = "\n".join(reversed(lines))
+    return f"{SUMMARY_HEADER}{summary}\n\n{text}" if summary else text
+
+
+def _summary_input(summary: str, dropped: Sequence[BaseMessage]) -> str:
+    return _SUMMARY_PROMPT.format(
+        words=settings.HISTORY_SUMMARY_MAX_WORDS,
+        summary=summary or "(none yet)",
+        messages=_render(dropped),
+    )
+
+
+def _unstreamed(config: Optional[RunnableConfig]) -> dict:
+    """Config for the summary call: the hook's callbacks minus astream_events / astream handlers."""
+    callbacks = (config or {}).get("callbacks")
+    if callbacks is None:
+        return {}
+    if isinstance(callbacks, list):
+        return {"callbacks": [h for h in callbacks if not isinstance(h, _StreamingCallbackHandler)]}
+    callbacks = callbacks.copy()
+    for handler in list(callbacks.handlers) + list(callbacks.inheritable_handlers):
+        if isinstance(handler, _StreamingCallbackHandler):
+            callbacks.remove_handler(handler)
+    return {"callbacks": callbacks}
+
+
+def history_hook(system_prompt: str, context: Callable[[dict], Optional[str]] = None,
+                 llm=None) -> RunnableLambda:
+    """
+    pre_model_hook for create_react_agent (state_schema=core.state.AgentSupportState).
+
+    *context(state)* may return per-request text (user_id, date …) sent as a
+    separate message after the unchanged system prompt (see prompt caching).
+    """
+    system_msg = SystemMessage(content=system_prompt)
+
+    def _summarizer():
+        nonlocal llm
+        if llm is None:
+            from core.llm_setup import get_llm
+            llm = get_llm(temperature=0)
+        return llm
+
+    def _plan(state):
+        messages = [m for m in state["messages"] if not isinstance(m, SystemMessage)]
+        covered = min(state.get("summarized_count") or 0, len(messages))
+        window_start, window = select_window(
+            messages, covered, history_budget(), settings.HISTORY_KEEP_RATIO)
+        return messages, covered, window_start, window
+
+    def _output(state, summary: str, window, update: dict) -> dict:
+        preamble = []
+        extra = context(state) if context else None
+        if extra or summary:
+            preamble.append(HumanMessage(content="\n\n".join(
+                part for part in (extra, SUMMARY_HEADER + summary if summary else None) if part)))
+        return {"llm_input_messages": [system_msg] + preamble + window, **update}
+
+    def hook(state, config: RunnableConfig = None):
+        messages, covered, window_start, window = _plan(state)
+        summary = state.get("history_summary") or ""
+        update = {}
+        if window_start > covered and settings.HISTORY_SUMMARY_ENABLED:
+            try:
+                result = _summarizer().invoke(
+                    _summary_input(summary, messages[covered:window_start]), _unstreamed(config))
+                summary = str(result.content).strip()
+                update = {"history_summary": summary, "summarized_count": window_start}
+            except Exception as e:
+                print(f"[History] Summary update failed, trimming only: {e}")
+        return _output(state, summary, window, update)
+
+    async def ahook(state, config: RunnableConfig = None):
+        messages, covered, window_start, window = _plan(state)
+        summary = state.get("history_summary") or ""
+        update = {}
+        if window_start > covered and settings.HISTORY_SUMMARY_ENABLED:
+            try:
+                result = await _summarizer().ainvoke(
+                    _summary_input(summary, messages[covered:window_start]), _unstreamed(config))
+                summary = str(result.content).strip()
+                update = {"history_summary": summary, "summarized_count": window_start}
+            except Exception as e:
+                print(f"[History] Summary update failed, trimming only: {e}")
+        return _output(state, summary, window, update)
+
+    return RunnableLambda(hook, afunc=ahook, name="pre_model_hook")
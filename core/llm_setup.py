@@ -1,6 +1,15 @@
 import os
 import logging
-from core.config import Config
+import threading
+from typing import Any, Dict, Tuple
+
+import httpx
+
+from core.config import Config, settings
+from core.metrics import metrics_handler
+from core.hedging import hedge
+from core.circuit_breaker import GuardedModel
+from core.rate_limit import rate_limited
 
 from langchain_groq import ChatGroq
 from langchain_google_genai import ChatGoogleGenerativeAI
@@ -9,18 +18,81 @@ from langchain_anthropic import ChatAnthropic
 
 _log = logging.getLogger(__name__)
 
+# Model used when neither model_name nor MODEL_NAME is set
+_DEFAULT_MODELS = {
+    "groq": "llama-3.1-8b-instant",
+    "gemini": "gemini-2.5-flash",
+    "huggingface": "meta-llama/Meta-Llama-3-8B-Instruct",
+    "anthropic": "claude-3-5-sonnet-latest",
+}
+
 # Errors that signal a transient API-side problem and should trigger fallback
 _FALLBACK_EXCEPTIONS = (
     Exception,   # catch-all: timeout, rate-limit, 5xx — let the fallback decide
 )
 
 
+# ---------------------------------------------------------------------------
+# Shared keep-alive HTTP pool for Groq clients (the router and every agent
+# talk to the same host). Anthropic already shares a cached default httpx
+# client per process; Gemini keeps one client per model instance.
+# ---------------------------------------------------------------------------
+
+_http_lock = threading.Lock()
+_groq_http: Tuple[httpx.Client, httpx.AsyncClient] = None
+
+
+def _groq_http_clients() -> Tuple[httpx.Client, httpx.AsyncClient]:
+    global _groq_http
+    with _http_lock:
+        if _groq_http is None:
+            limits = httpx.Limits(
+                max_connections=settings.LLM_HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.LLM_HTTP_MAX_KEEPALIVE,
+                keepalive_expiry=settings.LLM_HTTP_KEEPALIVE_EXPIRY_S,
+            )
+            timeout = httpx.Timeout(LLMSetup._TIMEOUT, connect=10.0)
+            _groq_http = (
+                httpx.Client(limits=limits, timeout=timeout),
+                httpx.AsyncClient(limits=limits, timeout=timeout),
+            )
+        return _groq_http
+
+
+class _PromptCachingChatAnthropic(ChatAnthropic):
+    """
+    ChatAnthropic with two prompt-cache breakpoints per request:
+      • the system prompt — caches tools + the static agent prompt, shared by
+        every thread, so the several-KB prompts are billed at the cache-read rate
+      • the conversation tail (top-level cache_control) — the next ReAct hop of
+        the same turn re-reads everything up to the previous tool result
+    Prompts below the model's minimum cacheable length are sent uncached.
+    """
+
+    cache_ttl: str = "5m"     # "5m" | "1h"
+
+    def _get_request_payload(self, input_, *, stop=None, **kwargs) -> dict:
+        payload = super()._get_request_payload(input_, stop=stop, **kwargs)
+        marker = {"type": "ephemeral", "ttl": self.cache_ttl}
+        system = payload.get("system")
+        if isinstance(system, str) and system:
+            payload["system"] = [{"type": "text", "text": system, "cache_control": marker}]
+        elif isinstance(system, list) and system and isinstance(system[-1], dict):
+            system[-1] = {**system[-1], "cache_control": marker}
+        payload.setdefault("cache_control", marker)
+        return payload
+
+
 class LLMSetup:
     # Default read timeout (seconds) for all LLM HTTP calls
     _TIMEOUT = 120
+    # Per-provider latency histograms on /metrics (see core/metrics.py)
+    _CALLBACKS = [metrics_handler]
 
-    def __init__(self, temperature: float = 0.0, max_tokens: int = None, model_name: str = None):
+    def __init__(self, temperature: float = 0.0, max_tokens: int = None, model_name: str = None,
+                 provider: str = None):
         self.config = Config()
+        self.provider = provider or self.config.LLM_PROVIDER
         self.temperature = temperature
         self.max_tokens = max_tokens
         self.requested_model_name = model_name or self.config.MODEL_NAME
@@ -31,29 +103,40 @@ class LLMSetup:
     # Internal: build one concrete LLM for a given provider
     # ------------------------------------------------------------------
 
+    def _build_limited_llm(self, provider: str, model_name: str = None):
+        """_build_single_llm behind the (provider, model) rate limiter (core/rate_limit.py)."""
+        model = self._build_single_llm(provider, model_name)
+        name = model_name or _DEFAULT_MODELS.get(provider)
+        return rate_limited(model, provider, name, max_tokens=self.max_tokens)
+
     def _build_single_llm(self, provider: str, model_name: str = None):
         """Return a configured LangChain chat model for *provider*."""
         if provider == "groq":
-            name = model_name or "llama-3.1-8b-instant"
+            name = model_name or _DEFAULT_MODELS["groq"]
+            http_client, http_async_client = _groq_http_clients()
             return ChatGroq(
                 model=name,
                 temperature=self.temperature,
                 max_tokens=self.max_tokens,
                 timeout=self._TIMEOUT,
+                callbacks=self._CALLBACKS,
+                http_client=http_client,
+                http_async_client=http_async_client,
             )
 
         if provider == "gemini":
-            name = model_name or "gemini-2.5-flash"
+            name = model_name or _DEFAULT_MODELS["gemini"]
             return ChatGoogleGenerativeAI(
                 model=name,
                 temperature=self.temperature,
                 max_tokens=self.max_tokens,
                 convert_system_message_to_human=True,
                 timeout=self._TIMEOUT,
+                callbacks=self._CALLBACKS,
             )
 
         if provider == "huggingface":
-            name = model_name or "meta-llama/Meta-Llama-3-8B-Instruct"
+            name = model_name or _DEFAULT_MODELS["huggingface"]
             endpoint = HuggingFaceEndpoint(
                 repo_id=name,
                 temperature=self.temperature if self.temperature > 0 else 0.01,
@@ -61,15 +144,25 @@ class LLMSetup:
                 huggingfacehub_api_token=os.getenv("HUGGINGFACEHUB_API_TOKEN"),
                 timeout=self._TIMEOUT,
             )
-            return ChatHuggingFace(llm=endpoint)
+            return ChatHuggingFace(llm=endpoint, callbacks=self._CALLBACKS)
 
         if provider == "anthropic":
-            name = model_name or "claude-3-5-sonnet-latest"
+            name = model_name or _DEFAULT_MODELS["anthropic"]
+            if self.config.PROMPT_CACHE_ENABLED:
+                return _PromptCachingChatAnthropic(
+                    model_name=name,
+                    temperature=self.temperature,
+                    max_tokens=self.max_tokens or 1024,
+                    default_request_timeout=self._TIMEOUT,
+                    callbacks=self._CALLBACKS,
+                    cache_ttl=self.config.ANTHROPIC_CACHE_TTL,
+                )
             return ChatAnthropic(
                 model_name=name,
                 temperature=self.temperature,
                 max_tokens=self.max_tokens or 1024,
                 default_request_timeout=self._TIMEOUT,
+                callbacks=self._CALLBACKS,
             )
 
         raise ValueError(f"Unknown LLM provider '{provider}'. "
@@ -86,10 +179,18 @@ class LLMSetup:
         LLM_PROVIDER=auto  →  primary.with_fallbacks([fallback])
             If the primary raises ANY exception (timeout, rate-limit, 5xx …),
             LangChain transparently retries the same call on the fallback model.
+            AUTO_STRATEGY=hedge → core.hedging.HedgedChatModel: the fallback is
+            also started once the primary exceeds its p95 latency budget.
+            LLM_BREAKER_ENABLED → each leg is wrapped in a
+            core.circuit_breaker.GuardedModel that fails fast while its
+            provider's breaker is open.
 
         LLM_PROVIDER=<provider>  →  a single ChatModel as before.
+
+        Every concrete model is wrapped in a core.rate_limit.RateLimitedModel
+        when its (provider, model) has RPM / TPM limits configured.
         """
-        provider = self.config.LLM_PROVIDER
+        provider = self.provider
 
         if provider == "auto":
             p_prov  = self.config.AUTO_PRIMARY_PROVIDER
@@ -97,8 +198,11 @@ class LLMSetup:
             f_prov  = self.config.AUTO_FALLBACK_PROVIDER
             f_model = self.config.AUTO_FALLBACK_MODEL
 
-            primary  = self._build_single_llm(p_prov, p_model)
-            fallback = self._build_single_llm(f_prov, f_model)
+            primary  = self._build_limited_llm(p_prov, p_model)
+            fallback = self._build_limited_llm(f_prov, f_model)
+            if self.config.LLM_BREAKER_ENABLED:
+                # A tripped provider fails fast, so the chain skips straight to the other one
+                primary, fallback = GuardedModel(primary, p_prov), GuardedModel(fallback, f_prov)
 
             self.final_model_name = (
                 f"auto | primary={p_prov}/{p_model} "
@@ -108,6 +212,15 @@ class LLMSetup:
                 "LLM auto-fallback chain: %s/%s  →  %s/%s",
                 p_prov, p_model, f_prov, f_model,
             )
+            if self.config.AUTO_STRATEGY == "hedge":
+                # Fire the fallback in parallel once the primary exceeds its
+                # p95 latency budget instead of waiting for it to raise
+                self.final_model_name += " (hedged)"
+                return hedge(
+                    primary, fallback,
+                    primary_key=(p_prov, p_model or _DEFAULT_MODELS.get(p_prov)),
+                    fallback_key=(f_prov, f_model or _DEFAULT_MODELS.get(f_prov)),
+                )
             return primary.with_fallbacks(
                 [fallback],
                 exceptions_to_handle=_FALLBACK_EXCEPTIONS,
@@ -115,14 +228,48 @@ class LLMSetup:
 
         # Single provider mode (unchanged behaviour)
         self.final_model_name = self.requested_model_name
-        return self._build_single_llm(provider, self.requested_model_name)
+        return self._build_limited_llm(provider, self.requested_model_name)
 
     def get_llm(self):
         """Returns the initialized LLM (or auto-fallback chain)."""
         return self.llm
 
 
+# ---------------------------------------------------------------------------
+# Process-wide client registry
+# Chat models are stateless between calls (bind_tools returns a new binding),
+# so every agent asking for the same (provider, model, temperature,
+# max_tokens) shares one instance and its connection pool.
+# ---------------------------------------------------------------------------
+
+_clients: Dict[tuple, Any] = {}
+_clients_lock = threading.Lock()
+
+
+def _shared(key: tuple, build):
+    client = _clients.get(key)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(key)
+            if client is None:
+                client = _clients[key] = build()
+                _log.info("LLM client created: %s", key)
+    return client
+
+
 # Helper function — backward-compatible with all agents
-def get_llm(temperature: float = 0.0, max_tokens: int = None, model_name: str = None):
-    setup = LLMSetup(temperature=temperature, max_tokens=max_tokens, model_name=model_name)
-    return setup.get_llm()
+def get_llm(temperature: float = 0.0, max_tokens: int = None, model_name: str = None, provider: str = None):
+    """
+    Shared LLM (or auto-fallback chain). *provider* overrides LLM_PROVIDER,
+    e.g. the router always asks for groq/llama-3.1-8b-instant.
+    """
+    config = Config()
+    provider = provider or config.LLM_PROVIDER
+    key = (provider, model_name or config.MODEL_NAME or _DEFAULT_MODELS.get(provider), temperature, max_tokens)
+    return _shared(key, lambda: LLMSetup(
+        temperature=temperature, max_tokens=max_tokens, model_name=model_name, provider=provider).get_llm())
+
+
+def llm_client_count() -> int:
+    """Number of distinct chat model clients built in this process."""
+    return len(_clients)
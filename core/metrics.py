@@ -0,0 +1,402 @@
+"""
+metrics.py — Prometheus-style latency histograms and counters
+=============================================================
+Answers "where did the time go?" for a slow reply — the router LLM, the
+ReAct agent's second LLM hop, a tool's SQL query, or waiting for a pooled
+MySQL connection. Exposed in Prometheus text format on GET /metrics.
+
+  cso_node_duration_seconds{node, category}             graph node runs
+  cso_tool_duration_seconds{tool, category, status}     every @tool call
+  cso_llm_duration_seconds{provider, model, category, status}
+  cso_llm_time_to_first_token_seconds{provider, model, category}   streamed calls
+  cso_llm_input_tokens_total{provider, model, category, cache}     cache=read|write|none
+  cso_db_pool_wait_seconds{source}                      core.db.get_db_connection
+  cso_db_pool_in_use / _open / _waiters                 pool gauges (+ overflow / reconnect / timeout totals)
+  cso_db_query_seconds{query, phase}                    core.query — execute / fetch per tool query
+  cso_*_errors_total                                    failures per label set
+
+Nodes, tools and LLM calls are observed by one LangChain callback handler
+(metrics_handler). compile_app() binds it to the graph, so every nested run
+reports to it; core.llm_setup also attaches it to each chat model so LLM
+calls made outside the graph are covered too (LangChain de-duplicates the
+handler when both apply). Nodes inside a ReAct agent are reported as
+"<agent>/<node>", e.g. order_agent/agent and order_agent/tools.
+
+`category` is the ticket_category of the graph state the enclosing top-level
+node ran with. The router decides it, so its own node series carries the
+category it chose and its LLM call is labelled "none".
+
+Dependency-free: the registry renders the text exposition format itself, so
+no prometheus_client is needed.
+"""
+
+import asyncio
+import threading
+import time
+from bisect import bisect_left
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+# Seconds — Prometheus defaults, stretched for multi-hop LLM calls
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+# ---------------------------------------------------------------------------
+# Minimal metric types
+# ---------------------------------------------------------------------------
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, Any]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_labels(self.labelnames, key)} {value}")
+        return lines
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = float(value)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, *args, buckets: Iterable[float] = DEFAULT_BUCKETS, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[Tuple[str, ...], list] = {}   # key → [bucket counts..., sum, count]
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            series = self._series.setdefault(key, [0] * len(self.buckets) + [0.0, 0])
+            idx = bisect_left(self.buckets, value)
+            if idx < len(self.buckets):
+                series[idx] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def count(self, **labels) -> int:
+        series = self._series.get(self._key(labels))
+        return series[-1] if series else 0
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                cumulative = 0
+                for bound, n in zip(self.buckets, series):
+                    cumulative += n
+                    le = 'le="%s"' % bound
+                    lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, le)} {cumulative}")
+                le = 'le="+Inf"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, le)} {series[-1]}")
+                lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {series[-2]}")
+                lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {series[-1]}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def render(self, extra_gauges: Optional[Dict[str, Tuple[str, float]]] = None) -> str:
+        """Text exposition of every metric (+ point-in-time gauges {name: (help, value)})."""
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for name, (documentation, value) in (extra_gauges or {}).items():
+            lines += [f"# HELP {name} {documentation}", f"# TYPE {name} gauge", f"{name} {value}"]
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+NODE_DURATION = REGISTRY.register(Histogram(
+    "cso_node_duration_seconds", "Graph node run time.", ("node", "category")))
+NODE_ERRORS = REGISTRY.register(Counter(
+    "cso_node_errors_total", "Graph node runs that raised.", ("node", "category")))
+TOOL_DURATION = REGISTRY.register(Histogram(
+    "cso_tool_duration_seconds", "Tool call time.", ("tool", "category", "status")))
+LLM_DURATION = REGISTRY.register(Histogram(
+    "cso_llm_duration_seconds", "Chat model call time.", ("provider", "model", "category", "status")))
+LLM_ERRORS = REGISTRY.register(Counter(
+    "cso_llm_errors_total", "Chat model calls that raised.", ("provider", "model", "category")))
+LLM_TTFT = REGISTRY.register(Histogram(
+    "cso_llm_time_to_first_token_seconds", "Streamed chat model call time to the first token.",
+    ("provider", "model", "category")))
+# Prompt-cache effectiveness: input tokens served from the provider's cache
+# (read), written to it (write, Anthropic only) and billed in full (none)
+LLM_INPUT_TOKENS = REGISTRY.register(Counter(
+    "cso_llm_input_tokens_total", "Chat model input tokens by prompt-cache outcome.",
+    ("provider", "model", "category", "cache")))
+DB_POOL_WAIT = REGISTRY.register(Histogram(
+    "cso_db_pool_wait_seconds", "Time to obtain a MySQL connection.", ("source",),
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)))
+DB_POOL_IN_USE = REGISTRY.register(Gauge(
+    "cso_db_pool_in_use", "MySQL connections checked out of the pool."))
+DB_POOL_OPEN = REGISTRY.register(Gauge(
+    "cso_db_pool_open", "MySQL connections open (idle + in use, incl. overflow)."))
+DB_POOL_WAITERS = REGISTRY.register(Gauge(
+    "cso_db_pool_waiters", "Threads waiting for a MySQL connection."))
+DB_POOL_OVERFLOW = REGISTRY.register(Counter(
+    "cso_db_pool_overflow_total", "Checkouts that opened a connection beyond DB_POOL_SIZE."))
+DB_POOL_RECONNECTS = REGISTRY.register(Counter(
+    "cso_db_pool_reconnects_total", "Idle pooled connections found dead and reconnected."))
+DB_POOL_TIMEOUTS = REGISTRY.register(Counter(
+    "cso_db_pool_timeouts_total", "Checkouts that gave up after DB_POOL_TIMEOUT_S."))
+# phase="execute" → statement sent until the server answered | "fetch" → rows read
+DB_QUERY_DURATION = REGISTRY.register(Histogram(
+    "cso_db_query_seconds", "Tool SQL time per query name and phase.", ("query", "phase"),
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)))
+# error="timeout" (MAX_EXECUTION_TIME hit) | "error"
+DB_QUERY_ERRORS = REGISTRY.register(Counter(
+    "cso_db_query_errors_total", "Tool SQL statements that failed.", ("query", "error")))
+
+
+def render(extra_gauges: Optional[Dict[str, Tuple[str, float]]] = None) -> str:
+    return REGISTRY.render(extra_gauges)
+
+
+# ---------------------------------------------------------------------------
+# LangChain callback handler — nodes, tools, LLM calls
+# ---------------------------------------------------------------------------
+
+class _Run:
+    __slots__ = ("kind", "parent", "start", "labels", "category", "first_token")
+
+    def __init__(self, kind: str, parent: Optional[UUID], labels: Dict[str, str], category: Optional[str] = None):
+        self.kind = kind
+        self.parent = parent
+        self.start = time.perf_counter()
+        self.labels = labels
+        self.category = category
+        self.first_token = False
+
+
+def _input_tokens(response) -> Dict[str, int]:
+    """{read, write, none} input-token split from an LLMResult's usage_metadata."""
+    usage = None
+    for generations in getattr(response, "generations", None) or ():
+        for generation in generations:
+            usage = getattr(getattr(generation, "message", None), "usage_metadata", None) or usage
+    if not usage:
+        return {}
+    details = usage.get("input_token_details") or {}
+    read = details.get("cache_read") or 0
+    write = details.get("cache_creation") or 0
+    # LangChain's input_tokens already includes cache reads / writes
+    return {"read": read, "write": write, "none": max((usage.get("input_tokens") or 0) - read - write, 0)}
+
+
+def _node_path(metadata: Dict[str, Any]) -> str:
+    """'order_agent:<task>|agent:<task>' → 'order_agent/agent'."""
+    ns = metadata.get("langgraph_checkpoint_ns") or metadata.get("checkpoint_ns") or ""
+    path = [part.split(":")[0] for part in ns.split("|") if part]
+    return "/".join(path) or metadata.get("langgraph_node", "")
+
+
+class MetricsCallbackHandler(BaseCallbackHandler):
+    """Times node / tool / chat-model runs and records them in REGISTRY."""
+
+    run_inline = True        # bookkeeping only — never hop to an executor
+    raise_error = False
+
+    def __init__(self):
+        self._runs: Dict[UUID, _Run] = {}
+        self._lock = threading.Lock()
+
+    # -- bookkeeping -------------------------------------------------------
+
+    def _start(self, run_id: UUID, run: _Run) -> None:
+        with self._lock:
+            self._runs[run_id] = run
+
+    def _pop(self, run_id: UUID) -> Optional[_Run]:
+        with self._lock:
+            return self._runs.pop(run_id, None)
+
+    def _category(self, parent: Optional[UUID]) -> str:
+        with self._lock:
+            while parent is not None:
+                run = self._runs.get(parent)
+                if run is None:
+                    break
+                if run.category is not None:
+                    return run.category
+                parent = run.parent
+        return "none"
+
+    # -- chains (graph nodes) ----------------------------------------------
+
+    def on_chain_start(self, serialized, inputs, *, run_id, parent_run_id=None, metadata=None, name=None, **kwargs):
+        metadata = metadata or {}
+        node = metadata.get("langgraph_node")
+        name = name or (serialized or {}).get("name")
+        if not node or name != node:
+            # Graph wrappers, edge functions, sequences — only tracked for parentage
+            self._start(run_id, _Run("chain", parent_run_id, {}))
+            return
+        path = _node_path(metadata)
+        with self._lock:
+            parent = self._runs.get(parent_run_id)
+        if parent and parent.kind == "node" and parent.labels["node"] == path:
+            # A runnable named like its node (e.g. RunnableLambda "router") nested in the node run
+            self._start(run_id, _Run("chain", parent_run_id, {}))
+            return
+        category = None
+        if "/" not in path:   # top-level node: the state it runs with carries the category
+            category = (inputs.get("ticket_category") if isinstance(inputs, dict) else None) or "none"
+            if node == "router":
+                category = "none"
+        self._start(run_id, _Run("node", parent_run_id, {"node": path}, category))
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs):
+        run = self._pop(run_id)
+        if run and run.kind == "node":
+            category = run.category or self._category(run.parent)
+            if run.labels["node"] == "router" and isinstance(outputs, dict):
+                category = outputs.get("ticket_category") or category
+            NODE_DURATION.observe(time.perf_counter() - run.start, node=run.labels["node"], category=category)
+
+    def on_chain_error(self, error, *, run_id, **kwargs):
+        run = self._pop(run_id)
+        if run and run.kind == "node":
+            category = run.category or self._category(run.parent)
+            NODE_DURATION.observe(time.perf_counter() - run.start, node=run.labels["node"], category=category)
+            NODE_ERRORS.inc(node=run.labels["node"], category=category)
+
+    # -- tools -------------------------------------------------------------
+
+    def on_tool_start(self, serialized, input_str, *, run_id, parent_run_id=None, name=None, **kwargs):
+        tool = name or (serialized or {}).get("name", "unknown")
+        self._start(run_id, _Run("tool", parent_run_id, {"tool": tool}))
+
+    def _end_tool(self, run_id: UUID, status: str) -> None:
+        run = self._pop(run_id)
+        if run:
+            TOOL_DURATION.observe(
+                time.perf_counter() - run.start,
+                tool=run.labels["tool"], category=self._category(run.parent), status=status,
+            )
+
+    def on_tool_end(self, output, *, run_id, **kwargs):
+        self._end_tool(run_id, "ok")
+
+    def on_tool_error(self, error, *, run_id, **kwargs):
+        self._end_tool(run_id, "error")
+
+    # -- chat models -------------------------------------------------------
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, parent_run_id=None, metadata=None, **kwargs):
+        metadata = metadata or {}
+        labels = {
+            "provider": metadata.get("ls_provider") or (serialized or {}).get("id", ["", "unknown"])[-1],
+            "model": metadata.get("ls_model_name", "unknown"),
+        }
+        with self._lock:
+            parent = self._runs.get(parent_run_id)
+            if parent is not None and parent.kind == "llm":
+                # A wrapper model (core.hedging) calling real ones — its usage is the winner's
+                parent.kind = "llm-wrapper"
+        self._start(run_id, _Run("llm", parent_run_id, labels))
+
+    def on_llm_start(self, serialized, prompts, *, run_id, parent_run_id=None, metadata=None, **kwargs):
+        self.on_chat_model_start(serialized, prompts, run_id=run_id, parent_run_id=parent_run_id, metadata=metadata)
+
+    def on_llm_new_token(self, token, *, run_id, **kwargs):
+        with self._lock:
+            run = self._runs.get(run_id)
+            if run is None or run.first_token:
+                return
+            run.first_token = True
+        LLM_TTFT.observe(time.perf_counter() - run.start, category=self._category(run.parent), **run.labels)
+
+    def _end_abandoned_legs(self, run_id: UUID, category: str) -> None:
+        """A wrapper finished: legs it cancelled never report on_llm_error."""
+        with self._lock:
+            legs = [rid for rid, r in self._runs.items() if r.parent == run_id and r.kind == "llm"]
+            legs = [(rid, self._runs.pop(rid)) for rid in legs]
+        for _, leg in legs:
+            LLM_DURATION.observe(time.perf_counter() - leg.start, status="cancelled", category=category, **leg.labels)
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        run = self._pop(run_id)
+        if run:
+            category = self._category(run.parent)
+            if run.kind == "llm-wrapper":
+                self._end_abandoned_legs(run_id, category)
+            LLM_DURATION.observe(time.perf_counter() - run.start, status="ok", category=category, **run.labels)
+            if run.kind != "llm":
+                return
+            for cache, tokens in _input_tokens(response).items():
+                if tokens:
+                    LLM_INPUT_TOKENS.inc(tokens, cache=cache, category=category, **run.labels)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        run = self._pop(run_id)
+        if run:
+            category = self._category(run.parent)
+            if run.kind == "llm-wrapper":
+                self._end_abandoned_legs(run_id, category)
+            if isinstance(error, (asyncio.CancelledError, KeyboardInterrupt)):
+                # e.g. the losing leg of a hedged request — not a provider failure
+                LLM_DURATION.observe(time.perf_counter() - run.start, status="cancelled", category=category, **run.labels)
+                return
+            LLM_DURATION.observe(time.perf_counter() - run.start, status="error", category=category, **run.labels)
+            LLM_ERRORS.inc(category=category, **run.labels)
+
+
+metrics_handler = MetricsCallbackHandler()
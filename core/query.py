@@ -0,0 +1,270 @@
+"""
+query.py — Shared SQL executor for the tools
+============================================
+Every tool module used to check out a connection, open a dictionary cursor,
+execute, fetchall, normalize the rows its own way and close — four copies
+with slightly different row shapes. They all go through here now:
+
+  • rows       a list of dicts in column order; date / datetime / Decimal /
+               timedelta values become str, bytes are decoded, so every
+               tool serializes the same shapes
+  • timeout    SELECTs carry a /*+ MAX_EXECUTION_TIME(DB_QUERY_TIMEOUT_MS) */
+               hint, so a runaway report is killed by MySQL instead of
+               holding a pooled connection (0 disables the hint)
+  • prepared   prepared=True runs a fixed-shape query as a server-side
+               prepared statement. The cursor stays with the pooled
+               connection (PooledConnection.statements), so later calls
+               on that connection skip the parse and plan; at most
+               _MAX_PREPARED per connection, least recently used closed
+  • metrics    cso_db_query_seconds{query, phase="execute"|"fetch"} and
+               cso_db_query_errors_total{query, error} per query name
+
+fetch_all / fetch_one check a connection out for one statement; session()
+keeps one connection for several (the vacation writes, the two offer
+queries). The pool's connections autocommit, so statements that must land
+together go inside Session.transaction(). No connection →
+DatabaseUnavailable, whose message is the "Database connection failed."
+the tools have always returned. MySQL errors are raised unchanged for the
+tool to word.
+
+Under capture(), fetch_all / fetch_one record (name, sql, params) and
+return no rows instead of running — scripts/index_advisor.py uses this to
+collect the statements a tool generates and EXPLAIN them.
+
+Under dry_run(), reads run as usual but Session.execute / executemany skip
+their write and report 0 rows — core.batch uses this so a replay of the chat
+log answers vacation requests without marking or cancelling anything.
+"""
+
+import re
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from mysql.connector import Error
+
+from core.config import settings
+from core.db import PooledConnection, get_db_connection
+from core.metrics import DB_QUERY_DURATION, DB_QUERY_ERRORS
+
+_MAX_PREPARED = 32          # prepared statements kept per pooled connection
+_ER_QUERY_TIMEOUT = 3024    # "maximum statement execution time exceeded"
+
+_SELECT = re.compile(r"^(\s*SELECT)\b", re.IGNORECASE)
+
+_captured: ContextVar[Optional[list]] = ContextVar("query_capture", default=None)
+_dry_run: ContextVar[bool] = ContextVar("query_dry_run", default=False)
+
+
+class DatabaseUnavailable(Exception):
+    """No MySQL connection could be checked out."""
+
+    def __init__(self, message: str = "Database connection failed."):
+        super().__init__(message)
+
+
+# ---------------------------------------------------------------------------
+# Row normalization
+# ---------------------------------------------------------------------------
+
+def _value(v: Any) -> Any:
+    if v is None or isinstance(v, (int, float, str, bool)):
+        return v
+    if isinstance(v, (bytes, bytearray)):
+        return bytes(v).decode("utf-8", "replace")
+    return str(v)           # date, datetime, timedelta, Decimal
+
+
+def normalize_rows(rows: Sequence[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Rows as plain dicts of int / float / str / bool / None."""
+    return [{k: _value(v) for k, v in row.items()} for row in rows]
+
+
+# ---------------------------------------------------------------------------
+# Statement timeout
+# ---------------------------------------------------------------------------
+
+@lru_cache(maxsize=512)
+def _with_timeout(sql: str, timeout_ms: int) -> str:
+    """Add the MAX_EXECUTION_TIME optimizer hint to a SELECT (no-op otherwise).
+
+    Cached, so the same query text is the same str object on every call —
+    the prepared cursor re-uses its statement only for an identical object.
+    """
+    if timeout_ms <= 0 or "MAX_EXECUTION_TIME" in sql.upper():
+        return sql
+    return _SELECT.sub(rf"\1 /*+ MAX_EXECUTION_TIME({int(timeout_ms)}) */", sql, count=1)
+
+
+# ---------------------------------------------------------------------------
+# Session — one checked-out connection
+# ---------------------------------------------------------------------------
+
+class Session:
+    """Runs named statements on one connection and records their timings."""
+
+    def __init__(self, conn, timeout_ms: int = None):
+        self.conn = conn
+        self.timeout_ms = settings.DB_QUERY_TIMEOUT_MS if timeout_ms is None else timeout_ms
+        self._cursor = None
+
+    # -- cursors ---------------------------------------------------------------
+
+    def _plain(self):
+        if self._cursor is None:
+            self._cursor = self.conn.cursor(dictionary=True)
+        return self._cursor
+
+    def _prepared(self, sql: str):
+        """Cached prepared cursor for *sql* on this connection (None → not pooled / disabled)."""
+        if not settings.DB_PREPARED_STATEMENTS or not isinstance(self.conn, PooledConnection):
+            return None
+        cache = self.conn.statements
+        cursor = cache.get(sql)
+        if cursor is None:
+            cursor = self.conn.cursor(prepared=True, dictionary=True)
+            cache[sql] = cursor
+            while len(cache) > _MAX_PREPARED:
+                _, old = cache.popitem(last=False)
+                _close_quietly(old)
+        else:
+            cache.move_to_end(sql)
+        return cursor
+
+    def _forget(self, sql: str) -> None:
+        """Drop a prepared cursor that failed; the next call prepares it afresh."""
+        if isinstance(self.conn, PooledConnection):
+            cursor = self.conn.statements.pop(sql, None)
+            if cursor is not None:
+                _close_quietly(cursor)
+
+    def close(self) -> None:
+        if self._cursor is not None:
+            _close_quietly(self._cursor)
+            self._cursor = None
+
+    # -- statements ------------------------------------------------------------
+
+    def _run(self, name: str, sql: str, params: Sequence, prepared: bool, fetch: bool):
+        if not fetch and _dry_run.get():
+            return 0
+        sql = _with_timeout(sql, self.timeout_ms)
+        cursor = self._prepared(sql) if prepared else None
+        is_prepared = cursor is not None
+        if cursor is None:
+            cursor = self._plain()
+
+        t0 = time.perf_counter()
+        try:
+            cursor.execute(sql, tuple(params))
+            t1 = time.perf_counter()
+            rows = cursor.fetchall() if fetch else None
+        except Exception as e:
+            if is_prepared:
+                self._forget(sql)
+            timeout = isinstance(e, Error) and getattr(e, "errno", None) == _ER_QUERY_TIMEOUT
+            DB_QUERY_ERRORS.inc(query=name, error="timeout" if timeout else "error")
+            raise
+        DB_QUERY_DURATION.observe(t1 - t0, query=name, phase="execute")
+        if fetch:
+            DB_QUERY_DURATION.observe(time.perf_counter() - t1, query=name, phase="fetch")
+            return normalize_rows(rows)
+        return cursor.rowcount
+
+    def fetch_all(self, name: str, sql: str, params: Sequence = (), *,
+                  prepared: bool = False) -> List[Dict[str, Any]]:
+        return self._run(name, sql, params, prepared, fetch=True)
+
+    def fetch_one(self, name: str, sql: str, params: Sequence = (), *,
+                  prepared: bool = False) -> Optional[Dict[str, Any]]:
+        rows = self._run(name, sql, params, prepared, fetch=True)
+        return rows[0] if rows else None
+
+    def execute(self, name: str, sql: str, params: Sequence = (), *, prepared: bool = False) -> int:
+        """Run a write; returns the affected row count."""
+        return self._run(name, sql, params, prepared, fetch=False)
+
+    def executemany(self, name: str, sql: str, seq_params: Sequence[Sequence]) -> int:
+        if _dry_run.get():
+            return 0
+        cursor = self._plain()
+        t0 = time.perf_counter()
+        try:
+            cursor.executemany(sql, [tuple(p) for p in seq_params])
+        except Exception:
+            DB_QUERY_ERRORS.inc(query=name, error="error")
+            raise
+        DB_QUERY_DURATION.observe(time.perf_counter() - t0, query=name, phase="execute")
+        return cursor.rowcount
+
+    @contextmanager
+    def transaction(self) -> Iterator["Session"]:
+        """Run the enclosed statements as one transaction: committed on exit, rolled back on error."""
+        self.conn.start_transaction()
+        try:
+            yield self
+        except BaseException:
+            self.conn.rollback()
+            raise
+        self.conn.commit()
+
+
+def _close_quietly(cursor) -> None:
+    try:
+        cursor.close()
+    except Exception:
+        pass
+
+
+@contextmanager
+def session(timeout_ms: int = None) -> Iterator[Session]:
+    """One pooled connection for several statements; handed back on exit."""
+    conn = get_db_connection()
+    if not conn:
+        raise DatabaseUnavailable()
+    s = Session(conn, timeout_ms)
+    try:
+        yield s
+    finally:
+        s.close()
+        conn.close()
+
+
+def fetch_all(name: str, sql: str, params: Sequence = (), *,
+              prepared: bool = False) -> List[Dict[str, Any]]:
+    """Run one read-only statement and return its normalized rows."""
+    captured = _captured.get()
+    if captured is not None:
+        captured.append((name, sql, tuple(params)))
+        return []
+    with session() as s:
+        return s.fetch_all(name, sql, params, prepared=prepared)
+
+
+def fetch_one(name: str, sql: str, params: Sequence = (), *,
+              prepared: bool = False) -> Optional[Dict[str, Any]]:
+    rows = fetch_all(name, sql, params, prepared=prepared)
+    return rows[0] if rows else None
+
+
+@contextmanager
+def capture() -> Iterator[List[Tuple[str, str, tuple]]]:
+    """Record the (name, sql, params) of fetch_all / fetch_one calls instead of running them."""
+    captured: list = []
+    token = _captured.set(captured)
+    try:
+        yield captured
+    finally:
+        _captured.reset(token)
+
+
+@contextmanager
+def dry_run() -> Iterator[None]:
+    """Skip every write (Session.execute / executemany) in this context; reads still run."""
+    token = _dry_run.set(True)
+    try:
+        yield
+    finally:
+        _dry_run.reset(token)
@@ -1,4 +1,5 @@
 import os
+from functools import lru_cache
 from langchain_community.document_loaders import PyPDFLoader, TextLoader
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_chroma import Chroma
@@ -7,7 +8,10 @@ from langchain_huggingface import HuggingFaceEmbeddings
 from core.config import settings
 
 
+@lru_cache(maxsize=1)
 def get_embedding_model():
+    # One instance per process — shared by the RAG index, the response cache
+    # and the embedding router (loading a HuggingFace model takes seconds)
     if settings.EMBEDDING_PROVIDER == "google":
         model_name = settings.EMBEDDING_MODEL or "models/embedding-001"
         return GoogleGenerativeAIEmbeddings(model=model_name)
@@ -0,0 +1,336 @@
+"""
+rate_limit.py — Client-side token-bucket rate limiting per provider/model
+=========================================================================
+Provider quotas (e.g. Groq's requests- and tokens-per-minute limits) used to
+surface as 429 / 413 errors, and the call either failed or fell back. Every
+chat model built by core/llm_setup.py is now wrapped in a RateLimitedModel
+that waits for capacity before sending:
+
+  • each (provider, model) gets a request bucket (RPM) and a token bucket
+    (TPM), both refilled continuously and holding at most one minute of quota
+  • a call needs 1 request and its estimated tokens: the prompt (messages
+    and bound tool schemas, ~4 chars per token) plus max_tokens, or
+    RATE_LIMIT_COMPLETION_TOKENS when the model has no max_tokens set
+  • callers queue FIFO, so a large prompt is not starved by small ones
+  • a caller that cannot be served within RATE_LIMIT_MAX_WAIT_S raises
+    RateLimitTimeout (auto mode then moves on to the fallback)
+  • after the call the token bucket is corrected with the real usage_metadata
+
+Limits come from RATE_LIMIT_<PROVIDER>_RPM / _TPM (0 = unlimited) and
+RATE_LIMIT_MODEL_OVERRIDES. Queue depth and throttled time are exported on
+/metrics and GET /api/v1/admin/llm/rate-limits:
+
+  cso_llm_ratelimit_queue_depth{provider, model}     callers waiting now
+  cso_llm_ratelimit_wait_seconds{provider, model}    time spent queued per call
+  cso_llm_ratelimit_timeouts_total{provider, model}  calls that gave up
+"""
+
+import asyncio
+import json
+import threading
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Dict, Iterator, Optional, Tuple
+
+from langchain_core.messages import AIMessage
+from langchain_core.messages.utils import convert_to_messages, count_tokens_approximately
+from langchain_core.prompt_values import PromptValue
+from langchain_core.runnables import Runnable, RunnableBinding, RunnableConfig
+
+from core.config import settings
+from core.metrics import REGISTRY, Counter, Gauge, Histogram
+
+# How often callers behind the head of the queue re-check their turn
+_POLL_S = 0.05
+
+RATE_LIMIT_QUEUE = REGISTRY.register(Gauge(
+    "cso_llm_ratelimit_queue_depth", "Calls waiting for client-side LLM rate-limit capacity.",
+    ("provider", "model")))
+RATE_LIMIT_WAIT = REGISTRY.register(Histogram(
+    "cso_llm_ratelimit_wait_seconds", "Time LLM calls spent queued by the client-side rate limiter.",
+    ("provider", "model")))
+RATE_LIMIT_TIMEOUTS = REGISTRY.register(Counter(
+    "cso_llm_ratelimit_timeouts_total", "LLM calls that gave up after RATE_LIMIT_MAX_WAIT_S.",
+    ("provider", "model")))
+
+
+class RateLimitTimeout(RuntimeError):
+    """No rate-limit capacity for this call within the maximum wait."""
+
+
+class TokenBucket:
+    """Continuously refilled bucket; the level may go negative after a usage correction."""
+
+    def __init__(self, per_minute: int):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.level = self.capacity
+        self._updated = time.monotonic()
+
+    def refill(self, now: float) -> None:
+        self.level = min(self.capacity, self.level + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait_for(self, amount: float) -> float:
+        """Seconds until *amount* is available (requests larger than the bucket wait for a full one)."""
+        missing = min(amount, self.capacity) - self.level
+        return max(missing, 0.0) / self.rate
+
+
+class RateLimiter:
+    """Request + token buckets of one (provider, model), with a FIFO wait queue."""
+
+    def __init__(self, provider: str, model: str, rpm: int = 0, tpm: int = 0, max_wait_s: float = None):
+        self.provider = provider
+        self.model = model
+        self.rpm = rpm
+        self.tpm = tpm
+        self.max_wait_s = max_wait_s if max_wait_s is not None else settings.RATE_LIMIT_MAX_WAIT_S
+        self._requests = TokenBucket(rpm) if rpm else None
+        self._tokens = TokenBucket(tpm) if tpm else None
+        self._queue: deque = deque()
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.throttled_calls = 0
+        self.throttled_s = 0.0
+        self.timeouts = 0
+        RATE_LIMIT_QUEUE.set(0, provider=provider, model=model)
+
+    def _labels(self) -> Dict[str, str]:
+        return {"provider": self.provider, "model": self.model}
+
+    def _poll(self, ticket: object, tokens: int) -> Tuple[float, bool]:
+        """
+        (0, True) → the call may go now (capacity taken); otherwise (seconds to
+        wait before re-checking, whether the ticket is at the head of the queue).
+        """
+        with self._lock:
+            if self._queue[0] is not ticket:
+                return _POLL_S, False
+            now = time.monotonic()
+            wait = 0.0
+            for bucket, amount in ((self._requests, 1), (self._tokens, tokens)):
+                if bucket is not None:
+                    bucket.refill(now)
+                    wait = max(wait, bucket.wait_for(amount))
+            if wait > 0:
+                return wait, True
+            if self._requests is not None:
+                self._requests.level -= 1
+            if self._tokens is not None:
+                self._tokens.level -= min(tokens, self._tokens.capacity)
+            self._queue.popleft()
+            return 0.0, True
+
+    def _enter(self) -> object:
+        ticket = object()
+        with self._lock:
+            self._queue.append(ticket)
+            RATE_LIMIT_QUEUE.set(len(self._queue), **self._labels())
+        return ticket
+
+    def _leave(self, ticket: object, waited: float, acquired: bool, throttled: bool) -> None:
+        with self._lock:
+            if not acquired and ticket in self._queue:
+                self._queue.remove(ticket)
+            RATE_LIMIT_QUEUE.set(len(self._queue), **self._labels())
+            self.calls += acquired
+            if throttled:
+                self.throttled_calls += 1
+                self.throttled_s += waited
+        RATE_LIMIT_WAIT.observe(waited, **self._labels())
+
+    def _next_sleep(self, wait: float, deadline: float, head: bool, tokens: int) -> float:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0 or (head and wait > remaining):
+            with self._lock:
+                self.timeouts += 1
+            RATE_LIMIT_TIMEOUTS.inc(**self._labels())
+            raise RateLimitTimeout(
+                f"{self.provider}/{self.model}: no rate-limit capacity for ~{tokens} tokens "
+                f"within {self.max_wait_s:g}s")
+        return min(wait, remaining)
+
+    def acquire(self, tokens: int) -> float:
+        """Block until the call may be sent; returns the seconds spent waiting."""
+        ticket, start, acquired, throttled = self._enter(), time.monotonic(), False, False
+        deadline = start + self.max_wait_s
+        try:
+            while True:
+                wait, head = self._poll(ticket, tokens)
+                if wait == 0:
+                    acquired = True
+                    return time.monotonic() - start
+                throttled = True
+                time.sleep(self._next_sleep(wait, deadline, head, tokens))
+        finally:
+            self._leave(ticket, time.monotonic() - start, acquired, throttled)
+
+    async def aacquire(self, tokens: int) -> float:
+        ticket, start, acquired, throttled = self._enter(), time.monotonic(), False, False
+        deadline = start + self.max_wait_s
+        try:
+            while True:
+                wait, head = self._poll(ticket, tokens)
+                if wait == 0:
+                    acquired = True
+                    return time.monotonic() - start
+                throttled = True
+                await asyncio.sleep(self._next_sleep(wait, deadline, head, tokens))
+        finally:
+            self._leave(ticket, time.monotonic() - start, acquired, throttled)
+
+    def settle(self, estimated: int, actual: Optional[int]) -> None:
+        """Correct the token bucket once the provider reported the real usage."""
+        if self._tokens is None or not actual:
+            return
+        with self._lock:
+            self._tokens.level -= actual - min(estimated, self._tokens.capacity)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            now = time.monotonic()
+            for bucket in (self._requests, self._tokens):
+                if bucket is not None:
+                    bucket.refill(now)
+            return {
+                "rpm": self.rpm or None,
+                "tpm": self.tpm or None,
+                "queued": len(self._queue),
+                "requests_available": round(self._requests.level, 1) if self._requests else None,
+                "tokens_available": round(self._tokens.level) if self._tokens else None,
+                "calls": self.calls,
+                "throttled_calls": self.throttled_calls,
+                "throttled_s_total": round(self.throttled_s, 3),
+                "timeouts": self.timeouts,
+            }
+
+
+# ---------------------------------------------------------------------------
+# Limiter registry — one per (provider, model), shared by every client of it
+# ---------------------------------------------------------------------------
+
+_limiters: Dict[Tuple[str, str], RateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def _limits(provider: str, model: str) -> Tuple[int, int]:
+    """(rpm, tpm) for a model: RATE_LIMIT_MODEL_OVERRIDES ("model=rpm/tpm,…") over the provider's."""
+    for entry in filter(None, (e.strip() for e in settings.RATE_LIMIT_MODEL_OVERRIDES.split(","))):
+        name, _, limits = entry.rpartition("=")
+        if name.strip() == model:
+            rpm, _, tpm = limits.partition("/")
+            return int(rpm or 0), int(tpm or 0)
+    return settings.RATE_LIMITS.get(provider, (0, 0))
+
+
+def get_limiter(provider: str, model: str) -> Optional[RateLimiter]:
+    """Shared limiter for (provider, model); None when it has no limits."""
+    with _limiters_lock:
+        limiter = _limiters.get((provider, model))
+        if limiter is None:
+            rpm, tpm = _limits(provider, model)
+            if not rpm and not tpm:
+                return None
+            limiter = _limiters[(provider, model)] = RateLimiter(provider, model, rpm, tpm)
+        return limiter
+
+
+def limiter_states() -> Dict[str, Dict[str, Any]]:
+    with _limiters_lock:
+        limiters = list(_limiters.values())
+    return {f"{l.provider}/{l.model}": l.snapshot() for l in limiters}
+
+
+# ---------------------------------------------------------------------------
+# Token estimates
+# ---------------------------------------------------------------------------
+
+def _prompt_tokens(input: Any) -> int:
+    try:
+        if isinstance(input, str):
+            return len(input) // 4 + 1
+        if isinstance(input, PromptValue):
+            input = input.to_messages()
+        return count_tokens_approximately(convert_to_messages(input))
+    except Exception:
+        return len(str(input)) // 4 + 1
+
+
+def _tool_tokens(bound: Runnable) -> int:
+    if isinstance(bound, RunnableBinding) and bound.kwargs.get("tools"):
+        return len(json.dumps(bound.kwargs["tools"], default=str)) // 4
+    return 0
+
+
+def _usage(message: Any) -> Optional[int]:
+    usage = getattr(message, "usage_metadata", None) if isinstance(message, AIMessage) else None
+    return usage.get("total_tokens") if usage else None
+
+
+class RateLimitedModel(Runnable):
+    """
+    Sends *bound* (a chat model or its tool binding) only when its limiter
+    has capacity. Like GuardedModel, a plain Runnable: it adds no LLM run to
+    callbacks / metrics and passes the config straight through.
+    """
+
+    def __init__(self, bound: Runnable, limiter: RateLimiter, completion_tokens: int = None):
+        self.bound = bound
+        self.limiter = limiter
+        self.completion_tokens = completion_tokens or settings.RATE_LIMIT_COMPLETION_TOKENS
+        self._overhead = _tool_tokens(bound)
+
+    def _wrap(self, bound: Runnable) -> "RateLimitedModel":
+        return RateLimitedModel(bound, self.limiter, self.completion_tokens)
+
+    def bind_tools(self, tools, **kwargs) -> "RateLimitedModel":
+        return self._wrap(self.bound.bind_tools(tools, **kwargs))
+
+    def with_structured_output(self, schema, **kwargs) -> "RateLimitedModel":
+        return self._wrap(self.bound.with_structured_output(schema, **kwargs))
+
+    def estimate(self, input: Any) -> int:
+        return _prompt_tokens(input) + self._overhead + self.completion_tokens
+
+    def invoke(self, input, config: Optional[RunnableConfig] = None, **kwargs):
+        estimated = self.estimate(input)
+        self.limiter.acquire(estimated)
+        result = self.bound.invoke(input, config, **kwargs)
+        self.limiter.settle(estimated, _usage(result))
+        return result
+
+    async def ainvoke(self, input, config: Optional[RunnableConfig] = None, **kwargs):
+        estimated = self.estimate(input)
+        await self.limiter.aacquire(estimated)
+        result = await self.bound.ainvoke(input, config, **kwargs)
+        self.limiter.settle(estimated, _usage(result))
+        return result
+
+    def stream(self, input, config: Optional[RunnableConfig] = None, **kwargs) -> Iterator:
+        estimated = self.estimate(input)
+        self.limiter.acquire(estimated)
+        used = 0
+        for chunk in self.bound.stream(input, config, **kwargs):
+            used += _usage(chunk) or 0
+            yield chunk
+        self.limiter.settle(estimated, used)
+
+    async def astream(self, input, config: Optional[RunnableConfig] = None, **kwargs) -> AsyncIterator:
+        estimated = self.estimate(input)
+        await self.limiter.aacquire(estimated)
+        used = 0
+        async for chunk in self.bound.astream(input, config, **kwargs):
+            used += _usage(chunk) or 0
+            yield chunk
+        self.limiter.settle(estimated, used)
+
+
+def rate_limited(model: Runnable, provider: str, model_name: str, max_tokens: int = None) -> Runnable:
+    """*model* behind its (provider, model) limiter, or unchanged when that model has no limits."""
+    if not settings.RATE_LIMIT_ENABLED:
+        return model
+    limiter = get_limiter(provider, model_name)
+    if limiter is None:
+        return model
+    return RateLimitedModel(model, limiter, completion_tokens=max_tokens)
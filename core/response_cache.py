@@ -0,0 +1,237 @@
+"""
+response_cache.py — Semantic response cache in front of the graph
+=================================================================
+Much of the traffic is the same few catalog / offer / FAQ questions
+("koi offer chal raha hai?", "milk ka rate kya hai?"). Each one costs a router
+LLM call, a ReAct loop and DB queries. This cache answers repeats directly.
+
+  key          (role, embedding of the normalized question) — the lookup runs
+               before routing, so the category is not part of the key; it is
+               stored with the entry, returned with a hit and drives
+               invalidation. The embedding model is
+               core.rag_setup.get_embedding_model()
+  match        cosine similarity >= RESPONSE_CACHE_THRESHOLD within the
+               caller's role; identical normalized questions skip embedding
+  lifetime     RESPONSE_CACHE_TTL_S, LRU eviction beyond RESPONSE_CACHE_MAX_ENTRIES
+  invalidation every entry records the data versions its category depends on
+               (product → product + offer, general → policy). invalidate(source)
+               bumps a version and every dependent entry goes stale at once.
+
+Only SHARED_CATEGORIES are ever stored. User-specific categories (order,
+wallet, subscription) answer from the customer's own data, so they are never
+cached — and therefore never served to another user.
+
+The key ignores the thread's history, so only context-free messages may be
+looked up or stored (is_cacheable). Skipped are:
+
+  • escalation wording (lawyer, complaint …) — the router must see it
+  • any message in a thread whose last turn, within ROUTER_STICKY_TTL_S,
+    was a user-specific (or unknown) category
+  • follow-ups ("what's its price?", "and ghee?") within that window of a
+    previous turn — their answer depends on it, and they are the turns
+    sticky routing keeps with the previous agent
+"""
+
+import asyncio
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from agents.router_rules import is_follow_up, mentions_escalation
+from core.config import settings
+from core.metrics import REGISTRY, Counter
+
+# category → data sources its answers are built from
+SHARED_CATEGORIES: Dict[str, Tuple[str, ...]] = {
+    "product": ("product", "offer"),
+    "general": ("policy",),
+}
+DATA_SOURCES = ("product", "offer", "policy")
+
+CACHE_LOOKUPS = REGISTRY.register(Counter(
+    "cso_response_cache_lookups_total", "Response cache lookups.", ("result",)))
+
+_NON_WORD = re.compile(r"[^\w\s]+")
+_SPACES = re.compile(r"\s+")
+
+
+def normalize_question(text: str) -> str:
+    """Lower-case, drop punctuation and collapse whitespace."""
+    return _SPACES.sub(" ", _NON_WORD.sub(" ", text.lower())).strip()
+
+
+def is_cacheable(question: str, recent_category: Optional[str]) -> bool:
+    """Whether *question* may be answered from / stored in the cache.
+
+    *recent_category* is the thread's category if its last turn was within
+    ROUTER_STICKY_TTL_S, else None (core.turn.arecent_category).
+    """
+    if mentions_escalation(question):
+        return False
+    if recent_category is None:
+        return True
+    if recent_category not in SHARED_CATEGORIES:
+        return False
+    return not is_follow_up(question, settings.ROUTER_STICKY_MAX_WORDS)
+
+
+@dataclass
+class CacheHit:
+    category: str
+    response: str
+    similarity: float
+
+
+@dataclass
+class _Entry:
+    role: str
+    category: str
+    question: str                       # normalized
+    vector: np.ndarray                  # unit length
+    response: str
+    created: float = field(default_factory=time.time)
+    versions: Dict[str, int] = field(default_factory=dict)
+
+
+class ResponseCache:
+    """Thread-safe in-process semantic cache; see module docstring."""
+
+    def __init__(
+        self,
+        embedder=None,
+        *,
+        threshold: float = None,
+        ttl_s: float = None,
+        max_entries: int = None,
+    ):
+        self._embedder = embedder
+        self.threshold = threshold if threshold is not None else settings.RESPONSE_CACHE_THRESHOLD
+        self.ttl_s = ttl_s if ttl_s is not None else settings.RESPONSE_CACHE_TTL_S
+        self.max_entries = max_entries if max_entries is not None else settings.RESPONSE_CACHE_MAX_ENTRIES
+        self._entries: "OrderedDict[int, _Entry]" = OrderedDict()
+        self._vectors: "OrderedDict[str, np.ndarray]" = OrderedDict()   # normalized question → embedding
+        self._versions = {source: 0 for source in DATA_SOURCES}
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    # -- embeddings --------------------------------------------------------
+
+    def _embed(self, question: str) -> np.ndarray:
+        with self._lock:
+            vec = self._vectors.get(question)
+            if vec is not None:
+                self._vectors.move_to_end(question)
+                return vec
+        if self._embedder is None:
+            from core.rag_setup import get_embedding_model
+            self._embedder = get_embedding_model()
+        vec = np.asarray(self._embedder.embed_query(question), dtype=np.float32)
+        vec /= (np.linalg.norm(vec) or 1.0)
+        with self._lock:
+            self._vectors[question] = vec
+            while len(self._vectors) > max(64, self.max_entries):
+                self._vectors.popitem(last=False)
+        return vec
+
+    # -- lookup / store ----------------------------------------------------
+
+    def _is_live(self, entry: _Entry, now: float) -> bool:
+        if self.ttl_s > 0 and now - entry.created > self.ttl_s:
+            return False
+        return all(self._versions[s] == v for s, v in entry.versions.items())
+
+    def lookup(self, question: str, role: str) -> Optional[CacheHit]:
+        """Best live entry for *question* asked by *role*, if similar enough."""
+        normalized = normalize_question(question)
+        if not normalized or not self._entries:
+            CACHE_LOOKUPS.inc(result="miss")
+            return None
+        vec = self._embed(normalized)
+        now = time.time()
+        best: Optional[Tuple[float, int]] = None
+        with self._lock:
+            stale: List[int] = []
+            for key, entry in self._entries.items():
+                if entry.role != role:
+                    continue
+                if not self._is_live(entry, now):
+                    stale.append(key)
+                    continue
+                similarity = 1.0 if entry.question == normalized else float(np.dot(vec, entry.vector))
+                if similarity >= self.threshold and (best is None or similarity > best[0]):
+                    best = (similarity, key)
+            for key in stale:
+                del self._entries[key]
+            if best is None:
+                CACHE_LOOKUPS.inc(result="miss")
+                return None
+            self._entries.move_to_end(best[1])
+            entry = self._entries[best[1]]
+        CACHE_LOOKUPS.inc(result="hit")
+        return CacheHit(category=entry.category, response=entry.response, similarity=best[0])
+
+    def store(self, question: str, role: str, category: str, response: str) -> bool:
+        """Cache an answer. Returns False for user-specific categories or empty answers."""
+        if category not in SHARED_CATEGORIES or not response:
+            return False
+        normalized = normalize_question(question)
+        if not normalized:
+            return False
+        vec = self._embed(normalized)
+        with self._lock:
+            versions = {s: self._versions[s] for s in SHARED_CATEGORIES[category]}
+            for key, entry in list(self._entries.items()):
+                if entry.role == role and entry.question == normalized:
+                    del self._entries[key]
+            self._entries[self._next_id] = _Entry(role, category, normalized, vec, response, versions=versions)
+            self._next_id += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return True
+
+    # -- invalidation ------------------------------------------------------
+
+    def invalidate(self, source: str = None) -> int:
+        """
+        Bump the data version of *source* (product / offer / policy) so every
+        entry built from it goes stale, or clear everything when source is None.
+        Returns the number of entries dropped.
+        """
+        with self._lock:
+            if source is None:
+                dropped = len(self._entries)
+                self._entries.clear()
+                return dropped
+            if source not in self._versions:
+                raise ValueError(f"Unknown data source '{source}'. Valid: {', '.join(DATA_SOURCES)}")
+            self._versions[source] += 1
+            stale = [k for k, e in self._entries.items() if source in e.versions]
+            for key in stale:
+                del self._entries[key]
+            return len(stale)
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            by_category: Dict[str, int] = {}
+            for entry in self._entries.values():
+                by_category[entry.category] = by_category.get(entry.category, 0) + 1
+            return {
+                "entries": len(self._entries),
+                "by_category": by_category,
+                "versions": dict(self._versions),
+                "hits": CACHE_LOOKUPS.value(result="hit"),
+                "misses": CACHE_LOOKUPS.value(result="miss"),
+            }
+
+    # -- async wrappers (embedding calls block) ----------------------------
+
+    async def alookup(self, question: str, role: str) -> Optional[CacheHit]:
+        return await asyncio.to_thread(self.lookup, question, role)
+
+    async def astore(self, question: str, role: str, category: str, response: str) -> bool:
+        return await asyncio.to_thread(self.store, question, role, category, response)
@@ -0,0 +1,235 @@
+"""
+retention.py — Checkpoint retention, compaction and vacuum
+==========================================================
+Every graph step writes a full checkpoint and nothing was ever deleted, while
+the UI opens a fresh thread_id on every "New Chat" / logout. This module keeps
+the checkpoint store bounded:
+
+  compact()      keep only the latest CHECKPOINT_KEEP_LAST checkpoints per
+                 thread (+ their pending writes). Older ones are never read by
+                 get_state — the graph's channels are not delta-encoded, so
+                 every checkpoint carries the full state. Checkpoints of
+                 finished ReAct subgraph runs (namespace "<agent>:<task_id>",
+                 a new one every turn) are dropped once the root graph has
+                 checkpointed past them.
+  expire_idle()  delete threads whose newest checkpoint is older than
+                 CHECKPOINT_THREAD_TTL_HOURS. Threads paused for human
+                 escalation are kept until a human has dealt with them.
+  vacuum()       reclaim space + refresh planner stats
+                 (SQLite: VACUUM / ANALYZE / WAL truncate, MySQL: OPTIMIZE / ANALYZE)
+  stats()        size and row counts, for GET /api/v1/admin/checkpoints/stats
+
+RetentionWorker runs compact + expire every CHECKPOINT_RETENTION_INTERVAL_S
+and vacuum every CHECKPOINT_VACUUM_INTERVAL_S on a daemon thread.
+"""
+
+import os
+import threading
+import time
+from typing import Dict, List, Optional
+
+from langgraph.checkpoint.base.id import UUID as CheckpointUUID
+
+from core.config import settings
+from core.checkpointer import MySQLSaver, PooledSqliteSaver, get_checkpointer
+
+# Offset between the UUID epoch (1582-10-15) and the Unix epoch, in 100 ns units
+_UUID_EPOCH_OFFSET = 0x01B21DD213814000
+_DELETE_BATCH = 500
+
+
+def checkpoint_age_s(checkpoint_id: str, now: Optional[float] = None) -> float:
+    """Age in seconds of a (uuid6) checkpoint id."""
+    ts = (CheckpointUUID(checkpoint_id).time - _UUID_EPOCH_OFFSET) / 1e7
+    return (now or time.time()) - ts
+
+
+class CheckpointRetention:
+    """Backend-aware maintenance for a core.checkpointer saver."""
+
+    def __init__(self, saver=None):
+        self.saver = saver or get_checkpointer()
+        if isinstance(self.saver, PooledSqliteSaver):
+            self.backend = "sqlite"
+            self._cp, self._wr = "checkpoints", "writes"
+        elif isinstance(self.saver, MySQLSaver):
+            self.backend = "mysql"
+            self._cp, self._wr = "lg_checkpoints", "lg_checkpoint_writes"
+        else:
+            raise ValueError(f"Retention not supported for {type(self.saver).__name__}")
+        self._ph = "?" if self.backend == "sqlite" else "%s"
+
+    # -- low-level helpers -------------------------------------------------
+
+    def _execute(self, query: str, params: tuple = ()) -> int:
+        with self.saver.cursor() as cur:
+            cur.execute(query, params)
+            return cur.rowcount
+
+    def _fetchall(self, query: str, params: tuple = ()) -> list:
+        with self.saver.cursor() as cur:
+            cur.execute(query, params)
+            return cur.fetchall()
+
+    # -- compaction --------------------------------------------------------
+
+    def compact(self, keep_last: int = None) -> Dict[str, int]:
+        """Keep only the newest *keep_last* checkpoints per (thread, namespace)."""
+        keep_last = keep_last if keep_last is not None else settings.CHECKPOINT_KEEP_LAST
+        if keep_last < 1:
+            return {"checkpoints_deleted": 0, "writes_deleted": 0}
+
+        ranked = (
+            f"SELECT thread_id, checkpoint_ns, checkpoint_id, "
+            f"ROW_NUMBER() OVER (PARTITION BY thread_id, checkpoint_ns ORDER BY checkpoint_id DESC) AS rn "
+            f"FROM {self._cp}"
+        )
+        finished_subgraphs = (
+            f"SELECT s.thread_id, s.checkpoint_ns, s.checkpoint_id FROM {self._cp} s "
+            f"JOIN (SELECT thread_id, MAX(checkpoint_id) AS root_id FROM {self._cp} "
+            f"WHERE checkpoint_ns = '' GROUP BY thread_id) r ON r.thread_id = s.thread_id "
+            f"WHERE s.checkpoint_ns <> '' AND s.checkpoint_id < r.root_id LIMIT {self._ph}"
+        )
+        deleted = 0
+        while True:
+            # Delete in small batches so writers are never blocked for long
+            victims = self._fetchall(
+                f"SELECT thread_id, checkpoint_ns, checkpoint_id FROM ({ranked}) r "
+                f"WHERE rn > {self._ph} LIMIT {self._ph}",
+                (keep_last, _DELETE_BATCH),
+            )
+            victims += self._fetchall(finished_subgraphs, (_DELETE_BATCH,))
+            victims = list(dict.fromkeys(tuple(v) for v in victims))
+            if not victims:
+                break
+            deleted += self._delete_checkpoints(victims)
+        writes_deleted = self._delete_orphan_writes()
+        return {"checkpoints_deleted": deleted, "writes_deleted": writes_deleted}
+
+    def _delete_checkpoints(self, keys: List[tuple]) -> int:
+        with self.saver.cursor() as cur:
+            cur.executemany(
+                f"DELETE FROM {self._cp} WHERE thread_id = {self._ph} "
+                f"AND checkpoint_ns = {self._ph} AND checkpoint_id = {self._ph}",
+                keys,
+            )
+        return len(keys)
+
+    def _delete_orphan_writes(self) -> int:
+        return self._execute(
+            f"DELETE FROM {self._wr} WHERE NOT EXISTS ("
+            f"SELECT 1 FROM {self._cp} c WHERE c.thread_id = {self._wr}.thread_id "
+            f"AND c.checkpoint_ns = {self._wr}.checkpoint_ns "
+            f"AND c.checkpoint_id = {self._wr}.checkpoint_id)"
+        )
+
+    # -- TTL expiry --------------------------------------------------------
+
+    def _is_awaiting_human(self, thread_id: str) -> bool:
+        row = self.saver.get_thread_status(thread_id)
+        if row is not None:
+            return row["status"] == "paused"
+        tup = self.saver.get_tuple({"configurable": {"thread_id": thread_id}})
+        return bool(tup and tup.checkpoint["channel_values"].get("needs_escalation"))
+
+    def expire_idle(self, ttl_hours: float = None) -> Dict[str, int]:
+        """Delete whole threads idle for longer than *ttl_hours*."""
+        ttl_hours = ttl_hours if ttl_hours is not None else settings.CHECKPOINT_THREAD_TTL_HOURS
+        if ttl_hours <= 0:
+            return {"threads_expired": 0}
+
+        ttl_s = ttl_hours * 3600
+        now = time.time()
+        latest = self._fetchall(f"SELECT thread_id, MAX(checkpoint_id) FROM {self._cp} GROUP BY thread_id")
+        expired = 0
+        for thread_id, checkpoint_id in latest:
+            if checkpoint_age_s(checkpoint_id, now) < ttl_s:
+                continue
+            if self._is_awaiting_human(thread_id):
+                continue
+            self.saver.delete_thread(thread_id)
+            expired += 1
+        return {"threads_expired": expired}
+
+    # -- vacuum / analyze --------------------------------------------------
+
+    def vacuum(self) -> None:
+        """Reclaim free pages and refresh query-planner statistics."""
+        if self.backend == "sqlite":
+            conn = self.saver.conn
+            conn.commit()
+            conn.execute("VACUUM")
+            conn.execute("ANALYZE")
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        else:
+            for table in (self._cp, self._wr):
+                self._fetchall(f"OPTIMIZE TABLE {table}")
+                self._fetchall(f"ANALYZE TABLE {table}")
+
+    # -- stats -------------------------------------------------------------
+
+    def stats(self) -> Dict[str, object]:
+        counts = {
+            "checkpoints": self._fetchall(f"SELECT COUNT(*) FROM {self._cp}")[0][0],
+            "writes": self._fetchall(f"SELECT COUNT(*) FROM {self._wr}")[0][0],
+            "threads": self._fetchall(f"SELECT COUNT(DISTINCT thread_id) FROM {self._cp}")[0][0],
+        }
+        if self.backend == "sqlite":
+            path = self.saver.path
+            conn = self.saver.conn
+            page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+            free_pages = conn.execute("PRAGMA freelist_count").fetchone()[0]
+            size = {
+                "db_bytes": os.path.getsize(path) if os.path.exists(path) else 0,
+                "wal_bytes": os.path.getsize(path + "-wal") if os.path.exists(path + "-wal") else 0,
+                "free_bytes": page_size * free_pages,
+            }
+        else:
+            rows = self._fetchall(
+                "SELECT COALESCE(SUM(data_length + index_length), 0), COALESCE(SUM(data_free), 0) "
+                "FROM information_schema.TABLES "
+                "WHERE table_schema = DATABASE() AND table_name IN (%s, %s)",
+                (self._cp, self._wr),
+            )
+            size = {"db_bytes": int(rows[0][0]), "free_bytes": int(rows[0][1])}
+        return {"backend": self.backend, **counts, **size}
+
+    def run_once(self, vacuum: bool = False) -> Dict[str, object]:
+        """One maintenance pass: compact + expire (+ vacuum)."""
+        report: Dict[str, object] = {}
+        report.update(self.compact())
+        report.update(self.expire_idle())
+        if vacuum:
+            self.vacuum()
+            report["vacuumed"] = True
+        return report
+
+
+class RetentionWorker(threading.Thread):
+    """Daemon thread running CheckpointRetention on a schedule."""
+
+    def __init__(self, retention: CheckpointRetention = None,
+                 interval_s: float = None, vacuum_interval_s: float = None):
+        super().__init__(name="checkpoint-retention", daemon=True)
+        self.retention = retention or CheckpointRetention()
+        self.interval_s = interval_s if interval_s is not None else settings.CHECKPOINT_RETENTION_INTERVAL_S
+        self.vacuum_interval_s = (
+            vacuum_interval_s if vacuum_interval_s is not None else settings.CHECKPOINT_VACUUM_INTERVAL_S
+        )
+        self._stop_event = threading.Event()
+        self._last_vacuum = time.monotonic()
+        self.last_report: Dict[str, object] = {}
+
+    def run(self):
+        while not self._stop_event.wait(self.interval_s):
+            due = self.vacuum_interval_s > 0 and time.monotonic() - self._last_vacuum >= self.vacuum_interval_s
+            try:
+                self.last_report = self.retention.run_once(vacuum=due)
+                if due:
+                    self._last_vacuum = time.monotonic()
+                print(f"[Retention] {self.last_report}")
+            except Exception as e:
+                print(f"[Retention] Maintenance pass failed: {e}")
+
+    def stop(self):
+        self._stop_event.set()
@@ -1,12 +1,14 @@
 # core/state.py
 from typing import TypedDict, Annotated, Sequence, Optional
 from langchain_core.messages import BaseMessage
-import operator
+from langgraph.graph.message import add_messages
+from langgraph.prebuilt.chat_agent_executor import AgentState
 
 class SupportState(TypedDict, total=False):
     """The central state maintained by LangGraph."""
-    # Append-only list of all user/AI/Tool messages — REQUIRED
-    messages: Annotated[Sequence[BaseMessage], operator.add]
+    # All user/AI/Tool messages — REQUIRED. add_messages merges by message id,
+    # so a subagent returning its full history doesn't duplicate it.
+    messages: Annotated[Sequence[BaseMessage], add_messages]
 
     # ---------------------------------------------------------------
     # Session identity — resolved at request time from sp_users.user_type
@@ -19,4 +21,25 @@ class SupportState(TypedDict, total=False):
     # Router output
     ticket_category: str
     needs_escalation: bool
-    escalation_summary: str
\ No newline at end of file
+    escalation_summary: str
+
+    # Routing memory — when ticket_category was last (re)confirmed, as a Unix
+    # timestamp. Short follow-ups within ROUTER_STICKY_TTL_S reuse the category.
+    routed_at: float
+
+    # Router-selected read-only tool ({"name", "args"}) for the direct_tool
+    # node (agents/direct_tools.py); None → the category's agent answers
+    direct_tool: Optional[dict]
+
+    # Agent history window (core/history.py) — summary of the turns that no
+    # longer fit the token budget, and how many messages it covers
+    history_summary: str
+    summarized_count: int
+
+
+class AgentSupportState(AgentState, total=False):
+    """State schema of the ReAct subagents — the session and history keys they share with SupportState."""
+    user_id: int
+    role: str
+    history_summary: str
+    summarized_count: int
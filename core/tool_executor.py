@@ -0,0 +1,185 @@
+"""
+tool_executor.py — Parallel, batched tool calls for the ReAct agents
+====================================================================
+One AI message can carry several tool calls: "mark vacation 5th to 12th
+March" becomes eight add_vacation_date calls. create_react_agent's default
+graph (version="v2") Sends every call to its own tool-node task, so each call
+checks out its own pooled connection and pays its own SQL round trips, with
+no bound on how many run at once.
+
+The agents build their tool node with tool_node() and use version="v1", so a
+single node run sees every call of the message:
+
+  • calls to a tool with a batch implementation (BATCHED_* in tools/*.py) are
+    grouped and executed as ONE batched DB operation; each call still gets
+    its own ToolMessage, in the original order
+  • the remaining calls run concurrently, at most TOOL_MAX_CONCURRENCY at a
+    time (a bounded thread pool for invoke, a semaphore for ainvoke)
+
+A batch reports as one tool run named after the tool, so it still shows up in
+cso_tool_duration_seconds; cso_tool_batched_calls_total counts the calls that
+were coalesced. TOOL_BATCHING_ENABLED=false runs every call on its own.
+"""
+
+import asyncio
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from langchain_core.messages import AIMessage, ToolMessage
+from langchain_core.runnables import RunnableConfig
+from langchain_core.runnables.config import (
+    get_async_callback_manager_for_config, get_callback_manager_for_config,
+    get_executor_for_config, run_in_executor,
+)
+from langchain_core.tools import BaseTool
+from langgraph.prebuilt import ToolNode
+from pydantic import ValidationError
+
+from core.config import settings
+from core.metrics import REGISTRY, Counter
+
+# Batch implementation: args of N calls → N results, in the same order
+BatchFn = Callable[[List[Dict[str, Any]]], List[Any]]
+
+TOOL_BATCHED_CALLS = REGISTRY.register(Counter(
+    "cso_tool_batched_calls_total", "Tool calls coalesced into a batched execution.", ("tool",)))
+
+# Concurrency slots of the current async node run (asyncio.gather copies the
+# context into every _arun_one task)
+_slots: ContextVar[Optional[asyncio.Semaphore]] = ContextVar("tool_slots", default=None)
+
+
+class BatchingToolNode(ToolNode):
+    """ToolNode that bounds concurrency and coalesces batchable same-tool calls."""
+
+    def __init__(self, tools: Sequence[BaseTool], *, batched: Optional[Dict[str, BatchFn]] = None,
+                 max_concurrency: Optional[int] = None, **kwargs):
+        super().__init__(tools, **kwargs)
+        self.batched = {name: fn for name, fn in (batched or {}).items() if name in self.tools_by_name}
+        self.concurrency = max(1, max_concurrency or settings.TOOL_MAX_CONCURRENCY)
+
+    # -- planning -----------------------------------------------------------
+
+    def _limit(self, config: RunnableConfig) -> int:
+        outer = config.get("max_concurrency")
+        return min(outer, self.concurrency) if outer else self.concurrency
+
+    def _coerce(self, call: dict) -> Optional[Dict[str, Any]]:
+        """Call args validated against the tool schema; None → run it on its own."""
+        schema = self.tools_by_name[call["name"]].get_input_schema()
+        try:
+            return schema.model_validate(call["args"]).model_dump()
+        except ValidationError:
+            return None
+
+    def _plan(self, input: Any, tool_calls: List[dict]) -> Tuple[Dict[str, List[Tuple[dict, dict]]], List[dict]]:
+        """({tool: [(call, args), …]} to batch, remaining calls) for one AI message."""
+        if not (settings.TOOL_BATCHING_ENABLED and self.batched and isinstance(input, (dict, list))):
+            return {}, tool_calls
+        groups: Dict[str, List[Tuple[dict, dict]]] = {}
+        for call in tool_calls:
+            if call["name"] in self.batched:
+                args = self._coerce(call)
+                if args is not None:
+                    groups.setdefault(call["name"], []).append((call, args))
+        groups = {name: pairs for name, pairs in groups.items() if len(pairs) > 1}
+        batched_ids = {call["id"] for pairs in groups.values() for call, _ in pairs}
+        return groups, [call for call in tool_calls if call["id"] not in batched_ids]
+
+    def _only(self, input: Any, calls: List[dict]) -> Any:
+        """*input* with the latest AI message reduced to *calls* (for ToolNode's own path)."""
+        if isinstance(input, list) and input and isinstance(input[-1], dict):
+            return calls                                        # bare tool-call list
+        messages = input if isinstance(input, list) else input[self._messages_key]
+        last = max(i for i, m in enumerate(messages) if isinstance(m, AIMessage))
+        messages = [*messages[:last], messages[last].model_copy(update={"tool_calls": calls}), *messages[last + 1:]]
+        return messages if isinstance(input, list) else {**input, self._messages_key: messages}
+
+    def _merge(self, output: Any, batch_messages: List[ToolMessage], tool_calls: List[dict], input_type) -> Any:
+        """ToolNode output for the other calls plus the batch results, in call order."""
+        if isinstance(output, dict):
+            messages = output[self._messages_key]
+        elif all(isinstance(m, ToolMessage) for m in output):
+            messages = output
+        else:
+            # Another tool returned a Command: LangGraph applies both updates
+            return [*output, self._combine_tool_outputs(batch_messages, input_type)]
+        order = {call["id"]: i for i, call in enumerate(tool_calls)}
+        merged = sorted([*messages, *batch_messages], key=lambda m: order.get(m.tool_call_id, len(order)))
+        return self._combine_tool_outputs(merged, input_type)
+
+    # -- batches ------------------------------------------------------------
+
+    def _messages(self, name: str, pairs: List[Tuple[dict, dict]], results: List[Any]) -> List[ToolMessage]:
+        TOOL_BATCHED_CALLS.inc(len(pairs), tool=name)
+        print(f"[Tools] {name}: {len(pairs)} calls run as one batch")
+        return [ToolMessage(content=str(result), name=name, tool_call_id=call["id"])
+                for (call, _), result in zip(pairs, results)]
+
+    def _run_batch(self, name: str, pairs: List[Tuple[dict, dict]], config: RunnableConfig) -> List[ToolMessage]:
+        args = [a for _, a in pairs]
+        run = get_callback_manager_for_config(config).on_tool_start(
+            {"name": name}, str(args), name=name, inputs={"calls": args})
+        try:
+            results = self.batched[name](args)
+        except Exception as e:
+            run.on_tool_error(e)
+            raise
+        run.on_tool_end(results)
+        return self._messages(name, pairs, results)
+
+    async def _arun_batch(self, name: str, pairs: List[Tuple[dict, dict]], config: RunnableConfig) -> List[ToolMessage]:
+        args = [a for _, a in pairs]
+        run = await get_async_callback_manager_for_config(config).on_tool_start(
+            {"name": name}, str(args), name=name, inputs={"calls": args})
+        try:
+            async with _slots.get():
+                results = await run_in_executor(config, self.batched[name], args)
+        except Exception as e:
+            await run.on_tool_error(e)
+            raise
+        await run.on_tool_end(results)
+        return self._messages(name, pairs, results)
+
+    # -- ToolNode entry points ------------------------------------------------
+
+    def _func(self, input, config: RunnableConfig, runtime) -> Any:
+        bounded = {**config, "max_concurrency": self._limit(config)}
+        tool_calls, input_type = self._parse_input(input)
+        groups, rest = self._plan(input, tool_calls)
+        if not groups:
+            return super()._func(input, bounded, runtime)
+        with get_executor_for_config(bounded) as executor:
+            futures = [executor.submit(self._run_batch, name, pairs, config) for name, pairs in groups.items()]
+            output = super()._func(self._only(input, rest), bounded, runtime) if rest else []
+            batch_messages = [m for future in futures for m in future.result()]
+        return self._merge(output, batch_messages, tool_calls, input_type)
+
+    async def _afunc(self, input, config: RunnableConfig, runtime) -> Any:
+        token = _slots.set(asyncio.Semaphore(self._limit(config)))
+        try:
+            tool_calls, input_type = self._parse_input(input)
+            groups, rest = self._plan(input, tool_calls)
+            if not groups:
+                return await super()._afunc(input, config, runtime)
+            batches = [self._arun_batch(name, pairs, config) for name, pairs in groups.items()]
+            if rest:
+                *batch_outputs, output = await asyncio.gather(
+                    *batches, super()._afunc(self._only(input, rest), config, runtime))
+            else:
+                batch_outputs, output = await asyncio.gather(*batches), []
+            return self._merge(output, [m for msgs in batch_outputs for m in msgs], tool_calls, input_type)
+        finally:
+            _slots.reset(token)
+
+    async def _arun_one(self, call, input_type, tool_runtime):
+        slots = _slots.get()
+        if slots is None:
+            return await super()._arun_one(call, input_type, tool_runtime)
+        async with slots:
+            return await super()._arun_one(call, input_type, tool_runtime)
+
+
+def tool_node(tools: Sequence[BaseTool], batched: Optional[Dict[str, BatchFn]] = None) -> BatchingToolNode:
+    """Tool node for create_react_agent(..., version="v1")."""
+    return BatchingToolNode(tools, batched=batched)
@@ -0,0 +1,184 @@
+"""
+turn.py — Run one chat turn and track the thread's pause status
+===============================================================
+The graph is compiled with interrupt_before=["human_escalation"], so a turn
+either finishes or stops in front of the human. Callers used to find out
+which by calling get_state before and after every ainvoke — two extra
+checkpoint reads that deserialise the whole message history.
+
+  arun_turn()      drives the graph with astream(["updates", "values"]) and
+                   returns the final state together with whether the run
+                   stopped on an interrupt, so no get_state is needed after.
+  astream_turn()   the same for /chat/stream: passes astream_events through
+                   and records a pause as soon as the interrupt is seen — a
+                   client that disconnects once the run has paused must not
+                   leave the row "active" in front of a pending escalation.
+  ais_paused()     pre-check for a paused thread. Reads the saver's
+                   thread_status row (one primary-key lookup, no blob) and
+                   only falls back to get_state for threads without a row.
+  arecord_turn()   stores the outcome of a turn in that row.
+  arecent_category()  the category of the thread's last turn if it was
+                   recent (same row) — the response cache's context check.
+  hold_thread()    per-thread lock (ahold_thread() from async code). Turns
+                   run under it, and so does every other checkpoint write
+                   (cached turns, the escalation summary write-back), so a
+                   read-then-update_state can't fork an older checkpoint
+                   over a turn that committed in between.
+
+Savers without a status table (e.g. AsyncSqliteSaver in the replay script)
+transparently use the get_state fallback.
+"""
+
+import asyncio
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Dict, Iterator, List, Optional
+
+PAUSE_NODE = "human_escalation"
+# Key of the "updates" chunk LangGraph emits when a run stops on an interrupt
+INTERRUPT_KEY = "__interrupt__"
+
+
+# thread_id → [lock, holders + waiters]; an entry goes away with its last user
+_thread_locks: Dict[str, List] = {}
+_thread_locks_guard = threading.Lock()
+
+
+def _lock_for(thread_id: str) -> threading.Lock:
+    with _thread_locks_guard:
+        entry = _thread_locks.setdefault(str(thread_id), [threading.Lock(), 0])
+        entry[1] += 1
+        return entry[0]
+
+
+def _unref(thread_id: str) -> None:
+    with _thread_locks_guard:
+        entry = _thread_locks[str(thread_id)]
+        entry[1] -= 1
+        if not entry[1]:
+            del _thread_locks[str(thread_id)]
+
+
+@contextmanager
+def hold_thread(thread_id: str, timeout: float = -1) -> Iterator[None]:
+    """Hold *thread_id*'s lock (blocking). TimeoutError if not acquired within *timeout* s."""
+    lock = _lock_for(thread_id)
+    try:
+        if not lock.acquire(timeout=timeout):
+            raise TimeoutError(f"thread {thread_id} is busy")
+        try:
+            yield
+        finally:
+            lock.release()
+    finally:
+        _unref(thread_id)
+
+
+@asynccontextmanager
+async def ahold_thread(thread_id: str) -> AsyncIterator[None]:
+    """hold_thread for the event loop: polls instead of parking a worker thread."""
+    lock = _lock_for(thread_id)
+    try:
+        while not lock.acquire(blocking=False):
+            await asyncio.sleep(0.01)
+        try:
+            yield
+        finally:
+            lock.release()
+    finally:
+        _unref(thread_id)
+
+
+@dataclass
+class TurnResult:
+    values: dict = field(default_factory=dict)   # final graph state
+    interrupted: bool = False                    # stopped before PAUSE_NODE
+
+    @property
+    def status(self) -> str:
+        return "paused" if self.interrupted else "active"
+
+    @property
+    def category(self) -> str:
+        return self.values.get("ticket_category", "unknown")
+
+
+async def arun_turn(graph, graph_input: dict, config: dict) -> TurnResult:
+    """ainvoke equivalent that also reports whether the run was interrupted."""
+    result = TurnResult()
+    async with ahold_thread(config["configurable"]["thread_id"]):
+        async for mode, chunk in graph.astream(graph_input, config=config, stream_mode=["updates", "values"]):
+            if mode == "values":
+                result.values = chunk
+            elif INTERRUPT_KEY in chunk:
+                result.interrupted = True
+    return result
+
+
+async def astream_turn(graph, graph_input: dict, config: dict, turn: TurnResult) -> AsyncIterator[dict]:
+    """astream_events(v2) of one turn; fills *turn* and records a pause the moment it happens."""
+    thread_id = config["configurable"]["thread_id"]
+    category = None
+    async with ahold_thread(thread_id):
+        async for ev in graph.astream_events(graph_input, config=config, version="v2"):
+            if not ev.get("parent_ids"):
+                # Root graph events carry the node updates, the interrupt marker and the final state
+                chunk = ev["data"].get("chunk") or {}
+                if ev["event"] == "on_chain_stream" and INTERRUPT_KEY in chunk:
+                    turn.interrupted = True
+                    await arecord_turn(graph, thread_id, "paused", category)
+                elif ev["event"] == "on_chain_stream":
+                    for update in chunk.values():
+                        if isinstance(update, dict) and update.get("ticket_category"):
+                            category = update["ticket_category"]
+                elif ev["event"] == "on_chain_end":
+                    turn.values = ev["data"].get("output") or {}
+            yield ev
+
+
+async def arecord_turn(graph, thread_id: str, status: str, category: Optional[str] = None) -> None:
+    """Persist the thread's status after a turn (no-op for savers without a status table)."""
+    put = getattr(graph.checkpointer, "aput_thread_status", None)
+    if put is None:
+        return
+    try:
+        await put(thread_id, status, category)
+    except Exception as e:
+        # Not fatal: ais_paused falls back to get_state for threads without a row
+        print(f"[Turn] Failed to record status for thread {thread_id}: {e}")
+
+
+async def ais_paused(graph, thread_id: str) -> bool:
+    """True if the thread is frozen in front of the human_escalation node."""
+    get = getattr(graph.checkpointer, "aget_thread_status", None)
+    if get is not None:
+        row = await get(thread_id)
+        if row is not None:
+            return row["status"] == "paused"
+
+    # No status row yet: brand-new thread (an empty lookup) or one that
+    # predates the status table — answer from the checkpoint once and backfill.
+    state = await graph.aget_state({"configurable": {"thread_id": thread_id}})
+    paused = bool(state.next and PAUSE_NODE in state.next)
+    if state.values:
+        await arecord_turn(graph, thread_id, "paused" if paused else "active", state.values.get("ticket_category"))
+    return paused
+
+
+async def arecent_category(graph, thread_id: str, within_s: float) -> Optional[str]:
+    """ticket_category of the thread's last turn if it ended within *within_s* seconds, else None."""
+    get = getattr(graph.checkpointer, "aget_thread_status", None)
+    if get is not None:
+        row = await get(thread_id)
+        if row is not None:
+            if time.time() - row["updated_at"] > within_s:
+                return None
+            return row["category"] or "unknown"
+
+    values = (await graph.aget_state({"configurable": {"thread_id": thread_id}})).values or {}
+    routed_at = values.get("routed_at")
+    if routed_at is None or time.time() - routed_at > within_s:
+        return None
+    return values.get("ticket_category") or "unknown"
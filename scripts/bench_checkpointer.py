@@ -0,0 +1,91 @@
+"""
+bench_checkpointer.py — Checkpoint writes/sec under concurrent threads
+======================================================================
+Compares the legacy single shared sqlite3 connection (SqliteSaver) with the
+core.checkpointer backends. Each worker thread writes checkpoints carrying a
+realistic message history to its own thread_id, like concurrent chats do.
+
+Usage:
+    python -m scripts.bench_checkpointer
+    python -m scripts.bench_checkpointer --threads 1,4,16 --writes 200 --backends legacy,sqlite,mysql
+"""
+
+import argparse
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+from langchain_core.messages import AIMessage, HumanMessage
+from langgraph.checkpoint.base import empty_checkpoint
+from langgraph.checkpoint.sqlite import SqliteSaver
+
+from core.checkpointer import MySQLSaver, PooledSqliteSaver
+
+
+def _sample_messages(n: int):
+    msgs = []
+    for i in range(n // 2):
+        msgs.append(HumanMessage(content=f"[Customer session | session_user_id=1001] show my orders #{i}"))
+        msgs.append(AIMessage(content="| Order ID | Date | Status | Amount |\n" + "| 1 | 2026-03-01 | Delivered | ₹108 |\n" * 10))
+    return msgs
+
+
+def _make_saver(backend: str, path: str):
+    if backend == "legacy":
+        return SqliteSaver(sqlite3.connect(path, check_same_thread=False))
+    if backend == "sqlite":
+        return PooledSqliteSaver(path)
+    if backend == "mysql":
+        return MySQLSaver()
+    raise ValueError(f"Unknown backend '{backend}'")
+
+
+def run(backend: str, threads: int, writes_per_thread: int, history: int) -> float:
+    """Return checkpoint writes per second for one (backend, threads) cell."""
+    tmp = tempfile.mkdtemp(prefix="cp_bench_")
+    saver = _make_saver(backend, os.path.join(tmp, "bench.db"))
+    messages = _sample_messages(history)
+    run_id = f"bench-{backend}-{threads}-{time.time_ns()}"
+    start = threading.Barrier(threads + 1)
+
+    def worker(n: int):
+        config = {"configurable": {"thread_id": f"{run_id}-{n}", "checkpoint_ns": ""}}
+        start.wait()
+        for step in range(writes_per_thread):
+            cp = empty_checkpoint()
+            cp["channel_values"] = {"messages": messages, "ticket_category": "order"}
+            config = saver.put(config, cp, {"source": "loop", "step": step}, {})
+
+    pool = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+    for t in pool:
+        t.start()
+    start.wait()
+    t0 = time.perf_counter()
+    for t in pool:
+        t.join()
+    elapsed = time.perf_counter() - t0
+
+    if backend == "mysql":
+        for n in range(threads):
+            saver.delete_thread(f"{run_id}-{n}")
+    return (threads * writes_per_thread) / elapsed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark checkpoint writes/sec under concurrency.")
+    parser.add_argument("--backends", default="legacy,sqlite", help="legacy,sqlite,mysql")
+    parser.add_argument("--threads", default="1,4,16")
+    parser.add_argument("--writes", type=int, default=200, help="checkpoint writes per thread")
+    parser.add_argument("--history", type=int, default=12, help="messages stored in each checkpoint")
+    args = parser.parse_args()
+
+    backends = [b.strip() for b in args.backends.split(",") if b.strip()]
+    levels = [int(x) for x in args.threads.split(",") if x.strip()]
+
+    print(f"{'backend':>8} {'threads':>8} {'writes/s':>10}")
+    for backend in backends:
+        for level in levels:
+            rate = run(backend, level, args.writes, args.history)
+            print(f"{backend:>8} {level:>8} {rate:>10.0f}")
@@ -0,0 +1,83 @@
+"""
+eval_router_rules.py — Keyword fast path vs logged LLM routing decisions
+========================================================================
+Runs agents/router_rules.classify over the user messages in the chat log and
+compares each confident fast-path decision with the category the LLM router
+chose at the time (the `category` field of every log entry). Prints coverage
+(share of messages the fast path would answer), agreement, and the most
+common disagreements so keyword rules can be tightened before rollout.
+
+No LLM or database calls are made.
+
+Usage:
+    python -m scripts.eval_router_rules
+    python -m scripts.eval_router_rules --log chat_history_log.20260301-000000.jsonl.gz --show 20
+"""
+
+import argparse
+import gzip
+import json
+from collections import Counter
+
+from agents.router_rules import classify
+from core.config import settings
+
+# Categories the router can emit (escalated turns are logged as their category)
+_ROUTED = {"order", "subscription", "product", "wallet", "general"}
+
+
+def read_log(path: str):
+    """Yield chat-log entries (plain or gzipped JSONL), skipping bad lines."""
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                continue
+
+
+def evaluate(entries):
+    """Return (report, disagreements) for chat-log entries."""
+    total = confident = agree = 0
+    per_category = Counter()
+    disagreements = Counter()
+    for entry in entries:
+        llm = entry.get("category")
+        if llm not in _ROUTED:
+            continue
+        total += 1
+        fast = classify(entry.get("user_message", ""))
+        if not fast.confident:
+            continue
+        confident += 1
+        if fast.category == llm:
+            agree += 1
+            per_category[llm] += 1
+        else:
+            disagreements[(fast.category, llm, entry.get("user_message", "")[:80])] += 1
+    report = {
+        "messages": total,
+        "fast_path": confident,
+        "coverage": confident / total if total else 0.0,
+        "agreement": agree / confident if confident else 0.0,
+        "agreed_by_category": dict(per_category),
+    }
+    return report, disagreements
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the router keyword fast path with logged LLM decisions.")
+    parser.add_argument("--log", default=settings.CHAT_LOG_FILE)
+    parser.add_argument("--show", type=int, default=10, help="disagreements to print")
+    args = parser.parse_args()
+
+    report, disagreements = evaluate(read_log(args.log))
+    print(f"messages   : {report['messages']}")
+    print(f"fast path  : {report['fast_path']} ({report['coverage']:.1%} coverage)")
+    print(f"agreement  : {report['agreement']:.1%}")
+    print(f"by category: {report['agreed_by_category']}")
+    if disagreements:
+        print("\nfast → llm | message")
+        for (fast, llm, message), n in disagreements.most_common(args.show):
+            print(f"{fast:>12} → {llm:<12} | {message} (x{n})")
@@ -0,0 +1,130 @@
+"""
+index_advisor.py — EXPLAIN every order / sales query shape
+==========================================================
+Runs the order and sales tools over a fixed set of arguments under
+core.query.capture(), so each distinct WHERE / GROUP BY shape they can
+generate is collected without executing it, then runs EXPLAIN on each
+shape against MySQL and flags the access paths that read a whole table:
+
+  • type=ALL     full table scan
+  • type=index   full index scan (every index entry, no range)
+
+Shapes are de-duplicated by SQL text; each is shown with the tool call that
+produced it. Needs the MySQL settings from .env. The role lookups behind
+the tools use the two user ids given (one admin, one customer).
+
+Exits with status 1 when a shape is flagged, so it can gate a schema or
+query change.
+
+Usage:
+    python -m scripts.index_advisor
+    python -m scripts.index_advisor --admin-id 1 --customer-id 1001 --min-rows 1000
+"""
+
+import argparse
+import sys
+from datetime import date, timedelta
+from typing import Dict, List, Tuple
+
+from core.query import DatabaseUnavailable, capture, session
+from tools.order_tools import (
+    get_cancelled_order_reason, get_daily_sales_summary, get_order_details, get_order_items,
+    get_orders_filtered, get_outstanding_amount, get_sales_summary, get_subscription_orders,
+    get_top_report,
+)
+
+_FULL_SCANS = {"ALL": "full table scan", "index": "full index scan"}
+
+_TOOLS = {t.name: t for t in (
+    get_orders_filtered, get_sales_summary, get_daily_sales_summary, get_top_report,
+    get_order_details, get_order_items, get_outstanding_amount, get_subscription_orders,
+    get_cancelled_order_reason,
+)}
+
+
+def shapes(admin_id: int, customer_id: int) -> List[Tuple[str, dict]]:
+    """(tool name, args) for every date-filter / scope / grouping variant."""
+    today = date.today()
+    start, end = (today - timedelta(days=7)).isoformat(), today.isoformat()
+    admin, customer = {"session_user_id": admin_id}, {"session_user_id": customer_id}
+    dates = [{"use_today": True}, {"start_date": start, "end_date": end},
+             {"start_date": start}, {"end_date": end}]
+
+    calls = [("get_orders_filtered", {**customer, **d}) for d in dates + [{"order_date": end}]]
+    calls += [
+        ("get_orders_filtered", admin),
+        ("get_orders_filtered", {**admin, "use_today": True, "status_code": 4}),
+        ("get_orders_filtered", {**admin, "start_date": start, "end_date": end, "town_id": 1}),
+        ("get_orders_filtered", {**admin, "order_code": "ORD-1"}),
+    ]
+    calls += [("get_sales_summary", {**admin, **d}) for d in dates]
+    calls += [("get_sales_summary", {**admin, "use_today": True, "group_by": g})
+              for g in ("town", "route", "status", "date")]
+    calls += [("get_sales_summary", {**customer, "start_date": start, "end_date": end})]
+    calls += [("get_daily_sales_summary", admin),
+              ("get_daily_sales_summary", {**admin, "summary_date": start})]
+    calls += [("get_top_report", {**admin, "report_type": r, **dr})
+              for r in ("customers", "products", "towns")
+              for dr in ({}, {"start_date": start, "end_date": end})]
+    calls += [
+        ("get_order_details", {**customer, "order_id": 1}),
+        ("get_order_details", {**customer, "order_code": "ORD-1"}),
+        ("get_order_items", {**customer, "order_id": 1}),
+        ("get_outstanding_amount", customer),
+        ("get_subscription_orders", customer),
+        ("get_cancelled_order_reason", {**customer, "order_id": 1}),
+    ]
+    return calls
+
+
+def collect(calls: List[Tuple[str, dict]]) -> Dict[str, Tuple[str, str, tuple]]:
+    """{sql: (query name, tool call, params)} — first call of each distinct shape."""
+    found: Dict[str, Tuple[str, str, tuple]] = {}
+    for tool_name, args in calls:
+        with capture() as statements:
+            _TOOLS[tool_name].invoke(args)
+        for name, sql, params in statements:
+            found.setdefault(sql, (name, f"{tool_name}({args})", params))
+    return found
+
+
+def explain(found: Dict[str, Tuple[str, str, tuple]], min_rows: int = 0) -> int:
+    """Print the EXPLAIN plan of every shape; returns the number flagged."""
+    flagged = 0
+    with session() as q:
+        for sql, (name, call, params) in found.items():
+            plan = q.fetch_all("explain", "EXPLAIN " + sql.strip(), params)
+            scans = [row for row in plan
+                     if row.get("type") in _FULL_SCANS and int(row.get("rows") or 0) >= min_rows]
+            flagged += bool(scans)
+            print(f"\n{'FULL SCAN' if scans else 'ok':9} {name}  ←  {call}")
+            for row in plan:
+                mark = "  !! " if row in scans else "     "
+                print(f"{mark}{row.get('table')}: type={row.get('type')} key={row.get('key')} "
+                      f"rows={row.get('rows')} extra={row.get('Extra') or ''}")
+                if row in scans:
+                    print(f"       {_FULL_SCANS[row['type']]}; possible keys: {row.get('possible_keys') or 'none'}")
+    return flagged
+
+
+def main():
+    parser = argparse.ArgumentParser(description="EXPLAIN the order / sales tools' query shapes.")
+    parser.add_argument("--admin-id", type=int, default=1, help="sp_users.id of an admin (user_type=1)")
+    parser.add_argument("--customer-id", type=int, default=1001, help="sp_users.id of a customer")
+    parser.add_argument("--min-rows", type=int, default=0,
+                        help="only flag scans MySQL estimates at this many rows or more")
+    args = parser.parse_args()
+
+    found = collect(shapes(args.admin_id, args.customer_id))
+    print(f"{len(found)} distinct query shapes")
+    try:
+        flagged = explain(found, args.min_rows)
+    except DatabaseUnavailable as e:
+        print(e)
+        sys.exit(2)
+    print(f"\n{flagged} of {len(found)} shapes read a whole table or index.")
+    sys.exit(1 if flagged else 0)
+
+
+if __name__ == "__main__":
+    main()
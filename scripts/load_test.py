@@ -0,0 +1,98 @@
+"""
+load_test.py — Concurrency load test for /api/v1/chat
+=====================================================
+Fires the same chat message at the running API with increasing levels of
+concurrency and prints throughput + latency per level. With the async chat
+path, requests/sec should keep climbing as concurrency goes up (until the
+LLM provider's rate limit is hit) instead of flat-lining at ~1 / latency.
+
+Every request uses its own thread_id so checkpoints never collide.
+
+Usage (API must be running: python -m api.main):
+    python -m scripts.load_test --user-id 1001
+    python -m scripts.load_test --levels 1,8,32,128 --requests 64 --message "hi"
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+import uuid
+
+import httpx
+
+DEFAULT_URL = "http://localhost:8005/api/v1/chat"
+
+
+async def _one_request(client: httpx.AsyncClient, url: str, user_id: int, message: str):
+    """Send one chat request. Returns (latency_seconds, ok)."""
+    payload = {
+        "thread_id": f"load-{uuid.uuid4()}",
+        "message": message,
+        "user_id": user_id,
+    }
+    t0 = time.perf_counter()
+    try:
+        resp = await client.post(url, json=payload)
+        ok = resp.status_code == 200
+    except httpx.HTTPError:
+        ok = False
+    return time.perf_counter() - t0, ok
+
+
+async def run_level(url: str, user_id: int, message: str, concurrency: int, total: int, timeout: float):
+    """Run *total* requests with at most *concurrency* in flight."""
+    sem = asyncio.Semaphore(concurrency)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(timeout=timeout, limits=limits) as client:
+        async def _bounded():
+            async with sem:
+                return await _one_request(client, url, user_id, message)
+
+        t0 = time.perf_counter()
+        results = await asyncio.gather(*(_bounded() for _ in range(total)))
+        wall = time.perf_counter() - t0
+
+    latencies = sorted(lat for lat, ok in results if ok)
+    errors = sum(1 for _, ok in results if not ok)
+    return {
+        "concurrency": concurrency,
+        "requests": total,
+        "errors": errors,
+        "wall_s": wall,
+        "rps": len(latencies) / wall if wall else 0.0,
+        "p50_s": statistics.median(latencies) if latencies else 0.0,
+        "p95_s": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] if latencies else 0.0,
+    }
+
+
+def _print_report(rows):
+    print(f"{'conc':>6} {'reqs':>6} {'errors':>7} {'wall(s)':>9} {'req/s':>8} {'p50(s)':>8} {'p95(s)':>8}")
+    for r in rows:
+        print(
+            f"{r['concurrency']:>6} {r['requests']:>6} {r['errors']:>7} "
+            f"{r['wall_s']:>9.2f} {r['rps']:>8.2f} {r['p50_s']:>8.2f} {r['p95_s']:>8.2f}"
+        )
+
+
+async def main(args):
+    levels = [int(x) for x in args.levels.split(",") if x.strip()]
+    rows = []
+    for level in levels:
+        total = max(args.requests, level)
+        print(f"[load_test] concurrency={level} requests={total} ...")
+        rows.append(await run_level(args.url, args.user_id, args.message, level, total, args.timeout))
+    print()
+    _print_report(rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test the chat endpoint at increasing concurrency.")
+    parser.add_argument("--url", default=DEFAULT_URL)
+    parser.add_argument("--user-id", type=int, default=1)
+    parser.add_argument("--message", default="Koi offer chal raha hai?")
+    parser.add_argument("--levels", default="1,4,16,64", help="comma-separated concurrency levels")
+    parser.add_argument("--requests", type=int, default=32, help="requests per level (at least = level)")
+    parser.add_argument("--timeout", type=float, default=180.0, help="per-request timeout in seconds")
+    asyncio.run(main(parser.parse_args()))
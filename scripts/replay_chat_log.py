@@ -0,0 +1,116 @@
+"""
+replay_chat_log.py — Offline replay of historic questions
+=========================================================
+Re-runs user messages from chat_history_log.jsonl through the graph in-process
+(no HTTP) after a prompt / model change, and writes old-vs-new answers plus an
+aggregated latency and error report.
+
+Replays use a separate checkpoint store (in-memory by default), so live
+conversation threads in checkpoint.db are never touched.
+
+Messages are replayed as their original user_id, so by default the run is a
+dry run: tools still read MySQL, but add_vacation_date / cancel_vacation_date
+do not write (core.query.dry_run). --allow-writes lifts that — only against a
+scratch database.
+
+Usage:
+    python -m scripts.replay_chat_log
+    python -m scripts.replay_chat_log --limit 200 --category order --concurrency 16
+    python -m scripts.replay_chat_log --group-by-thread --out replay_results.jsonl
+"""
+
+import argparse
+import asyncio
+import gzip
+import json
+import time
+
+from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+
+from core.batch import BatchItem, run_batch, summarize
+from core.config import settings
+from core.graph import compile_app
+
+DEFAULT_LOG = settings.CHAT_LOG_FILE
+
+
+def load_log(path: str, limit: int = 0, category: str = ""):
+    """Return (items, original_entries) from a chat JSONL log."""
+    items, originals = [], []
+    opener = gzip.open if path.endswith(".gz") else open   # rotated logs may be gzipped
+    with opener(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if category and entry.get("category") != category:
+                continue
+            if not entry.get("user_message") or entry.get("user_id") in (None, ""):
+                continue
+            items.append(BatchItem(
+                thread_id=str(entry.get("thread_id", "")),
+                message=entry["user_message"],
+                user_id=int(entry["user_id"]),
+            ))
+            originals.append(entry)
+            if limit and len(items) >= limit:
+                break
+    return items, originals
+
+
+async def main(args):
+    items, originals = load_log(args.log, args.limit, args.category)
+    if not items:
+        print(f"[replay] No messages to replay from {args.log}.")
+        return
+    print(f"[replay] Replaying {len(items)} messages (concurrency={args.concurrency}, timeout={args.timeout}s"
+          f"{', WRITES ENABLED' if args.allow_writes else ', dry run'})")
+
+    async with AsyncSqliteSaver.from_conn_string(args.checkpoint_db) as saver:
+        graph = compile_app(saver)
+        t0 = time.perf_counter()
+        results = await run_batch(
+            graph,
+            items,
+            concurrency=args.concurrency,
+            timeout_s=args.timeout,
+            group_by_thread=args.group_by_thread,
+            thread_prefix="replay",
+            dry_run=not args.allow_writes,
+        )
+        wall = time.perf_counter() - t0
+
+    changed = 0
+    with open(args.out, "w", encoding="utf-8") as f:
+        for result, old in zip(results, originals):
+            row = result.to_dict()
+            row["old_category"] = old.get("category")
+            row["old_response"] = old.get("ai_response")
+            row["category_changed"] = row["old_category"] != result.category
+            changed += row["category_changed"]
+            f.write(json.dumps(row, ensure_ascii=False, default=str) + "\n")
+
+    report = summarize(results, wall)
+    report["category_changed"] = changed
+    print(json.dumps(report, indent=2))
+    print(f"[replay] Per-message results written to {args.out}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay historic chat messages through the graph.")
+    parser.add_argument("--log", default=DEFAULT_LOG)
+    parser.add_argument("--limit", type=int, default=0, help="max messages to replay (0 = all)")
+    parser.add_argument("--category", default="", help="only replay messages originally routed here")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--timeout", type=float, default=60.0, help="per-message timeout in seconds")
+    parser.add_argument("--group-by-thread", action="store_true",
+                        help="replay each original thread's messages in order on one fresh thread")
+    parser.add_argument("--checkpoint-db", default=":memory:", help="checkpoint store for replay threads")
+    parser.add_argument("--out", default="replay_results.jsonl")
+    parser.add_argument("--allow-writes", action="store_true",
+                        help="let tools write to MySQL (vacations) — only against a scratch database")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,113 @@
+import asyncio
+from datetime import date, timedelta
+
+import pytest
+from unittest.mock import MagicMock, patch
+from langchain_core.messages import AIMessage
+
+from core import query
+from core.batch import BatchItem, run_batch, summarize
+from tools import subscription_tools
+
+
+class FakeGraph:
+    """Minimal async graph: echoes the message, sleeps on 'slow', raises on 'boom'."""
+
+    def __init__(self):
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.calls = []
+
+    async def ainvoke(self, inputs, config):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            text = inputs["messages"][0].content
+            self.calls.append((config["configurable"]["thread_id"], text))
+            await asyncio.sleep(0.5 if text == "slow" else 0.01)
+            if text == "boom":
+                raise RuntimeError("provider down")
+            return {"messages": [AIMessage(content=f"re: {text}")], "ticket_category": "general"}
+        finally:
+            self.in_flight -= 1
+
+
+def _run(graph, items, **kw):
+    with patch("core.batch.get_user_role", return_value="customer"), \
+            patch("core.batch.warm_user_cache", return_value=0):
+        return asyncio.run(run_batch(graph, items, **kw))
+
+
+def test_run_batch_bounds_concurrency_and_isolates_threads():
+    graph = FakeGraph()
+    items = [BatchItem(thread_id="live", message=f"m{i}", user_id=1) for i in range(10)]
+
+    results = _run(graph, items, concurrency=3)
+
+    assert [r.index for r in results] == list(range(10))
+    assert all(r.status == "ok" for r in results)
+    assert graph.max_in_flight <= 3
+    run_threads = {r.run_thread_id for r in results}
+    assert len(run_threads) == 10
+    assert "live" not in run_threads
+
+
+def test_run_batch_timeouts_and_errors_are_reported():
+    graph = FakeGraph()
+    items = [
+        BatchItem(thread_id="a", message="ok", user_id=1),
+        BatchItem(thread_id="b", message="slow", user_id=1),
+        BatchItem(thread_id="c", message="boom", user_id=1),
+    ]
+
+    results = _run(graph, items, timeout_s=0.1)
+    report = summarize(results, wall_s=1.0)
+
+    assert [r.status for r in results] == ["ok", "timeout", "error"]
+    assert results[0].response == "re: ok"
+    assert report["ok"] == 1 and report["timeouts"] == 1 and report["errors"] == 1
+    assert report["error_types"] == {"RuntimeError": 1}
+
+
+def test_group_by_thread_replays_in_order_on_one_thread():
+    graph = FakeGraph()
+    items = [
+        BatchItem(thread_id="t1", message="first", user_id=1),
+        BatchItem(thread_id="t2", message="other", user_id=1),
+        BatchItem(thread_id="t1", message="second", user_id=1),
+    ]
+
+    results = _run(graph, items, group_by_thread=True)
+
+    assert results[0].run_thread_id == results[2].run_thread_id != results[1].run_thread_id
+    t1_calls = [text for tid, text in graph.calls if tid == results[0].run_thread_id]
+    assert t1_calls == ["first", "second"]
+
+
+class VacationGraph:
+    """Async graph whose 'agent' marks the message's date as vacation (sync tool on a worker thread)."""
+
+    async def ainvoke(self, inputs, config):
+        day = inputs["messages"][0].content
+        answer = await asyncio.to_thread(
+            subscription_tools.add_vacation_date.invoke, {"user_id": inputs["user_id"], "vacation_date": day})
+        return {"messages": [AIMessage(content=answer)], "ticket_category": "subscription"}
+
+
+def test_dry_run_batches_read_but_never_write():
+    cursor = MagicMock()
+    user = {"first_name": "Asha", "last_name": "K", "store_name": None}
+    cursor.execute.side_effect = lambda sql, params: setattr(
+        cursor.fetchall, "return_value", [user] if "sp_users" in sql else [])
+    conn = MagicMock()
+    conn.cursor.return_value = cursor
+    day = (date.today() + timedelta(days=2)).isoformat()
+    items = [BatchItem(thread_id="t", message=day, user_id=7)]
+
+    with patch.object(query, "get_db_connection", return_value=conn):
+        [result] = _run(VacationGraph(), items, dry_run=True)
+        assert result.response.startswith("Vacation successfully marked")
+        assert cursor.execute.called and not cursor.executemany.called
+
+        _run(VacationGraph(), items)
+        assert cursor.executemany.called                   # writes are back outside the dry run
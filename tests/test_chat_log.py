@@ -0,0 +1,81 @@
+import gzip
+import json
+import os
+import time
+
+from core.chat_log import ChatLogWriter
+
+
+def _entry(n):
+    return {"thread_id": f"t{n}", "user_message": "hi", "ai_response": "hello", "category": "general"}
+
+
+def _lines(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_stop_flushes_queued_entries(tmp_path):
+    path = str(tmp_path / "chat.jsonl")
+    writer = ChatLogWriter(path, flush_interval_s=60, batch_size=1000)
+    writer.start()
+    for n in range(25):
+        assert writer.enqueue(_entry(n))
+    writer.stop()
+
+    assert [e["thread_id"] for e in _lines(path)] == [f"t{n}" for n in range(25)]
+    assert writer.stats() == {"queued": 0, "written": 25, "dropped": 0, "flushes": 1, "rotations": 0, "write_errors": 0}
+
+
+def test_batch_size_wakes_the_writer(tmp_path):
+    path = str(tmp_path / "chat.jsonl")
+    writer = ChatLogWriter(path, flush_interval_s=60, batch_size=5)
+    writer.start()
+    for n in range(5):
+        writer.enqueue(_entry(n))
+    deadline = time.time() + 5
+    while writer.stats()["written"] < 5 and time.time() < deadline:
+        time.sleep(0.01)
+    writer.stop()
+    assert len(_lines(path)) == 5
+
+
+def test_full_queue_drops_and_counts(tmp_path):
+    writer = ChatLogWriter(str(tmp_path / "chat.jsonl"), queue_size=3, batch_size=100)
+    results = [writer.enqueue(_entry(n)) for n in range(5)]
+
+    assert results == [True, True, True, False, False]
+    assert writer.stats()["dropped"] == 2 and writer.stats()["queued"] == 3
+
+
+def test_rotates_by_size_with_gzip(tmp_path):
+    path = str(tmp_path / "chat.jsonl")
+    writer = ChatLogWriter(path, batch_size=1, max_bytes=10, rotate_daily=False, gzip_rotated=True)
+    for n in range(3):
+        writer.enqueue(_entry(n))
+        writer.flush()
+
+    rotated = sorted(f for f in os.listdir(tmp_path) if f.endswith(".jsonl.gz"))
+    assert len(rotated) == 2 and writer.stats()["rotations"] == 2
+    archived = set()
+    for name in rotated:
+        with gzip.open(tmp_path / name, "rt", encoding="utf-8") as f:
+            archived.update(json.loads(line)["thread_id"] for line in f)
+    assert archived == {"t0", "t1"}
+    assert [e["thread_id"] for e in _lines(path)] == ["t2"]
+
+
+def test_rotates_daily(tmp_path):
+    path = str(tmp_path / "chat.jsonl")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(json.dumps(_entry(0)) + "\n")
+    yesterday = time.time() - 86400
+    os.utime(path, (yesterday, yesterday))
+
+    writer = ChatLogWriter(path, max_bytes=0, rotate_daily=True, gzip_rotated=False)
+    writer.enqueue(_entry(1))
+    writer.flush()
+
+    rotated = [f for f in os.listdir(tmp_path) if f.startswith("chat.") and f != "chat.jsonl" and f.endswith(".jsonl")]
+    assert len(rotated) == 1
+    assert [e["thread_id"] for e in _lines(path)] == ["t1"]
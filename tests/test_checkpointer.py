@@ -0,0 +1,181 @@
+import asyncio
+import json
+import threading
+from contextlib import contextmanager
+import pytest
+from typing import TypedDict
+from unittest.mock import MagicMock, patch
+from langgraph.checkpoint.base import WRITES_IDX_MAP, empty_checkpoint
+from langgraph.checkpoint.sqlite import SqliteSaver
+from langgraph.graph import StateGraph, START, END
+
+from core.checkpointer import MySQLSaver, PooledSqliteSaver, build_checkpointer
+
+
+class CounterState(TypedDict, total=False):
+    count: int
+
+
+def _graph(saver):
+    workflow = StateGraph(CounterState)
+    workflow.add_node("inc", lambda s: {"count": s.get("count", 0) + 1})
+    workflow.add_edge(START, "inc")
+    workflow.add_edge("inc", END)
+    return workflow.compile(checkpointer=saver)
+
+
+def test_pooled_sqlite_saver_uses_a_connection_per_thread(tmp_path):
+    saver = PooledSqliteSaver(str(tmp_path / "cp.db"))
+    graph = _graph(saver)
+    conns = []
+    errors = []
+
+    def worker(n):
+        try:
+            conns.append(saver.conn)
+            for _ in range(5):
+                graph.invoke({}, {"configurable": {"thread_id": f"t{n}"}})
+        except Exception as e:   # pragma: no cover - surfaced by assert below
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert not errors
+    assert len({id(c) for c in conns}) == 4
+    journal = saver.conn.execute("PRAGMA journal_mode").fetchone()[0]
+    assert journal.lower() == "wal"
+    for n in range(4):
+        assert graph.get_state({"configurable": {"thread_id": f"t{n}"}}).values["count"] == 5
+
+
+def test_pooled_sqlite_saver_supports_async_api(tmp_path):
+    saver = PooledSqliteSaver(str(tmp_path / "cp.db"))
+    graph = _graph(saver)
+    config = {"configurable": {"thread_id": "async"}}
+
+    async def run():
+        await graph.ainvoke({"count": 41}, config)
+        history = [c async for c in saver.alist(config)]
+        return (await graph.aget_state(config)).values, history
+
+    values, history = asyncio.run(run())
+    assert values["count"] == 42
+    assert len(history) >= 2
+
+
+def test_build_checkpointer_rejects_unknown_backend():
+    with pytest.raises(ValueError, match="Unknown CHECKPOINT_BACKEND"):
+        build_checkpointer("redis")
+
+
+def test_sqlite_status_table_exists_before_setup_is_flagged(tmp_path):
+    saver = PooledSqliteSaver(str(tmp_path / "cp.db"))
+    original = SqliteSaver.setup
+    tables_at_flag = []
+
+    def setup(self):
+        tables_at_flag.extend(r[0] for r in self.conn.execute("SELECT name FROM sqlite_master"))
+        original(self)
+
+    with patch.object(SqliteSaver, "setup", setup):
+        saver.setup()
+    assert saver.is_setup and "thread_status" in tables_at_flag
+
+
+# ---------------------------------------------------------------------------
+# MySQLSaver against a mocked pool connection
+# ---------------------------------------------------------------------------
+
+@contextmanager
+def _mysql(fetchone=None, fetchall=()):
+    """MySQLSaver whose pooled connections share one cursor mock; yields (saver, cursor)."""
+    cursor = MagicMock()
+    cursor.fetchone.return_value = fetchone
+    cursor.fetchall.side_effect = list(fetchall) or (lambda: [])
+    conn = MagicMock()
+    conn.cursor.return_value = cursor
+    with patch("core.db.get_db_connection", return_value=conn):
+        yield MySQLSaver(), cursor
+
+
+def _statements(cursor, verb):
+    return [c for c in cursor.execute.call_args_list + cursor.executemany.call_args_list
+            if c.args[0].lstrip().startswith(verb)]
+
+
+# A channel put_writes stores at a fixed index (errors, interrupts …)
+SPECIAL = next(iter(WRITES_IDX_MAP))
+
+
+def _row(serde, checkpoint_id, parent=None, metadata=None, thread_id="t1"):
+    type_, blob = serde.dumps_typed(empty_checkpoint() | {"id": checkpoint_id})
+    meta = json.dumps(metadata or {}).encode()
+    return (thread_id, "", checkpoint_id, parent, type_, bytearray(blob), bytearray(meta))
+
+
+def test_mysql_put_serializes_and_links_the_parent():
+    checkpoint = empty_checkpoint()
+    config = {"configurable": {"thread_id": 7, "checkpoint_ns": "", "checkpoint_id": "parent-1"}}
+    with _mysql() as (saver, cursor):
+        out = saver.put(config, checkpoint, {"source": "loop", "step": 1}, {})
+        saver.put(config, checkpoint, {"source": "loop", "step": 2}, {})
+    assert out == {"configurable": {"thread_id": 7, "checkpoint_ns": "", "checkpoint_id": checkpoint["id"]}}
+    assert len(_statements(cursor, "CREATE TABLE")) == 3             # schema created once
+    sql, params = _statements(cursor, "REPLACE INTO lg_checkpoints")[0].args
+    assert params[:4] == ("7", "", checkpoint["id"], "parent-1")
+    assert saver.serde.loads_typed((params[4], params[5]))["id"] == checkpoint["id"]
+    assert json.loads(params[6])["step"] == 1
+
+
+def test_mysql_put_writes_replaces_special_channels_and_ignores_duplicates():
+    config = {"configurable": {"thread_id": "t1", "checkpoint_ns": "", "checkpoint_id": "c1"}}
+    with _mysql() as (saver, cursor):
+        saver.put_writes(config, [("messages", "hi"), ("route", "order")], task_id="task-1")
+        saver.put_writes(config, [(SPECIAL, "boom")], task_id="task-2", task_path="p")
+        saver.put_writes(config, [], task_id="task-3")                # no rows → no statement
+    plain, special = [c.args for c in cursor.executemany.call_args_list]
+    assert plain[0].startswith("INSERT IGNORE INTO lg_checkpoint_writes")
+    assert [(r[3], r[5], r[6]) for r in plain[1]] == [("task-1", 0, "messages"), ("task-1", 1, "route")]
+    assert special[0].startswith("REPLACE INTO lg_checkpoint_writes")
+    assert special[1][0][4:7] == ("p", WRITES_IDX_MAP[SPECIAL], SPECIAL)
+
+
+def test_mysql_get_tuple_loads_the_checkpoint_and_sorted_pending_writes():
+    serde = MySQLSaver().serde
+    writes = [("task-b", "messages", *serde.dumps_typed("second"), "", 0),
+              ("task-a", "messages", *serde.dumps_typed("first"), "", 0)]
+    with _mysql(fetchone=_row(serde, "c2", parent="c1", metadata={"step": 2}), fetchall=[writes]) as (saver, cursor):
+        tup = saver.get_tuple({"configurable": {"thread_id": "t1"}})
+    assert "ORDER BY checkpoint_id DESC LIMIT 1" in _statements(cursor, "SELECT thread_id")[0].args[0]
+    assert tup.checkpoint["id"] == "c2" and tup.metadata == {"step": 2}
+    assert tup.parent_config["configurable"]["checkpoint_id"] == "c1"
+    assert tup.pending_writes == [("task-a", "messages", "first"), ("task-b", "messages", "second")]
+
+
+def test_mysql_get_tuple_by_id_and_missing_checkpoint():
+    with _mysql(fetchone=None) as (saver, cursor):
+        assert saver.get_tuple({"configurable": {"thread_id": "t1", "checkpoint_id": "c9"}}) is None
+    sql, params = _statements(cursor, "SELECT thread_id")[0].args
+    assert "checkpoint_id = %s" in sql and params == ("t1", "", "c9")
+
+
+def test_mysql_list_filters_in_python_and_pushes_limit_down_otherwise():
+    serde = MySQLSaver().serde
+    rows = [_row(serde, "c3", metadata={"source": "loop"}), _row(serde, "c2", metadata={"source": "input"}),
+            _row(serde, "c1", metadata={"source": "loop"})]
+    with _mysql(fetchall=[rows] + [[]] * 3) as (saver, cursor):
+        found = list(saver.list({"configurable": {"thread_id": "t1"}}, filter={"source": "loop"}, limit=1,
+                                before={"configurable": {"checkpoint_id": "c4"}}))
+    sql, params = _statements(cursor, "SELECT thread_id")[0].args
+    assert "LIMIT" not in sql and params == ("t1", "c4")
+    assert [t.checkpoint["id"] for t in found] == ["c3"]
+
+    with _mysql(fetchall=[rows[:2], [], []]) as (saver, cursor):
+        found = list(saver.list(None, limit=2))
+    sql, params = _statements(cursor, "SELECT thread_id")[0].args
+    assert sql.endswith("ORDER BY checkpoint_id DESC LIMIT %s") and params == (2,)
+    assert [t.checkpoint["id"] for t in found] == ["c3", "c2"]
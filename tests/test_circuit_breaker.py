@@ -0,0 +1,125 @@
+import asyncio
+
+import httpx
+import pytest
+from langchain_core.exceptions import OutputParserException
+from langchain_core.runnables import RunnableLambda
+
+from core.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError, GuardedModel
+from core.rate_limit import RateLimitTimeout
+
+
+def _breaker(**kwargs):
+    options = dict(window=10, min_calls=4, error_rate=0.5, cooldown_s=60, max_ewma_s=0, alpha=0.5)
+    options.update(kwargs)
+    return CircuitBreaker("test", **options)
+
+
+def _flaky(fail):
+    def call(_):
+        if fail["now"]:
+            raise httpx.ConnectError("503")
+        return "ok"
+    return RunnableLambda(call)
+
+
+def test_breaker_opens_on_error_rate_and_rejects_calls():
+    breaker = _breaker()
+    fail = {"now": True}
+    model = GuardedModel(_flaky(fail), "test", breaker)
+    for _ in range(4):
+        with pytest.raises(httpx.ConnectError, match="503"):
+            model.invoke("hi")
+    assert breaker.state == OPEN
+    with pytest.raises(CircuitOpenError):
+        model.invoke("hi")
+
+
+def test_half_open_probe_closes_or_reopens(monkeypatch):
+    breaker = _breaker(cooldown_s=0)
+    for _ in range(4):
+        breaker.record(False, 0.1)
+    assert breaker.state == OPEN
+
+    assert breaker.allow() and breaker.state == HALF_OPEN
+    assert not breaker.allow()                    # only one probe in flight
+    breaker.record(False, 0.1)
+    assert breaker.state == OPEN
+
+    assert breaker.allow()
+    breaker.record(True, 0.1)
+    assert breaker.state == CLOSED
+    assert breaker.snapshot()["calls_in_window"] == 0
+
+
+def test_slow_provider_trips_on_ewma_latency():
+    breaker = _breaker(max_ewma_s=2.0)
+    for _ in range(4):
+        breaker.record(True, 5.0)
+    assert breaker.state == OPEN
+    assert breaker.snapshot()["ewma_latency_s"] == 5.0
+
+
+def test_fallback_chain_skips_an_open_provider():
+    calls = []
+    primary = GuardedModel(RunnableLambda(lambda _: calls.append("primary") or "p"), "primary", _breaker())
+    fallback = GuardedModel(RunnableLambda(lambda _: calls.append("fallback") or "f"), "fallback", _breaker())
+    for _ in range(4):
+        primary.breaker.record(False, 1.0)
+
+    chain = primary.with_fallbacks([fallback])
+    assert asyncio.run(chain.ainvoke("hi")) == "f"
+    assert calls == ["fallback"]
+
+
+def test_cancelled_probe_frees_the_slot():
+    breaker = _breaker(cooldown_s=0)
+    for _ in range(4):
+        breaker.record(False, 0.1)
+
+    async def hang(_):
+        await asyncio.sleep(10)
+
+    async def main():
+        task = asyncio.ensure_future(GuardedModel(RunnableLambda(lambda _: None, afunc=hang), "test", breaker).ainvoke("hi"))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+    asyncio.run(main())
+    assert breaker.state == HALF_OPEN and breaker.allow()
+
+
+def _raising(error):
+    def call(_):
+        raise error
+    return RunnableLambda(call)
+
+
+def test_unparseable_replies_do_not_trip_the_breaker():
+    breaker = _breaker()
+    model = GuardedModel(_raising(OutputParserException("not json")), "test", breaker)
+    for _ in range(6):
+        with pytest.raises(OutputParserException):
+            model.invoke("hi")
+    assert breaker.state == CLOSED and breaker.snapshot()["error_rate"] == 0.0
+
+    for _ in range(5):
+        with pytest.raises(TimeoutError):
+            GuardedModel(_raising(TimeoutError("read timed out")), "test", breaker).invoke("hi")
+    assert breaker.state == OPEN                  # real timeouts still do
+
+
+def test_probe_failing_outside_the_provider_frees_the_slot():
+    breaker = _breaker(cooldown_s=0)
+    for _ in range(4):
+        breaker.record(False, 0.1)
+    for error in (KeyError("bug"), RateLimitTimeout("no capacity")):
+        with pytest.raises(type(error)):
+            GuardedModel(_raising(error), "test", breaker).invoke("hi")
+        assert breaker.state == HALF_OPEN and breaker.allow()
+        breaker.release()
+
+    with pytest.raises(OutputParserException):
+        GuardedModel(_raising(OutputParserException("x")), "test", breaker).invoke("hi")
+    assert breaker.state == CLOSED                # a parse error is still an answer
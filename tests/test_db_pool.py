@@ -0,0 +1,75 @@
+import threading
+import time
+from unittest.mock import MagicMock
+
+import pytest
+
+from core import metrics
+from core.db import ConnectionPool, PoolTimeout
+
+
+def _pool(**kwargs):
+    opened = []
+
+    def connect():
+        conn = MagicMock(in_transaction=False)
+        opened.append(conn)
+        return conn
+
+    kwargs.setdefault("ping_after_s", 60)
+    return ConnectionPool(connect=connect, **kwargs), opened
+
+
+def test_connections_are_reused_and_overflow_closes_on_release():
+    pool, opened = _pool(size=1, max_overflow=1, timeout_s=0.1)
+    overflow_before = metrics.DB_POOL_OVERFLOW.value()
+    a, b = pool.get_connection(), pool.get_connection()
+    assert pool.stats()["in_use"] == 2 and metrics.DB_POOL_OVERFLOW.value() == overflow_before + 1
+    b.close()
+    a.close()
+    assert opened[0].close.call_count + opened[1].close.call_count == 1   # one kept, one closed
+    c = pool.get_connection()
+    assert len(opened) == 2 and pool.stats()["open"] == 1
+    c.close()
+    c.close()                                                              # double close is harmless
+    assert pool.stats()["in_use"] == 0
+
+
+def test_checkout_waits_for_a_release_then_times_out():
+    pool, _ = _pool(size=1, max_overflow=0, timeout_s=1.0)
+    held = pool.get_connection()
+    threading.Timer(0.1, held.close).start()
+    t0 = time.monotonic()
+    conn = pool.get_connection()                                           # blocks until the release
+    assert 0.05 < time.monotonic() - t0 < 0.9
+
+    pool.timeout_s = 0.05
+    timeouts_before = metrics.DB_POOL_TIMEOUTS.value()
+    with pytest.raises(PoolTimeout):
+        pool.get_connection()
+    assert metrics.DB_POOL_TIMEOUTS.value() == timeouts_before + 1
+    assert pool.stats()["waiters"] == 0
+    conn.close()
+
+
+def test_dead_idle_connection_is_reconnected_and_failures_free_the_slot():
+    pool, opened = _pool(size=1, max_overflow=0, timeout_s=0.05, ping_after_s=0)
+    pool.get_connection().close()
+    opened[0].is_connected.return_value = False
+    reconnects_before = metrics.DB_POOL_RECONNECTS.value()
+    pool.get_connection().close()
+    opened[0].reconnect.assert_called_once()
+    assert metrics.DB_POOL_RECONNECTS.value() == reconnects_before + 1
+
+    opened[0].reconnect.side_effect = OSError("MySQL is down")
+    with pytest.raises(OSError):
+        pool.get_connection()
+    assert pool.stats()["open"] == 0 and pool.stats()["in_use"] == 0   # slot released for the next caller
+
+
+def test_open_transactions_are_rolled_back_on_release():
+    pool, opened = _pool(size=1, max_overflow=0)
+    conn = pool.get_connection()
+    opened[0].in_transaction = True
+    conn.close()
+    opened[0].rollback.assert_called_once()
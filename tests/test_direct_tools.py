@@ -0,0 +1,131 @@
+import asyncio
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+from langgraph.graph import END, START, StateGraph
+
+from agents import direct_tools
+from agents.direct_tools import DIRECT_TOOLS, answered, match, render, resolve
+from core.state import SupportState
+
+OFFERS_TOON = (
+    'offers[2]{offer_type,description,free_qty}:\n'
+    '"Milk Offer","Buy 5 L, get 1",1\n'
+    '"Special Offer","Min order ₹500 | weekdays",null'
+)
+
+
+def test_resolve_injects_the_session_user_and_drops_unknown_args():
+    call = resolve("check_wallet_balance", {"user_id": "999", "foo": "bar"}, "wallet", user_id=7)
+    assert call == {"name": "check_wallet_balance", "args": {"user_id": 7}}
+
+
+def test_resolve_rejects_unsafe_or_incomplete_choices():
+    assert resolve("add_vacation_date", {"vacation_date": "2026-03-10"}, "subscription", 7) is None
+    assert resolve("get_active_offers", {}, "wallet", 7) is None           # wrong category
+    assert resolve("get_product_details", {}, "product", 7) is None        # missing product_name
+    assert resolve("check_wallet_balance", {}, "wallet", None) is None     # no session user
+    assert resolve(None, {}, "product", 7) is None
+
+
+def test_resolve_keeps_trivially_extracted_args():
+    call = resolve("get_product_details", {"product_name": "Paneer"}, "product", 7)
+    assert call == {"name": "get_product_details", "args": {"product_name": "Paneer"}}
+
+
+def test_render_turns_toon_rows_into_a_markdown_table():
+    answer = render(DIRECT_TOOLS["get_active_offers"], {}, OFFERS_TOON)
+    lines = answer.splitlines()
+    assert lines[0] == "These offers are running right now:"
+    assert lines[2] == "| Offer | Details | Free Qty |"
+    assert lines[4] == "| Milk Offer | Buy 5 L, get 1 | 1 |"
+    assert lines[5] == "| Special Offer | Min order ₹500 \\| weekdays |  |"
+
+
+def test_render_formats_the_title_from_the_first_row():
+    rows = [{"id": 3, "particulars": "Recharge", "credit": 500, "debit": 0, "balance": 740.5,
+             "posting_date": "2026-03-01"}]
+    answer = render(DIRECT_TOOLS["check_wallet_balance"], {"user_id": 7}, rows)
+    assert answer.startswith("Your wallet balance is **₹740.5**.")
+    assert "| 2026-03-01 | Recharge | 500 | 0 | 740.5 |" in answer
+
+
+def test_render_empty_results_and_errors():
+    spec = DIRECT_TOOLS["get_product_details"]
+    assert render(spec, {"product_name": "Kulfi"}, "No product found matching 'Kulfi'.") == \
+        "I couldn't find a product matching **Kulfi**."
+    assert render(spec, {"product_name": "Kulfi"}, "Database connection failed.") is None
+    assert render(spec, {"product_name": "Kulfi"}, "Query error: timeout") is None
+
+
+def test_node_appends_an_agent_shaped_turn():
+    spec = DIRECT_TOOLS["get_active_offers"]
+    with patch.object(type(spec.tool), "invoke", return_value=OFFERS_TOON):
+        update = direct_tools._direct_tool({"direct_tool": {"name": spec.name, "args": {}}}, {})
+    call, result, answer = update["messages"]
+    assert update["direct_tool"] is None
+    assert call.tool_calls[0]["name"] == "get_active_offers"
+    assert isinstance(result, ToolMessage) and result.tool_call_id == call.tool_calls[0]["id"]
+    assert answer.content.startswith("These offers")
+    assert answered({"messages": [HumanMessage(content="offers?")] + update["messages"]})
+
+
+def test_node_hands_failures_to_the_agent():
+    spec = DIRECT_TOOLS["get_active_offers"]
+    with patch.object(type(spec.tool), "invoke", return_value="Database connection failed."):
+        update = direct_tools._direct_tool({"direct_tool": {"name": spec.name, "args": {}}}, {})
+    assert update == {"direct_tool": None}
+    assert not answered({"messages": [HumanMessage(content="offers?")]})
+    assert not answered({"messages": [AIMessage(content="", tool_calls=[{"name": "x", "args": {}, "id": "1"}])]})
+
+
+@pytest.mark.parametrize("message, category, tool", [
+    ("any offers?", "product", "get_active_offers"),
+    ("subscribable products", "product", "get_subscribable_products"),
+    ("my wallet balance", "wallet", "check_wallet_balance"),
+    ("Upcoming vacations dikhao", "subscription", "get_upcoming_vacations"),
+    ("Kya kya milta hai?", "product", "get_product_catalog"),
+])
+def test_keyword_lookups_map_onto_one_direct_tool(message, category, tool):
+    assert match(message, category, user_id=7)["name"] == tool
+
+
+@pytest.mark.parametrize("message, category", [
+    ("why was my offer not applied on the last order?", "product"),    # diagnosis
+    ("cancel my upcoming vacation", "subscription"),                  # action
+    ("any offers on products I can subscribe to?", "product"),        # two lookups
+    ("Paneer available hai?", "product"),                             # needs product_name
+    ("any offers?", "wallet"),                                        # other category
+])
+def test_keyword_lookups_that_need_the_agent(message, category):
+    assert match(message, category, user_id=7) is None
+
+
+def test_fast_path_offers_end_in_the_direct_tool_without_an_llm_call():
+    llm = MagicMock()
+    with patch("core.llm_setup.get_llm", return_value=MagicMock()):
+        from agents import router                   # builds its module-level node on import
+    with patch.object(router, "get_llm", return_value=llm):
+        node = router.create_router_agent("llm")
+    agent = MagicMock(return_value={"messages": [AIMessage(content="from the agent")]})
+
+    graph = StateGraph(SupportState)
+    graph.add_node("router", node)
+    graph.add_node("direct_tool", direct_tools.direct_tool_node)
+    graph.add_node("product_agent", agent)
+    graph.add_edge(START, "router")
+    graph.add_conditional_edges(
+        "router", lambda s: "direct_tool" if s.get("direct_tool") else "product_agent")
+    graph.add_conditional_edges("direct_tool", lambda s: END if answered(s) else "product_agent")
+    graph.add_edge("product_agent", END)
+
+    spec = DIRECT_TOOLS["get_active_offers"]
+    with patch.object(router.settings, "ROUTER_FAST_PATH_SHADOW_RATE", 0), \
+            patch.object(type(spec.tool), "ainvoke", AsyncMock(return_value=OFFERS_TOON)):
+        state = asyncio.run(graph.compile().ainvoke(
+            {"messages": [HumanMessage(content="any offers?")], "user_id": 7}))
+    assert state["ticket_category"] == "product"
+    assert state["messages"][-1].content.startswith("These offers are running right now:")
+    assert not llm.with_structured_output.return_value.ainvoke.called
+    assert not agent.called
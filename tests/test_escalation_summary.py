@@ -0,0 +1,103 @@
+import time
+
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+from langchain_core.runnables import RunnableLambda
+from langgraph.checkpoint.memory import InMemorySaver
+from langgraph.graph import END, START, StateGraph
+
+from agents.escalation import ESCALATION_MESSAGE, human_escalation_node
+from core import escalation_summary
+from core.escalation_summary import ESCALATION_SUMMARIES
+from core.history import SUMMARY_HEADER, transcript
+from core.state import SupportState
+from core.turn import hold_thread
+
+
+def _graph():
+    workflow = StateGraph(SupportState)
+    workflow.add_node("router", lambda s: {"needs_escalation": True, "escalation_summary": "router says"})
+    workflow.add_node("human_escalation", human_escalation_node)
+    workflow.add_edge(START, "router")
+    workflow.add_edge("router", "human_escalation")
+    workflow.add_edge("human_escalation", END)
+    return workflow.compile(checkpointer=InMemorySaver(), interrupt_before=["human_escalation"])
+
+
+def _wait_for(predicate, timeout=3.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+def test_transcript_keeps_the_newest_messages_within_budget():
+    messages = [HumanMessage(content=f"question {i} " + "x" * 400) for i in range(10)]
+    messages.append(ToolMessage(content="row," * 1000, tool_call_id="1"))
+    text = transcript(messages, budget=300, summary="customer wants a refund")
+    assert text.startswith(SUMMARY_HEADER + "customer wants a refund")
+    assert "earlier messages omitted" in text and "question 9" in text and "question 0" not in text
+    assert len(text.splitlines()[-1]) < 420                     # tool dump clipped
+
+
+def test_handoff_returns_at_once_and_summary_is_written_back_with_retry():
+    calls = []
+
+    def summarize(prompt):
+        calls.append(prompt)
+        if len(calls) == 1:
+            raise RuntimeError("503 from provider")
+        return AIMessage(content="Customer reports a missing delivery.")
+
+    graph = _graph()
+    config = {"configurable": {"thread_id": "esc-1"}}
+    before = ESCALATION_SUMMARIES.value(outcome="written")
+    escalation_summary.start_worker(graph, llm=RunnableLambda(summarize), retry_s=0.05)
+    try:
+        graph.invoke({"messages": [HumanMessage(content="milk missing, I want a human")]}, config)
+        assert graph.get_state(config).next == ("human_escalation",)
+        out = graph.invoke(None, config)
+        assert out["messages"][-1].content == ESCALATION_MESSAGE
+        assert out["escalation_summary"] == "router says"          # not blocked on the LLM
+        assert _wait_for(lambda: graph.get_state(config).values["escalation_summary"]
+                         == "Customer reports a missing delivery.")
+    finally:
+        escalation_summary.stop_worker()
+    assert len(calls) == 2 and "milk missing" in calls[1]
+    assert ESCALATION_SUMMARIES.value(outcome="written") == before + 1
+    assert graph.get_state(config).next == ()
+
+
+def test_paused_threads_are_not_overwritten_and_give_up_after_max_attempts():
+    graph = _graph()
+    config = {"configurable": {"thread_id": "esc-2"}}
+    graph.invoke({"messages": [HumanMessage(content="lawyer")]}, config)     # paused, not resumed
+    before = ESCALATION_SUMMARIES.value(outcome="failed")
+    worker = escalation_summary.start_worker(
+        graph, llm=RunnableLambda(lambda _: AIMessage(content="s")), retry_s=0.01, max_attempts=2)
+    try:
+        assert worker.submit("esc-2", [HumanMessage(content="lawyer")])
+        assert _wait_for(lambda: ESCALATION_SUMMARIES.value(outcome="failed") == before + 1)
+    finally:
+        escalation_summary.stop_worker()
+    assert graph.get_state(config).values["escalation_summary"] == "router says"
+    assert escalation_summary.submit("esc-2", []) is False                  # no worker running
+
+
+def test_write_back_waits_for_a_turn_holding_the_thread():
+    graph = _graph()
+    config = {"configurable": {"thread_id": "esc-3"}}
+    graph.invoke({"messages": [HumanMessage(content="lawyer")]}, config)
+    graph.invoke(None, config)                                          # resumed, thread idle
+    worker = escalation_summary.start_worker(
+        graph, llm=RunnableLambda(lambda _: AIMessage(content="late summary")), retry_s=0.02, max_attempts=10)
+    try:
+        with hold_thread("esc-3"):                                      # a turn is running
+            checkpoint = graph.get_state(config).config["configurable"]["checkpoint_id"]
+            assert worker.submit("esc-3", [HumanMessage(content="lawyer")])
+            time.sleep(0.2)
+            assert graph.get_state(config).config["configurable"]["checkpoint_id"] == checkpoint
+        assert _wait_for(lambda: graph.get_state(config).values["escalation_summary"] == "late summary")
+    finally:
+        escalation_summary.stop_worker()
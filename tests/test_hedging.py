@@ -0,0 +1,119 @@
+import asyncio
+import time
+
+import pytest
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.messages import AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.runnables import RunnableLambda
+
+from core import hedging
+from core.hedging import HedgedChatModel, LatencyTracker
+
+
+class SlowChat(BaseChatModel):
+    """Answers `reply` after `delay` seconds, or raises when `fail` is set."""
+
+    reply: str
+    delay: float = 0.0
+    fail: bool = False
+
+    @property
+    def _llm_type(self):
+        return "slow"
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        time.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError(f"{self.reply} down")
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self.reply))])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        await asyncio.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError(f"{self.reply} down")
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self.reply))])
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        for word in self.reply.split(" "):
+            await asyncio.sleep(self.delay)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=word))
+
+
+def _hedged(primary, fallback, budget=0.05):
+    return HedgedChatModel(
+        primary=primary, fallback=fallback,
+        primary_key=("p", "primary"), fallback_key=("f", "fallback"),
+        initial_budget_s=budget, tracker=LatencyTracker(),
+    )
+
+
+def _outcome(name):
+    return hedging.HEDGE_OUTCOMES.value(outcome=name)
+
+
+def test_fast_primary_never_fires_the_fallback():
+    before = _outcome("primary")
+    llm = _hedged(SlowChat(reply="primary"), SlowChat(reply="fallback", fail=True))
+    assert asyncio.run(llm.ainvoke([HumanMessage(content="hi")])).content == "primary"
+    assert _outcome("primary") == before + 1
+
+
+def test_slow_primary_is_hedged_and_the_first_answer_wins():
+    before = _outcome("hedged_fallback_won")
+    llm = _hedged(SlowChat(reply="primary", delay=2), SlowChat(reply="fallback"))
+    start = time.perf_counter()
+    assert asyncio.run(llm.ainvoke([HumanMessage(content="hi")])).content == "fallback"
+    assert time.perf_counter() - start < 1
+    assert _outcome("hedged_fallback_won") == before + 1
+
+
+def test_failed_primary_falls_back_without_waiting_for_the_budget():
+    before = _outcome("fallback_after_error")
+    llm = _hedged(SlowChat(reply="primary", fail=True), SlowChat(reply="fallback"), budget=5)
+    start = time.perf_counter()
+    assert llm.invoke([HumanMessage(content="hi")]).content == "fallback"
+    assert time.perf_counter() - start < 1
+    assert _outcome("fallback_after_error") == before + 1
+
+
+def test_both_legs_failing_raises():
+    llm = _hedged(SlowChat(reply="primary", fail=True), SlowChat(reply="fallback", fail=True))
+    with pytest.raises(RuntimeError, match="primary down"):
+        asyncio.run(llm.ainvoke([HumanMessage(content="hi")]))
+
+
+def test_budget_follows_the_primary_p95_within_bounds():
+    tracker = LatencyTracker()
+    llm = HedgedChatModel(
+        primary=SlowChat(reply="p"), fallback=SlowChat(reply="f"),
+        primary_key=("p", "primary"), fallback_key=("f", "fallback"),
+        initial_budget_s=8, min_budget_s=1, max_budget_s=30, tracker=tracker,
+    )
+    assert llm.budget() == 8                     # not enough samples yet
+    for seconds in [2.0] * 19 + [4.0]:
+        tracker.observe(("p", "primary"), seconds)
+    assert llm.budget() == 4.0
+    for _ in range(200):
+        tracker.observe(("p", "primary"), 0.1)
+    assert llm.budget() == 1                     # clamped to HEDGE_MIN_BUDGET_S
+
+
+def test_streamed_calls_only_receive_the_winners_answer():
+    llm = _hedged(SlowChat(reply="PRIMARY slow", delay=0.5), SlowChat(reply="fallback fast"))
+    node = RunnableLambda(lambda messages: messages) | llm      # called like a graph node calls it
+
+    async def tokens():
+        return [ev["data"]["chunk"].content
+                async for ev in node.astream_events([HumanMessage(content="hi")], version="v2")
+                if ev["event"] == "on_chat_model_stream"]
+
+    assert asyncio.run(tokens()) == ["fallback fast"]
+
+
+def test_cancelled_primary_still_counts_toward_the_budget():
+    llm = _hedged(SlowChat(reply="primary", delay=2), SlowChat(reply="fallback"), budget=0.2)
+    assert asyncio.run(llm.ainvoke([HumanMessage(content="hi")])).content == "fallback"
+    [elapsed] = llm.tracker._samples[("p", "primary")]
+    assert 0.2 <= elapsed < 1                    # lower bound, recorded at cancellation
@@ -0,0 +1,130 @@
+import asyncio
+from unittest.mock import MagicMock, patch
+
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage
+
+from core import history
+from core.history import SUMMARY_HEADER, history_budget, history_hook, select_window
+
+
+def _turns(n, size=400):
+    messages = []
+    for i in range(n):
+        messages.append(HumanMessage(content=f"question {i} " + "q" * size, id=f"h{i}"))
+        messages.append(AIMessage(content=f"answer {i} " + "a" * size, id=f"a{i}"))
+    return messages
+
+
+def _settings(budget, keep_ratio=0.5, enabled=True):
+    return patch.multiple(history.settings, HISTORY_TOKEN_BUDGET=budget, HISTORY_KEEP_RATIO=keep_ratio,
+                          HISTORY_SUMMARY_ENABLED=enabled)
+
+
+def test_budget_per_provider_and_auto_takes_the_smaller():
+    budgets = {"groq": 4000, "gemini": 24000, "anthropic": 24000, "huggingface": 3000}
+    with patch.multiple(history.settings, HISTORY_TOKEN_BUDGET=0, HISTORY_TOKEN_BUDGETS=budgets,
+                        AUTO_PRIMARY_PROVIDER="gemini", AUTO_FALLBACK_PROVIDER="groq"):
+        assert history_budget("gemini") == 24000
+        assert history_budget("auto") == 4000
+    with patch.object(history.settings, "HISTORY_TOKEN_BUDGET", 1234):
+        assert history_budget("gemini") == 1234
+
+
+def test_window_keeps_everything_under_budget():
+    messages = _turns(3)
+    start, window = select_window(messages, 0, budget=100_000, keep_ratio=0.5)
+    assert start == 0
+    assert window == messages
+
+
+def test_window_drops_whole_old_turns_and_keeps_the_current_one():
+    messages = _turns(10) + [HumanMessage(content="latest", id="now")]
+    start, window = select_window(messages, 0, budget=1000, keep_ratio=0.5)
+    assert start > 0 and start % 2 == 0                  # cut at a turn boundary
+    assert isinstance(window[0], HumanMessage)
+    assert window[-1].content == "latest"
+    assert history._tokens(window) <= 500
+
+
+def test_window_never_reaches_back_before_the_summary():
+    messages = _turns(4)
+    start, window = select_window(messages, 4, budget=100_000, keep_ratio=0.5)
+    assert start == 4
+    assert window == messages[4:]
+
+
+def test_oversized_tool_result_in_current_turn_is_truncated():
+    messages = [
+        HumanMessage(content="show all orders", id="h"),
+        AIMessage(content="", id="a", tool_calls=[{"name": "get_orders_filtered", "args": {}, "id": "t1"}]),
+        ToolMessage(content="row\n" * 5000, tool_call_id="t1", id="t"),
+    ]
+    start, window = select_window(messages, 0, budget=1000, keep_ratio=0.5)
+    assert start == 0
+    assert "truncated" in window[-1].content
+    assert history._tokens(window) <= 1000
+    assert len(messages[-1].content) == 20000            # stored message untouched
+
+
+def test_hook_summarises_dropped_turns_once():
+    llm = MagicMock()
+    llm.invoke.return_value = AIMessage(content="Customer asked about orders 0-7.")
+    hook = history_hook("SYSTEM", llm=llm)
+    messages = _turns(10) + [HumanMessage(content="latest", id="now")]
+
+    with _settings(1000):
+        out = hook.invoke({"messages": messages})
+        assert llm.invoke.call_count == 1
+        assert out["history_summary"] == "Customer asked about orders 0-7."
+        covered = out["summarized_count"]
+        assert covered > 0
+
+        llm_input = out["llm_input_messages"]
+        assert llm_input[0] == SystemMessage(content="SYSTEM")
+        assert llm_input[1].content == SUMMARY_HEADER + "Customer asked about orders 0-7."
+        assert llm_input[2:] == messages[covered:]
+
+        # Next ReAct hop: one more small message, the stored summary is reused
+        state = {"messages": messages + [AIMessage(content="ok", id="x")],
+                 "history_summary": out["history_summary"], "summarized_count": covered}
+        out = hook.invoke(state)
+        assert llm.invoke.call_count == 1
+        assert "history_summary" not in out
+        assert out["llm_input_messages"][1].content.endswith("orders 0-7.")
+
+
+def test_hook_keeps_trimming_when_the_summariser_fails():
+    llm = MagicMock()
+    llm.invoke.side_effect = RuntimeError("rate limited")
+    hook = history_hook("SYSTEM", llm=llm)
+    messages = _turns(10) + [HumanMessage(content="latest", id="now")]
+    with _settings(1000):
+        out = hook.invoke({"messages": messages})
+    assert "summarized_count" not in out
+    assert out["llm_input_messages"][-1].content == "latest"
+    assert history._tokens(out["llm_input_messages"][1:]) <= 500
+
+
+def test_hook_adds_session_context_after_the_static_system_prompt():
+    hook = history_hook("SYSTEM", context=lambda state: f"user_id: {state.get('user_id')}", llm=MagicMock())
+    with _settings(100_000):
+        out = hook.invoke({"messages": [HumanMessage(content="hi")], "user_id": 42})
+    system, context, question = out["llm_input_messages"]
+    assert system.content == "SYSTEM"
+    assert isinstance(context, HumanMessage) and context.content == "user_id: 42"
+    assert question.content == "hi"
+
+
+def test_summary_is_not_streamed_to_the_client():
+    summarizer = GenericFakeChatModel(messages=iter([AIMessage(content="internal summary text")]))
+    hook = history_hook("SYSTEM", llm=summarizer)
+    messages = _turns(10) + [HumanMessage(content="latest", id="now")]
+
+    async def stream():
+        return [ev async for ev in hook.astream_events({"messages": messages}, version="v2")]
+
+    with _settings(1000):
+        events = asyncio.run(stream())
+    assert not [ev for ev in events if ev["event"] == "on_chat_model_stream"]
+    assert events[-1]["data"]["output"]["history_summary"] == "internal summary text"
@@ -0,0 +1,59 @@
+import pytest
+
+from agents.intent_classifier import IntentClassifier
+
+_VOCAB = ("order", "sale", "vacation", "chhutti", "wallet", "balance", "price", "rate", "hello", "policy")
+
+
+class BagOfWords:
+    """Deterministic stand-in for the HuggingFace embedder."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def embed_documents(self, texts):
+        self.calls += 1
+        return [[float(word in t.lower()) for word in _VOCAB] for t in texts]
+
+
+EXAMPLES = {
+    "order": ("where is my order", "aaj kitna sale hua", "order sale report"),
+    "subscription": ("mark vacation", "chhutti mark karo", "cancel vacation"),
+    "wallet": ("wallet balance", "recharge wallet"),
+    "product": ("milk price", "rate kya hai"),
+    "general": ("hello", "refund policy"),
+}
+
+
+@pytest.mark.parametrize("method", ["knn", "centroid"])
+@pytest.mark.parametrize("message, category", [
+    ("Order kab aayega?", "order"),
+    ("Kal chhutti hai", "subscription"),
+    ("Mera wallet balance", "wallet"),
+    ("Paneer ka rate?", "product"),
+    ("hello there", "general"),
+])
+def test_classifies_by_nearest_examples(method, message, category):
+    clf = IntentClassifier(BagOfWords(), EXAMPLES, k=3, method=method)
+    result = clf.classify(message)
+    assert result["category"] == category
+    assert result["needs_escalation"] is False
+    assert result["summary"] == message
+
+
+def test_legal_keywords_still_escalate():
+    clf = IntentClassifier(BagOfWords(), EXAMPLES, k=3)
+    assert clf.classify("Wrong order again, I will talk to my lawyer")["needs_escalation"] is True
+
+
+def test_examples_are_embedded_once():
+    embedder = BagOfWords()
+    clf = IntentClassifier(embedder, EXAMPLES)
+    clf.classify("order")
+    clf.classify("wallet")
+    assert embedder.calls == 3          # one fit + one per message
+
+
+def test_unknown_method_is_rejected():
+    with pytest.raises(ValueError):
+        IntentClassifier(BagOfWords(), EXAMPLES, method="svm")
@@ -26,3 +26,39 @@ def test_llm_setup_unknown_provider(mock_config):
     
     with pytest.raises(ValueError, match="Unknown LLM_PROVIDER: unknown_provider"):
         LLMSetup()
+
+@patch("core.llm_setup.Config")
+def test_anthropic_requests_mark_the_system_prompt_for_caching(mock_config, monkeypatch):
+    from langchain_core.messages import HumanMessage, SystemMessage
+
+    monkeypatch.setenv("ANTHROPIC_API_KEY", "test")
+    mock_instance = mock_config.return_value
+    mock_instance.LLM_PROVIDER = "anthropic"
+    mock_instance.MODEL_NAME = "claude-3-5-sonnet-latest"
+    mock_instance.PROMPT_CACHE_ENABLED = True
+    mock_instance.ANTHROPIC_CACHE_TTL = "5m"
+
+    llm = LLMSetup().get_llm()
+    payload = llm._get_request_payload([SystemMessage(content="static prompt"), HumanMessage(content="hi")])
+
+    marker = {"type": "ephemeral", "ttl": "5m"}
+    assert payload["system"] == [{"type": "text", "text": "static prompt", "cache_control": marker}]
+    assert payload["cache_control"] == marker
+
+@patch("core.llm_setup.Config")
+def test_get_llm_shares_one_client_per_key(mock_config, monkeypatch):
+    from core import llm_setup
+
+    monkeypatch.setattr(llm_setup, "_clients", {})
+    mock_instance = mock_config.return_value
+    mock_instance.LLM_PROVIDER = "groq"
+    mock_instance.MODEL_NAME = "llama-3.1-8b-instant"
+
+    with patch("core.llm_setup.ChatGroq", side_effect=lambda **kw: object()) as mock_groq, \
+         patch("core.llm_setup._groq_http_clients", return_value=(None, None)):
+        first = llm_setup.get_llm(temperature=0)
+        assert llm_setup.get_llm(temperature=0) is first
+        assert llm_setup.get_llm(temperature=0, model_name="llama-3.1-8b-instant", provider="groq") is first
+        assert llm_setup.get_llm(temperature=0.1) is not first
+        assert mock_groq.call_count == 2
+    assert llm_setup.llm_client_count() == 2
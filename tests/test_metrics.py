@@ -0,0 +1,96 @@
+from unittest.mock import MagicMock, patch
+from typing import TypedDict
+from langchain_core.tools import tool
+from langgraph.graph import StateGraph, START, END
+
+from core import metrics
+from core.metrics import Counter, Histogram, Registry, MetricsCallbackHandler
+
+
+class TicketState(TypedDict, total=False):
+    ticket_category: str
+    answer: str
+
+
+@tool
+def lookup_order(order_id: int) -> str:
+    """Look up an order."""
+    return f"order {order_id}: delivered"
+
+
+def _graph(handler):
+    workflow = StateGraph(TicketState)
+    workflow.add_node("router", lambda s: {"ticket_category": "order"})
+    workflow.add_node("order_agent", lambda s: {"answer": lookup_order.invoke({"order_id": 7})})
+    workflow.add_edge(START, "router")
+    workflow.add_edge("router", "order_agent")
+    workflow.add_edge("order_agent", END)
+    return workflow.compile().with_config(callbacks=[handler])
+
+
+def test_histogram_and_counter_render_prometheus_text():
+    registry = Registry()
+    hist = registry.register(Histogram("demo_seconds", "Demo.", ("node",), buckets=(0.1, 1.0)))
+    errors = registry.register(Counter("demo_errors_total", "Demo errors.", ("node",)))
+    hist.observe(0.05, node="router")
+    hist.observe(0.5, node="router")
+    errors.inc(node='we"ird')
+
+    text = registry.render({"demo_queued": ("Queued.", 3)})
+    assert "# TYPE demo_seconds histogram" in text
+    assert 'demo_seconds_bucket{node="router",le="0.1"} 1' in text
+    assert 'demo_seconds_bucket{node="router",le="1.0"} 2' in text
+    assert 'demo_seconds_bucket{node="router",le="+Inf"} 2' in text
+    assert 'demo_seconds_count{node="router"} 2' in text
+    assert 'demo_errors_total{node="we\\"ird"} 1.0' in text
+    assert "demo_queued 3" in text
+
+
+def test_handler_times_nodes_and_tools_with_category():
+    router_before = metrics.NODE_DURATION.count(node="router", category="order")
+    agent_before = metrics.NODE_DURATION.count(node="order_agent", category="order")
+    tool_before = metrics.TOOL_DURATION.count(tool="lookup_order", category="order", status="ok")
+    handler = MetricsCallbackHandler()
+
+    _graph(handler).invoke({})
+
+    assert metrics.NODE_DURATION.count(node="router", category="order") == router_before + 1
+    assert metrics.NODE_DURATION.count(node="order_agent", category="order") == agent_before + 1
+    assert metrics.TOOL_DURATION.count(tool="lookup_order", category="order", status="ok") == tool_before + 1
+    assert handler._runs == {}
+
+
+def test_db_connection_records_pool_wait():
+    before = metrics.DB_POOL_WAIT.count(source="pool")
+    pool = MagicMock()
+    with patch("core.db._get_pool", return_value=pool):
+        from core.db import get_db_connection
+        assert get_db_connection() is pool.get_connection.return_value
+    assert metrics.DB_POOL_WAIT.count(source="pool") == before + 1
+
+
+def test_handler_records_ttft_and_cached_input_tokens():
+    from uuid import uuid4
+    from langchain_core.messages import AIMessage
+    from langchain_core.outputs import ChatGeneration, LLMResult
+
+    labels = {"provider": "anthropic", "model": "claude-test", "category": "none"}
+    ttft_before = metrics.LLM_TTFT.count(**labels)
+    read_before = metrics.LLM_INPUT_TOKENS.value(cache="read", **labels)
+    none_before = metrics.LLM_INPUT_TOKENS.value(cache="none", **labels)
+    handler = MetricsCallbackHandler()
+    run_id = uuid4()
+
+    handler.on_chat_model_start({}, [[]], run_id=run_id,
+                                metadata={"ls_provider": "anthropic", "ls_model_name": "claude-test"})
+    handler.on_llm_new_token("Hel", run_id=run_id)
+    handler.on_llm_new_token("lo", run_id=run_id)
+    message = AIMessage(content="Hello", usage_metadata={
+        "input_tokens": 3000, "output_tokens": 5, "total_tokens": 3005,
+        "input_token_details": {"cache_read": 2800, "cache_creation": 0},
+    })
+    handler.on_llm_end(LLMResult(generations=[[ChatGeneration(message=message)]]), run_id=run_id)
+
+    assert metrics.LLM_TTFT.count(**labels) == ttft_before + 1
+    assert metrics.LLM_INPUT_TOKENS.value(cache="read", **labels) == read_before + 2800
+    assert metrics.LLM_INPUT_TOKENS.value(cache="none", **labels) == none_before + 200
@@ -0,0 +1,41 @@
+from unittest.mock import patch
+
+import pytest
+
+from core import query
+from tools import order_tools
+
+
+def test_date_filter_builds_half_open_ranges():
+    assert order_tools._date_filter(on="2026-02-28") == (
+        ["order_date >= %s", "order_date < %s"], ["2026-02-28", "2026-03-01"])
+    assert order_tools._date_filter("o.order_date", start="2026-03-01", end="2026-03-31") == (
+        ["o.order_date >= %s", "o.order_date < %s"], ["2026-03-01", "2026-04-01"])
+    assert order_tools._date_filter(end="2026-12-31") == (["order_date < %s"], ["2027-01-01"])
+    assert order_tools._date_filter(use_today=True, on="2026-03-01")[0] == [
+        "order_date >= CURDATE()", "order_date < CURDATE() + INTERVAL 1 DAY"]
+    assert order_tools._date_filter() == ([], [])
+    with pytest.raises(ValueError, match="YYYY-MM-DD"):
+        order_tools._date_filter(start="01-03-2026")
+
+
+@pytest.mark.parametrize("tool, args", [
+    (order_tools.get_orders_filtered, {"start_date": "2026-03-01", "end_date": "2026-03-07"}),
+    (order_tools.get_sales_summary, {"start_date": "2026-03-01", "end_date": "2026-03-07", "group_by": "date"}),
+    (order_tools.get_daily_sales_summary, {"summary_date": "2026-03-01"}),
+    (order_tools.get_top_report, {"report_type": "products", "start_date": "2026-03-01", "end_date": "2026-03-07"}),
+])
+def test_order_and_sales_tools_filter_dates_without_wrapping_the_column(tool, args):
+    with patch.object(order_tools, "get_user_role", return_value="admin"), query.capture() as statements:
+        tool.invoke({"session_user_id": 1, **args})
+    assert statements
+    for _, sql, params in statements:
+        where = sql.split("WHERE", 1)[1].split("GROUP BY")[0]
+        assert "DATE(" not in where and "order_date >= %s" in where and "order_date < %s" in where
+        assert "2026-03-01" in params and ("2026-03-08" in params or "2026-03-02" in params)
+
+
+def test_invalid_dates_are_reported_instead_of_queried():
+    with patch.object(order_tools, "get_user_role", return_value="customer"), query.capture() as statements:
+        result = order_tools.get_orders_filtered.invoke({"session_user_id": 7, "order_date": "1st March"})
+    assert result.startswith("Invalid date '1st March'") and statements == []
@@ -0,0 +1,84 @@
+from datetime import date, datetime
+from decimal import Decimal
+from unittest.mock import MagicMock, patch
+
+from mysql.connector import Error
+
+from core import query
+from core.db import ConnectionPool
+from core.metrics import DB_QUERY_DURATION, DB_QUERY_ERRORS
+from tools import product_tools, wallet_tools
+
+
+def _pool(rows):
+    """Pool of fake connections; every cursor returns *rows*. Returns (pool, cursors)."""
+    cursors = []
+
+    def cursor(**kwargs):
+        c = MagicMock()
+        c.kwargs = kwargs
+        c.fetchall.return_value = [dict(r) for r in rows]
+        cursors.append(c)
+        return c
+
+    def connect():
+        conn = MagicMock(in_transaction=False)
+        conn.cursor.side_effect = cursor
+        return conn
+
+    return ConnectionPool(size=1, max_overflow=0, ping_after_s=60, connect=connect), cursors
+
+
+def test_selects_get_the_statement_timeout_hint():
+    sql = "\n    select id FROM sp_users WHERE id = %s"
+    hinted = query._with_timeout(sql, 2500)
+    assert hinted == "\n    select /*+ MAX_EXECUTION_TIME(2500) */ id FROM sp_users WHERE id = %s"
+    assert query._with_timeout(sql, 2500) is hinted            # same object → prepared cursor reuse
+    assert query._with_timeout(sql, 0) == sql
+    assert query._with_timeout("UPDATE t SET a = 1", 2500) == "UPDATE t SET a = 1"
+    assert query._with_timeout(hinted, 100) == hinted
+
+
+def test_rows_are_normalized_and_timed_per_query_name():
+    pool, cursors = _pool([{"id": 1, "amount": Decimal("72.50"), "day": date(2026, 3, 1),
+                            "at": datetime(2026, 3, 1, 6, 30), "note": bytearray(b"ok"), "gone": None}])
+    before = DB_QUERY_DURATION.count(query="t_rows", phase="fetch")
+    with patch.object(query, "get_db_connection", side_effect=pool.get_connection):
+        rows = query.fetch_all("t_rows", "SELECT * FROM t WHERE id = %s", [1])
+    assert rows == [{"id": 1, "amount": "72.50", "day": "2026-03-01", "at": "2026-03-01 06:30:00",
+                     "note": "ok", "gone": None}]
+    assert cursors[0].kwargs == {"dictionary": True} and cursors[0].close.called
+    assert "MAX_EXECUTION_TIME" in cursors[0].execute.call_args[0][0]
+    assert cursors[0].execute.call_args[0][1] == (1,)
+    assert DB_QUERY_DURATION.count(query="t_rows", phase="execute") == before + 1
+    assert DB_QUERY_DURATION.count(query="t_rows", phase="fetch") == before + 1
+    assert pool.stats()["in_use"] == 0
+
+
+def test_prepared_statements_stay_with_the_pooled_connection():
+    pool, cursors = _pool([{"balance": 10}])
+    with patch.object(query, "get_db_connection", side_effect=pool.get_connection):
+        for _ in range(3):
+            query.fetch_all("t_prep", "SELECT balance FROM l WHERE user_id = %s", (7,), prepared=True)
+        assert len(cursors) == 1 and cursors[0].kwargs == {"prepared": True, "dictionary": True}
+        assert cursors[0].execute.call_count == 3 and not cursors[0].close.called
+
+        cursors[0].execute.side_effect = Error(msg="max time exceeded", errno=3024)
+        before = DB_QUERY_ERRORS.value(query="t_prep", error="timeout")
+        assert "max time exceeded" in product_tools._run_read(
+            "t_prep", "SELECT balance FROM l WHERE user_id = %s", (7,), prepared=True)
+        assert DB_QUERY_ERRORS.value(query="t_prep", error="timeout") == before + 1
+        assert cursors[0].close.called                        # failed statement is re-prepared
+        query.fetch_all("t_prep", "SELECT balance FROM l WHERE user_id = %s", (7,), prepared=True)
+        assert len(cursors) == 2
+
+        with patch.object(query, "_MAX_PREPARED", 2):
+            for i in range(3):
+                query.fetch_all("t_lru", f"SELECT {i} FROM l", prepared=True)
+        assert cursors[1].close.called                        # least recently used dropped
+
+
+def test_tools_report_an_unavailable_database():
+    with patch.object(query, "get_db_connection", return_value=None):
+        assert wallet_tools.check_wallet_balance.invoke({"user_id": 7}) == "Database connection failed."
+        assert product_tools.get_active_offers.invoke({}) == "Database connection failed."
@@ -0,0 +1,95 @@
+import asyncio
+
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.runnables import RunnableLambda
+
+from core import rate_limit
+from core.circuit_breaker import CLOSED, CircuitBreaker, GuardedModel
+from core.rate_limit import RateLimitedModel, RateLimiter, RateLimitTimeout
+
+
+def _reply(total_tokens):
+    return RunnableLambda(lambda _: AIMessage(content="ok", usage_metadata={
+        "input_tokens": total_tokens - 10, "output_tokens": 10, "total_tokens": total_tokens}))
+
+
+def test_requests_beyond_the_bucket_wait_for_refill():
+    limiter = RateLimiter("test", "m", rpm=600, max_wait_s=5)    # 10 requests / s
+    limiter._requests.level = 1
+    assert limiter.acquire(1) < 0.05
+    waited = limiter.acquire(1)
+    assert 0.05 < waited < 0.5
+    assert limiter.snapshot()["throttled_calls"] == 1
+
+
+def test_token_budget_times_out_and_leaves_the_queue():
+    limiter = RateLimiter("test", "m", tpm=600, max_wait_s=0.2)  # 10 tokens / s
+    limiter._tokens.level = 0
+    with pytest.raises(RateLimitTimeout):
+        limiter.acquire(100)                                     # needs 10 s > max wait
+    snapshot = limiter.snapshot()
+    assert snapshot["queued"] == 0 and snapshot["timeouts"] == 1
+
+
+def test_waiters_are_served_in_arrival_order():
+    limiter = RateLimiter("test", "m", rpm=1200, max_wait_s=5)   # one request every 50 ms
+    limiter._requests.level = 0
+    order = []
+
+    async def call(name, tokens):
+        await limiter.aacquire(tokens)
+        order.append(name)
+
+    async def main():
+        tasks = []
+        for name in "abcd":
+            tasks.append(asyncio.ensure_future(call(name, 1)))
+            await asyncio.sleep(0.001)
+        await asyncio.gather(*tasks)
+
+    asyncio.run(main())
+    assert order == list("abcd")
+
+
+def test_model_settles_the_estimate_with_real_usage():
+    limiter = RateLimiter("test", "m", tpm=60_000)
+    model = RateLimitedModel(_reply(5000), limiter, completion_tokens=100)
+    estimated = model.estimate([HumanMessage(content="hi")])
+    model.invoke([HumanMessage(content="hi")])
+    assert limiter._tokens.level == pytest.approx(60_000 - 5000, abs=5)
+    assert estimated < 5000
+
+
+def test_bound_tools_count_towards_the_estimate():
+    class Bindable(RunnableLambda):
+        def bind_tools(self, tools, **kwargs):
+            return self.bind(tools=tools)
+
+    limiter = RateLimiter("test", "m", rpm=60)
+    model = RateLimitedModel(Bindable(lambda _: "ok"), limiter, completion_tokens=1)
+    tool = {"type": "function", "function": {"name": "lookup", "description": "x" * 400}}
+    bound = model.bind_tools([tool])
+    assert bound.limiter is limiter
+    assert bound.estimate("hi") > model.estimate("hi") + 90
+
+
+def test_limiter_timeout_does_not_trip_the_breaker():
+    breaker = CircuitBreaker("test", window=4, min_calls=1, error_rate=0.5, cooldown_s=60, max_ewma_s=0, alpha=0.5)
+    limiter = RateLimiter("test", "m", rpm=1, max_wait_s=0.01)
+    model = GuardedModel(RateLimitedModel(_reply(20), limiter), "test", breaker)
+    model.invoke("hi")
+    with pytest.raises(RateLimitTimeout):
+        model.invoke("hi")
+    assert breaker.state == CLOSED
+
+
+def test_limits_come_from_the_provider_or_a_model_override(monkeypatch):
+    monkeypatch.setattr(rate_limit, "_limiters", {})
+    monkeypatch.setattr(rate_limit.settings, "RATE_LIMITS", {"groq": (30, 12000), "gemini": (0, 0)})
+    monkeypatch.setattr(rate_limit.settings, "RATE_LIMIT_MODEL_OVERRIDES", "llama-3.3-70b-versatile=30/6000")
+    assert rate_limit.get_limiter("gemini", "gemini-2.5-flash") is None
+    assert rate_limit.get_limiter("groq", "llama-3.1-8b-instant").tpm == 12000
+    assert rate_limit.get_limiter("groq", "llama-3.3-70b-versatile").tpm == 6000
+    assert rate_limit.get_limiter("groq", "llama-3.1-8b-instant") is rate_limit.get_limiter("groq", "llama-3.1-8b-instant")
+    assert set(rate_limit.limiter_states()) == {"groq/llama-3.1-8b-instant", "groq/llama-3.3-70b-versatile"}
@@ -0,0 +1,90 @@
+import pytest
+from unittest.mock import patch
+
+from core.response_cache import ResponseCache, is_cacheable, normalize_question
+
+
+class WordEmbedder:
+    """Bag-of-words embedding — similar questions share most words."""
+
+    VOCAB = ["koi", "offer", "chal", "raha", "hai", "milk", "ka", "rate", "kya", "refund", "policy"]
+
+    def __init__(self):
+        self.calls = 0
+
+    def embed_query(self, text):
+        self.calls += 1
+        words = text.split()
+        return [float(words.count(w)) for w in self.VOCAB] + [0.01]
+
+
+def _cache(**kwargs):
+    kwargs.setdefault("threshold", 0.9)
+    kwargs.setdefault("ttl_s", 3600)
+    kwargs.setdefault("max_entries", 100)
+    return ResponseCache(WordEmbedder(), **kwargs)
+
+
+def test_normalize_question():
+    assert normalize_question("  Koi OFFER chal raha hai?? ") == "koi offer chal raha hai"
+
+
+def test_similar_question_hits_within_role():
+    cache = _cache()
+    assert cache.store("Koi offer chal raha hai?", "customer", "product", "Buy 10 get 2 free")
+
+    hit = cache.lookup("koi offer chal raha hai", "customer")
+    assert hit.category == "product" and hit.response == "Buy 10 get 2 free"
+    assert cache.lookup("koi offer chal raha hai", "admin") is None
+    assert cache.lookup("milk ka rate kya hai", "customer") is None
+
+
+def test_user_specific_categories_are_never_cached():
+    cache = _cache()
+    for category in ("order", "wallet", "subscription"):
+        assert not cache.store("where is my order", "customer", category, "Order #1 delivered")
+    assert cache.stats()["entries"] == 0
+
+
+def test_identical_questions_reuse_the_embedding():
+    cache = _cache()
+    cache.store("milk ka rate kya hai", "customer", "product", "₹26")
+    cache.lookup("Milk ka rate kya hai?", "customer")
+    assert cache._embedder.calls == 1
+
+
+def test_ttl_and_lru_eviction():
+    cache = _cache(max_entries=2)
+    cache.store("koi offer chal raha hai", "customer", "product", "offers")
+    cache.store("milk ka rate kya hai", "customer", "product", "rates")
+    cache.lookup("koi offer chal raha hai", "customer")        # refresh → most recent
+    cache.store("refund policy kya hai", "customer", "general", "7 days")
+
+    assert cache.lookup("milk ka rate kya hai", "customer") is None
+    assert cache.lookup("koi offer chal raha hai", "customer") is not None
+
+    with patch("core.response_cache.time.time", return_value=10 ** 12):
+        assert cache.lookup("refund policy kya hai", "customer") is None
+
+
+def test_invalidate_by_data_source():
+    cache = _cache()
+    cache.store("koi offer chal raha hai", "customer", "product", "offers")
+    cache.store("refund policy kya hai", "customer", "general", "7 days")
+
+    assert cache.invalidate("offer") == 1
+    assert cache.lookup("koi offer chal raha hai", "customer") is None
+    assert cache.lookup("refund policy kya hai", "customer") is not None
+    assert cache.stats()["versions"]["offer"] == 1
+    with pytest.raises(ValueError):
+        cache.invalidate("orders")
+
+
+def test_only_context_free_messages_are_cacheable():
+    assert is_cacheable("what's its price?", None)                          # new thread
+    assert is_cacheable("Koi offer chal raha hai aaj kal sab products par?", "product")
+    assert not is_cacheable("what's its price?", "product")                 # follow-up in context
+    assert not is_cacheable("and ghee?", "general")
+    assert not is_cacheable("Koi offer chal raha hai aaj kal sab products par?", "order")
+    assert not is_cacheable("Koi offer chal raha hai aaj kal sab products par?", "unknown")
+    assert not is_cacheable("I will file a complaint about the offer", None)
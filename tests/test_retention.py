@@ -0,0 +1,98 @@
+import time
+from unittest.mock import patch
+from typing import TypedDict
+from langgraph.graph import StateGraph, START, END
+
+from core.checkpointer import PooledSqliteSaver
+from core.retention import CheckpointRetention, checkpoint_age_s
+
+
+class TicketState(TypedDict, total=False):
+    count: int
+    needs_escalation: bool
+
+
+def _graph(saver):
+    workflow = StateGraph(TicketState)
+    workflow.add_node("inc", lambda s: {"count": s.get("count", 0) + 1})
+    workflow.add_edge(START, "inc")
+    workflow.add_edge("inc", END)
+    return workflow.compile(checkpointer=saver)
+
+
+def _setup(tmp_path, turns=6, threads=("a", "b")):
+    saver = PooledSqliteSaver(str(tmp_path / "cp.db"))
+    graph = _graph(saver)
+    for thread_id in threads:
+        for _ in range(turns):
+            graph.invoke({}, {"configurable": {"thread_id": thread_id}})
+    return saver, graph
+
+
+def test_compact_keeps_latest_checkpoints_per_thread(tmp_path):
+    saver, graph = _setup(tmp_path)
+    retention = CheckpointRetention(saver)
+    before = retention.stats()
+
+    report = retention.compact(keep_last=2)
+    after = retention.stats()
+
+    assert report["checkpoints_deleted"] == before["checkpoints"] - 4
+    assert after["checkpoints"] == 4 and after["threads"] == 2
+    # Latest state is untouched and the thread keeps working
+    assert graph.get_state({"configurable": {"thread_id": "a"}}).values["count"] == 6
+    graph.invoke({}, {"configurable": {"thread_id": "a"}})
+    assert graph.get_state({"configurable": {"thread_id": "a"}}).values["count"] == 7
+
+
+def test_expire_idle_drops_old_threads_but_keeps_escalated_ones(tmp_path):
+    saver, graph = _setup(tmp_path, turns=1, threads=("idle", "paused"))
+    graph.invoke({"needs_escalation": True}, {"configurable": {"thread_id": "paused"}})
+    retention = CheckpointRetention(saver)
+
+    with patch("core.retention.time.time", return_value=time.time() + 10 * 3600):
+        report = retention.expire_idle(ttl_hours=1)
+
+    assert report == {"threads_expired": 1}
+    assert graph.get_state({"configurable": {"thread_id": "idle"}}).values == {}
+    assert graph.get_state({"configurable": {"thread_id": "paused"}}).values["needs_escalation"] is True
+
+
+def test_vacuum_and_stats(tmp_path):
+    saver, _ = _setup(tmp_path)
+    retention = CheckpointRetention(saver)
+    retention.compact(keep_last=1)
+    retention.vacuum()
+
+    stats = retention.stats()
+    assert stats["backend"] == "sqlite"
+    assert stats["db_bytes"] > 0
+    assert stats["free_bytes"] == 0
+
+
+def test_checkpoint_age_is_decoded_from_uuid6():
+    from langgraph.checkpoint.base import empty_checkpoint
+
+    assert 0 <= checkpoint_age_s(empty_checkpoint()["id"]) < 5
+
+
+def test_compact_drops_finished_subgraph_namespaces(tmp_path):
+    saver = PooledSqliteSaver(str(tmp_path / "cp.db"))
+    inner = StateGraph(TicketState)
+    inner.add_node("step", lambda s: {"count": s.get("count", 0) + 1})
+    inner.add_edge(START, "step")
+    inner.add_edge("step", END)
+    outer = StateGraph(TicketState)
+    outer.add_node("agent", inner.compile())
+    outer.add_edge(START, "agent")
+    outer.add_edge("agent", END)
+    graph = outer.compile(checkpointer=saver)
+    for _ in range(3):
+        graph.invoke({}, {"configurable": {"thread_id": "t"}})
+
+    retention = CheckpointRetention(saver)
+    retention.compact(keep_last=10)
+
+    namespaces = retention._fetchall("SELECT DISTINCT checkpoint_ns FROM checkpoints")
+    assert namespaces == [("",)]
+    assert graph.get_state({"configurable": {"thread_id": "t"}}).values["count"] == 3
@@ -0,0 +1,35 @@
+import asyncio
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.messages import HumanMessage
+from langchain_core.runnables.config import var_child_runnable_config
+
+with patch("core.llm_setup.get_llm", return_value=MagicMock()):
+    from agents import router                      # builds its module-level node on import
+from agents.router import TicketClassification
+
+
+def test_shadow_comparison_runs_outside_the_graph_callbacks():
+    seen = []
+
+    async def classify(messages):
+        seen.append(var_child_runnable_config.get())
+        return TicketClassification(category="product")
+
+    llm = MagicMock()
+    llm.with_structured_output.return_value.ainvoke = AsyncMock(side_effect=classify)
+    with patch.object(router, "get_llm", return_value=llm):
+        node = router.create_router_agent("llm")
+
+    async def run():
+        update = await node.ainvoke(
+            {"messages": [HumanMessage(content="any offers?")]}, {"callbacks": [BaseCallbackHandler()]})
+        for _ in range(5):                           # let the shadow task finish
+            await asyncio.sleep(0)
+        return update
+
+    with patch.object(router.settings, "ROUTER_FAST_PATH_SHADOW_RATE", 1.0):
+        update = asyncio.run(run())
+    assert update["ticket_category"] == "product"
+    assert seen == [None]                            # no run config (or callbacks) inherited
@@ -0,0 +1,74 @@
+import pytest
+
+from agents.router_rules import classify, is_follow_up
+
+
+# The HINGLISH ROUTING GUIDE / distinctions from the router system prompt
+@pytest.mark.parametrize("message, category", [
+    ("Aaj kitna sale hua", "order"),
+    ("Mera order kab aayega", "order"),
+    ("Approved orders dikhao", "order"),
+    ("Is mahine ka revenue", "order"),
+    ("Delivered orders", "order"),
+    ("Mere subscription ka status", "subscription"),
+    ("Chhutti mark karo", "subscription"),
+    ("Vacation cancel karo", "subscription"),
+    ("Kal delivery mat karo", "subscription"),
+    ("I won’t be home tomorrow", "subscription"),
+    ("I won't be available tomorrow", "subscription"),
+    ("Skip milk delivery on 10th March", "subscription"),
+    ("Mera wallet balance", "wallet"),
+    ("Kya kya milta hai?", "product"),
+    ("Milk ka rate kya hai?", "product"),
+    ("Paneer available hai?", "product"),
+    ("Koi offer chal raha hai?", "product"),
+    ("Daily delivery ke liye kya le sakte hain?", "product"),
+    ("Featured products dikhao", "product"),
+    ("Which products can I subscribe to?", "product"),
+    ("hi", "general"),
+    ("Thank you!", "general"),
+])
+def test_clear_cut_messages_take_the_fast_path(message, category):
+    route = classify(message)
+    assert route.confident
+    assert route.category == category
+    assert route.needs_escalation is False
+
+
+@pytest.mark.parametrize("message", [
+    "How much milk was sold today at the price of 26?",   # order + product
+    "Subscription orders this week",                        # order + subscription
+    "Can you help me with something?",                      # no keywords
+    "",
+])
+def test_ambiguous_or_unknown_messages_fall_back_to_the_llm(message):
+    assert classify(message).confident is False
+
+
+# Generic words alone must not make a confident (LLM-skipping) wrong guess
+@pytest.mark.parametrize("message, wrong", [
+    ("I won't be available tomorrow", "product"),
+    ("my payment failed", "order"),
+    ("my milk was not delivered today", "order"),
+    ("My leave got approved, cancel nothing", "order"),
+])
+def test_generic_words_do_not_misroute_confidently(message, wrong):
+    route = classify(message)
+    assert not (route.confident and route.category == wrong)
+
+
+def test_escalation_words_are_confident_even_when_ambiguous():
+    route = classify("My order was cancelled and the price was wrong, I will file a consumer court complaint")
+    assert route.confident and route.needs_escalation
+
+
+@pytest.mark.parametrize("message, expected", [
+    ("and yesterday?", True),
+    ("show the items", True),
+    ("Aur kal ka?", True),
+    ("What about the orders that were delivered to my building last week?", True),
+    ("I would like to know the price of toned milk in a 1 litre pouch", False),
+    ("", False),
+])
+def test_is_follow_up(message, expected):
+    assert is_follow_up(message, max_words=6) is expected
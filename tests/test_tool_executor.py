@@ -0,0 +1,146 @@
+import asyncio
+import threading
+import time
+from datetime import date, datetime, timedelta
+from unittest.mock import MagicMock, patch
+
+from langchain_core.messages import AIMessage
+from langchain_core.tools import tool
+from langgraph.graph import END, START, MessagesState, StateGraph
+
+from core import query
+from core.tool_executor import TOOL_BATCHED_CALLS, BatchingToolNode
+from tools import subscription_tools
+
+
+@tool
+def mark(user_id: int, day: str) -> str:
+    """Mark one day."""
+    return f"single {day}"
+
+
+def _graph(node):
+    graph = StateGraph(MessagesState)
+    graph.add_node("tools", node)
+    graph.add_edge(START, "tools")
+    graph.add_edge("tools", END)
+    return graph.compile()
+
+
+def _call(name, args, call_id):
+    return {"name": name, "args": args, "id": call_id}
+
+
+def _results(app, calls, run_async=False):
+    state = {"messages": [AIMessage(content="", tool_calls=calls)]}
+    out = asyncio.run(app.ainvoke(state)) if run_async else app.invoke(state)
+    return [(m.tool_call_id, m.content) for m in out["messages"][1:]]
+
+
+def test_same_tool_calls_run_as_one_batch_in_call_order():
+    @tool
+    def lookup(q: str) -> str:
+        """Look something up."""
+        return f"found {q}"
+
+    batches = []
+
+    def batch(calls):
+        batches.append(calls)
+        return [f"batch {c['day']}" for c in calls]
+
+    app = _graph(BatchingToolNode([mark, lookup], batched={"mark": batch}))
+    calls = [_call("mark", {"user_id": "7", "day": "a"}, "1"), _call("lookup", {"q": "x"}, "2"),
+             _call("mark", {"user_id": 7, "day": "b"}, "3")]
+    before = TOOL_BATCHED_CALLS.value(tool="mark")
+    for run_async in (False, True):
+        assert _results(app, calls, run_async) == [("1", "batch a"), ("2", "found x"), ("3", "batch b")]
+    assert batches == [[{"user_id": 7, "day": "a"}, {"user_id": 7, "day": "b"}]] * 2   # args validated
+    assert TOOL_BATCHED_CALLS.value(tool="mark") == before + 4
+
+
+def test_single_or_invalid_calls_skip_the_batch():
+    batch = MagicMock()
+    app = _graph(BatchingToolNode([mark], batched={"mark": batch}))
+    assert _results(app, [_call("mark", {"user_id": 7, "day": "a"}, "1")]) == [("1", "single a")]
+    results = _results(app, [_call("mark", {"user_id": 7, "day": "a"}, "1"),
+                             _call("mark", {"user_id": "seven", "day": "b"}, "2")])
+    assert results[0] == ("1", "single a") and "user_id" in results[1][1]
+    batch.assert_not_called()
+
+
+def test_concurrency_is_bounded():
+    lock, running, peak = threading.Lock(), [0], [0]
+
+    @tool
+    def slow(i: int) -> str:
+        """Slow lookup."""
+        with lock:
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+        time.sleep(0.05)
+        with lock:
+            running[0] -= 1
+        return str(i)
+
+    app = _graph(BatchingToolNode([slow], max_concurrency=2))
+    calls = [_call("slow", {"i": i}, str(i)) for i in range(6)]
+    for run_async in (False, True):
+        peak[0] = 0
+        assert [c for _, c in _results(app, calls, run_async)] == [str(i) for i in range(6)]
+        assert peak[0] == 2
+
+
+def _db(existing_rows):
+    cursor = MagicMock()
+    user = {"first_name": "Asha", "last_name": "K", "store_name": None}
+
+    def execute(sql, params):
+        cursor.fetchall.return_value = [user] if "sp_users" in sql else existing_rows
+
+    cursor.execute.side_effect = execute
+    conn = MagicMock()
+    conn.cursor.return_value = cursor
+    return conn, cursor
+
+
+def test_vacation_batch_uses_one_connection_and_fixed_statements():
+    days = [(date.today() + timedelta(days=i)).isoformat() for i in range(1, 5)]
+    past = (date.today() - timedelta(days=1)).isoformat()
+    conn, cursor = _db([{"id": 11, "status": 1, "vacation_date": date.fromisoformat(days[0])},
+                        {"id": 12, "status": 0, "vacation_date": datetime.fromisoformat(days[1])}])
+    batch = subscription_tools.BATCHED_SUBSCRIPTION_TOOLS["add_vacation_date"]
+    with patch.object(query, "get_db_connection", return_value=conn) as connect:
+        results = batch([{"user_id": 7, "vacation_date": d} for d in days + [past, "10-03-2026"]])
+    connect.assert_called_once()
+    assert cursor.execute.call_count == 3                   # user, existing rows, reactivate
+    assert cursor.executemany.call_count == 1
+    assert [row[2] for row in cursor.executemany.call_args[0][1]] == days[2:]
+    conn.start_transaction.assert_called_once()             # reactivate + insert land together
+    conn.commit.assert_called_once()
+    assert "already marked" in results[0] and "re-activated" in results[1]
+    assert all("successfully marked" in r for r in results[2:4])
+    assert "past date" in results[4] and "Invalid date format" in results[5]
+
+
+def test_single_cancel_matches_the_batch_messages():
+    day = (date.today() + timedelta(days=3)).isoformat()
+    conn, cursor = _db([{"id": 5, "status": 1, "vacation_date": date.fromisoformat(day)}])
+    with patch.object(query, "get_db_connection", return_value=conn):
+        result = subscription_tools.cancel_vacation_date.invoke({"user_id": 7, "vacation_date": day})
+    assert result == (f"Vacation on {day} has been cancelled. "
+                      "Your milk delivery will resume on this date.")
+    assert cursor.execute.call_args[0][1] == (5,)
+
+
+def test_vacation_writes_roll_back_together():
+    days = [(date.today() + timedelta(days=i)).isoformat() for i in (3, 4)]
+    conn, cursor = _db([{"id": 5, "status": 0, "vacation_date": days[0]}])
+    cursor.executemany.side_effect = RuntimeError("insert failed")
+    batch = subscription_tools.BATCHED_SUBSCRIPTION_TOOLS["add_vacation_date"]
+    with patch.object(query, "get_db_connection", return_value=conn):
+        results = batch([{"user_id": 7, "vacation_date": d} for d in days])
+    assert cursor.execute.call_count == 3                   # the reactivate UPDATE ran…
+    conn.rollback.assert_called_once()                      # …and is undone with the failed insert
+    conn.commit.assert_not_called()
+    assert all(r.startswith("Error marking vacation") for r in results)
@@ -0,0 +1,108 @@
+import asyncio
+from unittest.mock import patch
+from typing import TypedDict
+from langgraph.graph import StateGraph, START, END
+
+from core.checkpointer import PooledSqliteSaver
+from core.turn import TurnResult, arecent_category, arun_turn, arecord_turn, ais_paused, astream_turn
+
+
+class TicketState(TypedDict, total=False):
+    count: int
+    needs_escalation: bool
+    ticket_category: str
+
+
+def _graph(saver):
+    workflow = StateGraph(TicketState)
+    workflow.add_node("router", lambda s: {"count": s.get("count", 0) + 1, "ticket_category": "order"})
+    workflow.add_node("human_escalation", lambda s: {"needs_escalation": False})
+    workflow.add_conditional_edges(
+        "router",
+        lambda s: "human_escalation" if s.get("needs_escalation") else END,
+        {"human_escalation": "human_escalation", END: END},
+    )
+    workflow.add_edge(START, "router")
+    workflow.add_edge("human_escalation", END)
+    return workflow.compile(checkpointer=saver, interrupt_before=["human_escalation"])
+
+
+def _config(thread_id):
+    return {"configurable": {"thread_id": thread_id}}
+
+
+def test_arun_turn_reports_interrupt_without_get_state(tmp_path):
+    graph = _graph(PooledSqliteSaver(str(tmp_path / "cp.db")))
+
+    async def run():
+        with patch.object(type(graph), "aget_state", side_effect=AssertionError("get_state called")):
+            done = await arun_turn(graph, {}, _config("a"))
+            paused = await arun_turn(graph, {"needs_escalation": True}, _config("b"))
+        return done, paused
+
+    done, paused = asyncio.run(run())
+    assert (done.status, done.category, done.values["count"]) == ("active", "order", 1)
+    assert paused.status == "paused" and paused.values["needs_escalation"] is True
+    assert graph.get_state(_config("b")).next == ("human_escalation",)
+
+
+def test_ais_paused_reads_status_row(tmp_path):
+    saver = PooledSqliteSaver(str(tmp_path / "cp.db"))
+    graph = _graph(saver)
+
+    async def run():
+        turn = await arun_turn(graph, {"needs_escalation": True}, _config("t"))
+        await arecord_turn(graph, "t", turn.status, turn.category)
+        with patch.object(type(graph), "aget_state", side_effect=AssertionError("get_state called")):
+            return await ais_paused(graph, "t")
+
+    assert asyncio.run(run()) is True
+    assert saver.get_thread_status("t")["category"] == "order"
+
+
+def test_ais_paused_falls_back_and_backfills_status(tmp_path):
+    saver = PooledSqliteSaver(str(tmp_path / "cp.db"))
+    graph = _graph(saver)
+    graph.invoke({"needs_escalation": True}, _config("legacy"))
+
+    assert asyncio.run(ais_paused(graph, "new")) is False
+    assert saver.get_thread_status("new") is None
+    assert asyncio.run(ais_paused(graph, "legacy")) is True
+    assert saver.get_thread_status("legacy")["status"] == "paused"
+
+
+def test_delete_thread_drops_status_row(tmp_path):
+    saver = PooledSqliteSaver(str(tmp_path / "cp.db"))
+    saver.put_thread_status("gone", "active", "general")
+    saver.delete_thread("gone")
+    assert saver.get_thread_status("gone") is None
+
+
+def test_arecent_category_only_within_the_window(tmp_path):
+    graph = _graph(PooledSqliteSaver(str(tmp_path / "cp.db")))
+
+    async def run():
+        fresh = await arecent_category(graph, "r", 600)
+        await arecord_turn(graph, "r", "active", "order")
+        return fresh, await arecent_category(graph, "r", 600), await arecent_category(graph, "r", -1)
+
+    assert asyncio.run(run()) == (None, "order", None)
+
+
+def test_astream_turn_records_the_pause_before_the_stream_is_consumed(tmp_path):
+    saver = PooledSqliteSaver(str(tmp_path / "cp.db"))
+    graph = _graph(saver)
+
+    async def run():
+        await arecord_turn(graph, "s", "active", "order")     # earlier turn
+        turn = TurnResult()
+        events = astream_turn(graph, {"needs_escalation": True}, _config("s"), turn)
+        async for ev in events:
+            if turn.interrupted:
+                break                                # client disconnects right after the pause
+        await events.aclose()
+        return turn, await ais_paused(graph, "s")
+
+    turn, paused = asyncio.run(run())
+    assert turn.interrupted and paused
+    assert saver.get_thread_status("s")["category"] == "order"
@@ -0,0 +1,73 @@
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from core import db
+
+
+USERS = {1: {"id": 1, "first_name": "Admin", "user_type": db.USER_TYPE_ADMIN},
+         2: {"id": 2, "first_name": "Asha", "user_type": db.USER_TYPE_CUSTOMER}}
+
+
+@pytest.fixture
+def fake_db(monkeypatch):
+    """sp_users served from USERS; returns the list of executed id tuples."""
+    monkeypatch.setattr(db, "_user_cache", db._UserCache(ttl_s=60, max_entries=3))
+    queries = []
+
+    def connection():
+        cursor = MagicMock()
+
+        def execute(sql, params):
+            queries.append(params)
+            cursor.fetchall.return_value = [dict(USERS[i]) for i in params if i in USERS]
+
+        cursor.execute.side_effect = execute
+        conn = MagicMock()
+        conn.cursor.return_value = cursor
+        return conn
+
+    with patch.object(db, "get_db_connection", side_effect=connection):
+        yield queries
+
+
+def test_role_and_profile_share_one_cached_lookup(fake_db):
+    assert db.get_user_role(1) == "admin"
+    assert db.get_user_info(1)["first_name"] == "Admin"
+    assert db.get_user_role(99) == "customer" and db.get_user_info(99) is None
+    assert db.get_user_role(99) == "customer"                 # unknown users are cached too
+    assert fake_db == [(1,), (99,)]
+
+
+def test_entries_expire_and_can_be_invalidated(fake_db, monkeypatch):
+    assert db.get_user_role(1) == "admin"
+    USERS[1]["user_type"] = db.USER_TYPE_CUSTOMER             # demoted
+    try:
+        assert db.get_user_role(1) == "admin"                 # still cached
+        assert db.invalidate_user(1) == 1
+        assert db.get_user_role(1) == "customer"
+        monkeypatch.setattr(db._user_cache, "ttl_s", 0)
+        db.invalidate_user()
+        db.get_user_role(2)
+        db.get_user_role(2)
+        assert fake_db[-2:] == [(2,), (2,)]                   # expired → looked up again
+    finally:
+        USERS[1]["user_type"] = db.USER_TYPE_ADMIN
+
+
+def test_failed_lookups_are_not_cached(fake_db):
+    with patch.object(db, "get_db_connection", return_value=None):
+        assert db.get_user_role(1) == "customer"              # fail-safe
+    assert db.get_user_role(1) == "admin"
+    assert db.user_cache_stats()["errors"] == 1
+
+
+def test_bulk_warm_up_and_lru_bound(fake_db):
+    assert db.warm_user_cache([1, 2, 1, 7]) == 3
+    assert fake_db == [(1, 2, 7)]
+    assert db.get_user_role(2) == "customer" and db.get_user_info(7) is None
+    assert db.warm_user_cache([1, 2]) == 0 and len(fake_db) == 1
+    db.warm_user_cache([8])                                   # max_entries=3 → LRU entry (1) evicted
+    assert db.user_cache_stats()["evictions"] == 1
+    db.get_user_role(1)
+    assert fake_db[-1] == (1,)
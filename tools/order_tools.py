@@ -20,8 +20,10 @@ STATUS CODES: 3=Approved | 4=Delivered | 5=Cancelled | 6=Failed
 """
 
 from langchain_core.tools import tool
-from core.db import get_db_connection, get_user_role
-from datetime import date
+from core.db import get_user_role
+from core.query import DatabaseUnavailable, fetch_all
+from datetime import date, datetime, timedelta
+from typing import List, Tuple
 
 
 # ---------------------------------------------------------------------------
@@ -69,20 +71,43 @@ def _serialize(rows, array_name="data"):
     return rows
 
 
-def _run_query(query: str, params: tuple):
-    conn = get_db_connection()
-    if not conn:
-        return "Database connection failed."
-    cursor = conn.cursor(dictionary=True)
+def _run_query(name: str, query: str, params: tuple, prepared: bool = False):
+    """Run a read through core.query and return TOON-serialized results."""
     try:
-        cursor.execute(query, params)
-        rows = cursor.fetchall()
-        return _serialize(rows)
+        return _serialize(fetch_all(name, query, params, prepared=prepared))
+    except DatabaseUnavailable as e:
+        return str(e)
     except Exception as e:
         return f"Query error: {e}"
-    finally:
-        cursor.close()
-        conn.close()
+
+
+def _day(value: str) -> date:
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").date()
+    except ValueError:
+        raise ValueError(f"Invalid date '{value}'. Please use YYYY-MM-DD (e.g., '2026-03-10').") from None
+
+
+def _date_filter(column: str = "order_date", use_today: bool = False, on: str = "",
+                 start: str = "", end: str = "") -> Tuple[List[str], list]:
+    """
+    Date conditions on a DATETIME column as half-open ranges, e.g. one day:
+        order_date >= '2026-03-01' AND order_date < '2026-03-02'
+    Unlike DATE(order_date) = …, these let MySQL range-scan an index on the
+    column instead of evaluating DATE() on every row. Precedence:
+    use_today → on → start / end (either may be empty). Returns
+    (conditions, params); ValueError for a date that isn't YYYY-MM-DD.
+    """
+    if use_today:
+        return [f"{column} >= CURDATE()", f"{column} < CURDATE() + INTERVAL 1 DAY"], []
+    if on != "":
+        start = end = on
+    conditions, params = [], []
+    if start != "":
+        conditions.append(f"{column} >= %s"); params.append(_day(start).isoformat())
+    if end != "":
+        conditions.append(f"{column} < %s"); params.append((_day(end) + timedelta(days=1)).isoformat())
+    return conditions, params
 
 
 def _resolve(session_user_id: int, target_user_id: int = 0):
@@ -110,7 +135,7 @@ def get_orders_filtered(
     # 0=Any, 3=Approved | 4=Delivered | 5=Cancelled | 6=Failed
 
     # ── Date ────────────────────────────────────────────────────────────────
-    use_today: bool = False,          # True → DATE(order_date) = CURDATE()
+    use_today: bool = False,          # True → today (MySQL server date)
     order_date: str = "",             # exact date YYYY-MM-DD
     start_date: str = "",             # range start YYYY-MM-DD
     end_date:   str = "",             # range end   YYYY-MM-DD
@@ -176,20 +201,13 @@ def get_orders_filtered(
         params.append(status_code)
 
     # ── date ──────────────────────────
-    if use_today:
-        conditions.append("DATE(order_date) = CURDATE()")
-    elif order_date != "":
-        conditions.append("DATE(order_date) = %s")
-        params.append(order_date)
-    elif start_date != "" and end_date != "":
-        conditions.append("DATE(order_date) BETWEEN %s AND %s")
-        params += [start_date, end_date]
-    elif start_date != "":
-        conditions.append("DATE(order_date) >= %s")
-        params.append(start_date)
-    elif end_date != "":
-        conditions.append("DATE(order_date) <= %s")
-        params.append(end_date)
+    try:
+        date_conds, date_params = _date_filter(
+            use_today=use_today, on=order_date, start=start_date, end=end_date)
+    except ValueError as e:
+        return str(e)
+    conditions += date_conds
+    params += date_params
 
     # ── order code ────────────────────
     if order_code != "":
@@ -246,7 +264,7 @@ def get_orders_filtered(
         ORDER BY id DESC
         LIMIT %s
     """
-    rows = _run_query(query, tuple(params))
+    rows = _run_query("orders_filtered", query, tuple(params))
     return rows if rows else "No orders found matching the given filters."
 
 
@@ -279,7 +297,7 @@ def get_order_details(
         where = f"({where}) AND user_id = %s"
         params.append(session_user_id)
 
-    rows = _run_query(f"SELECT * FROM sp_secondary_orders WHERE {where}", tuple(params))
+    rows = _run_query("order_details", f"SELECT * FROM sp_secondary_orders WHERE {where}", tuple(params))
     return rows if rows else "Order not found."
 
 
@@ -318,7 +336,7 @@ def get_order_items(
         LEFT JOIN sp_secondary_order_details d ON o.id = d.order_id
         WHERE {base}
     """
-    rows = _run_query(query, tuple(params))
+    rows = _run_query("order_items", query, tuple(params))
     return rows if rows else "No items found for this order."
 
 
@@ -345,7 +363,7 @@ def get_outstanding_amount(
         LEFT JOIN sp_basic_details b ON u.id = b.user_id
         WHERE u.id = %s
     """
-    rows = _run_query(query, (lookup_id,))
+    rows = _run_query("outstanding_amount", query, (lookup_id,), prepared=True)
     return rows if rows else f"No financial info found for user_id={lookup_id}."
 
 
@@ -386,7 +404,7 @@ def get_subscription_orders(
                status, delivery_instruction, custom_days
         FROM sp_subscriptions WHERE {where} ORDER BY id DESC
     """
-    rows = _run_query(query, tuple(params))
+    rows = _run_query("subscription_orders", query, tuple(params))
     return rows if rows else "No subscriptions found."
 
 
@@ -421,7 +439,7 @@ def get_cancelled_order_reason(
                cancelled_by, cancelled_date, updated_by, updated_date
         FROM sp_secondary_orders WHERE ({base}) AND order_status = 5
     """
-    rows = _run_query(query, tuple(params))
+    rows = _run_query("cancelled_order_reason", query, tuple(params))
     return rows if rows else "Order not found or is not cancelled."
 
 
@@ -445,8 +463,12 @@ def get_daily_sales_summary(
         return "Access denied: daily sales summary requires admin access (user_type=1)."
 
     d = summary_date if summary_date != "" else str(date.today())
+    try:
+        day_conds, day_params = _date_filter("o.order_date", on=d)
+    except ValueError as e:
+        return str(e)
 
-    order_summary = _run_query("""
+    order_summary = _run_query("daily_sales_orders", f"""
         SELECT
             COUNT(*) AS total_orders,
             SUM(CASE WHEN order_status = 3 THEN 1 ELSE 0 END) AS approved,
@@ -456,11 +478,11 @@ def get_daily_sales_summary(
             SUM(order_total_amount) AS gross_revenue,
             SUM(CASE WHEN order_status=4 THEN order_total_amount ELSE 0 END) AS delivered_revenue,
             SUM(CASE WHEN order_status=5 THEN order_total_amount ELSE 0 END) AS cancelled_revenue
-        FROM sp_secondary_orders
-        WHERE DATE(order_date) = %s
-    """, (d,))
+        FROM sp_secondary_orders o
+        WHERE {" AND ".join(day_conds)}
+    """, tuple(day_params), prepared=True)
 
-    product_summary = _run_query("""
+    product_summary = _run_query("daily_sales_products", f"""
         SELECT d.product_name, d.product_variant_name,
                SUM(d.quantity) AS total_qty,
                SUM(d.quantity_in_ltr) AS total_liters,
@@ -469,10 +491,10 @@ def get_daily_sales_summary(
                SUM(CASE WHEN d.is_free=1 THEN d.quantity ELSE 0 END) AS free_qty
         FROM sp_secondary_order_details d
         JOIN sp_secondary_orders o ON o.id = d.order_id
-        WHERE DATE(o.order_date) = %s
+        WHERE {" AND ".join(day_conds)}
         GROUP BY d.product_name, d.product_variant_name
         ORDER BY total_amount DESC
-    """, (d,))
+    """, tuple(day_params), prepared=True)
 
     return {
         "date": d,
@@ -510,8 +532,12 @@ def get_top_report(
     date_filter = ""
     params: list = []
     if start_date != "" and end_date != "":
-        date_filter = "AND DATE(o.order_date) BETWEEN %s AND %s"
-        params += [start_date, end_date]
+        try:
+            conds, date_params = _date_filter("o.order_date", start=start_date, end=end_date)
+        except ValueError as e:
+            return str(e)
+        date_filter = "AND " + " AND ".join(conds)
+        params += date_params
 
     if report_type == "customers":
         query = f"""
@@ -524,7 +550,7 @@ def get_top_report(
             ORDER BY total_revenue DESC LIMIT %s
         """
         params.append(limit)
-        return _run_query(query, tuple(params))
+        return _run_query("top_customers", query, tuple(params))
 
     elif report_type == "products":
         query = f"""
@@ -539,7 +565,7 @@ def get_top_report(
             ORDER BY total_qty DESC LIMIT %s
         """
         params.append(limit)
-        return _run_query(query, tuple(params))
+        return _run_query("top_products", query, tuple(params))
 
     elif report_type == "towns":
         query = f"""
@@ -552,7 +578,7 @@ def get_top_report(
             ORDER BY total_revenue DESC LIMIT %s
         """
         params.append(limit)
-        return _run_query(query, tuple(params))
+        return _run_query("top_towns", query, tuple(params))
 
     else:
         return f"Unknown report_type '{report_type}'. Use: 'customers', 'products', or 'towns'."
@@ -608,14 +634,12 @@ def get_sales_summary(
     if uid:
         conditions.append("user_id = %s"); params.append(uid)
 
-    if use_today:
-        conditions.append("DATE(order_date) = CURDATE()")
-    elif start_date != "" and end_date != "":
-        conditions.append("DATE(order_date) BETWEEN %s AND %s"); params += [start_date, end_date]
-    elif start_date != "":
-        conditions.append("DATE(order_date) >= %s"); params.append(start_date)
-    elif end_date != "":
-        conditions.append("DATE(order_date) <= %s"); params.append(end_date)
+    try:
+        date_conds, date_params = _date_filter(use_today=use_today, start=start_date, end=end_date)
+    except ValueError as e:
+        return str(e)
+    conditions += date_conds
+    params += date_params
 
     if status_code > 0:
         conditions.append("order_status = %s"); params.append(status_code)
@@ -671,7 +695,7 @@ def get_sales_summary(
             WHERE {where}
         """
 
-    rows = _run_query(query, tuple(params))
+    rows = _run_query("sales_summary", query, tuple(params))
     return rows if rows else "No data found matching the given filters."
 
 
@@ -23,7 +23,7 @@ Pricing columns in sp_product_variants:
 """
 
 from langchain_core.tools import tool
-from core.db import get_db_connection
+from core.query import DatabaseUnavailable, fetch_all, session
 
 
 # ---------------------------------------------------------------------------
@@ -64,31 +64,14 @@ def _serialize(rows, array_name="data") -> str:
     return rows
 
 
-def _normalize_rows(rows: list) -> list:
-    """Convert date/datetime/Decimal objects to plain strings/floats."""
-    for row in rows:
-        for k, v in row.items():
-            if v is not None and not isinstance(v, (int, float, str, bool)):
-                row[k] = str(v)
-    return rows
-
-
-def _run_read(query: str, params: tuple = ()):
-    """Execute a read-only query and return TOON-serialized results."""
-    conn = get_db_connection()
-    if not conn:
-        return "Database connection failed."
-    cursor = conn.cursor(dictionary=True)
+def _run_read(name: str, query: str, params: tuple = (), prepared: bool = False):
+    """Execute a read-only query through core.query and return TOON-serialized results."""
     try:
-        cursor.execute(query, params)
-        rows = cursor.fetchall()
-        rows = _normalize_rows(rows)
-        return _serialize(rows)
+        return _serialize(fetch_all(name, query, params, prepared=prepared))
+    except DatabaseUnavailable as e:
+        return str(e)
     except Exception as e:
         return f"Query error: {e}"
-    finally:
-        cursor.close()
-        conn.close()
 
 
 # ---------------------------------------------------------------------------
@@ -149,7 +132,7 @@ def get_product_catalog(
         WHERE {where}
         ORDER BY pv.product_name, pv.variant_size
     """
-    result = _run_read(query, tuple(params))
+    result = _run_read("product_catalog", query, tuple(params))
     return result if result else "No products found matching your criteria."
 
 
@@ -201,7 +184,7 @@ def get_product_details(product_name: str) -> str:
         ORDER BY pv.variant_size
     """
     like = f"%{product_name}%"
-    result = _run_read(query, (like, like))
+    result = _run_read("product_details", query, (like, like), prepared=True)
     return result if result else f"No product found matching '{product_name}'."
 
 
@@ -226,58 +209,50 @@ def get_active_offers() -> str:
     - 'Koi discount chal raha hai?'
     - 'What do I get free if I order more?'
     """
-    conn = get_db_connection()
-    if not conn:
-        return "Database connection failed."
-    cursor = conn.cursor(dictionary=True)
     try:
-        # --- Milk offers ---
-        cursor.execute("""
-            SELECT
-                'Milk Offer'          AS offer_type,
-                mom.description,
-                mom.min_qty,
-                mom.max_qty,
-                pv.product_name       AS free_product,
-                pv.variant_name       AS free_variant,
-                mom.offer_quantity    AS free_qty,
-                mom.valid_from,
-                mom.valid_to
-            FROM sp_milk_offer_master mom
-            LEFT JOIN sp_product_variants pv ON mom.offer_variant_id = pv.id
-            WHERE mom.is_active = 1
-        """)
-        milk_rows = cursor.fetchall()
-
-        # --- Special offers ---
-        cursor.execute("""
-            SELECT
-                'Special Offer'       AS offer_type,
-                CONCAT('Min order ₹', som.min_order_amount) AS description,
-                pv.product_name       AS free_product,
-                pv.variant_name       AS free_variant,
-                sofi.free_quantity    AS free_qty,
-                som.valid_from,
-                som.valid_to
-            FROM sp_special_offer_master som
-            JOIN sp_special_offer_free_items sofi ON som.id = sofi.offer_id
-            JOIN sp_product_variants pv           ON sofi.free_variant_id = pv.id
-            WHERE som.is_active = 1
-        """)
-        special_rows = cursor.fetchall()
-
-        all_rows = _normalize_rows(milk_rows + special_rows)
-
-        if not all_rows:
-            return "No active offers at the moment."
-
-        return _serialize(all_rows, "offers")
-
+        with session() as q:
+            # --- Milk offers ---
+            milk_rows = q.fetch_all("milk_offers", """
+                SELECT
+                    'Milk Offer'          AS offer_type,
+                    mom.description,
+                    mom.min_qty,
+                    mom.max_qty,
+                    pv.product_name       AS free_product,
+                    pv.variant_name       AS free_variant,
+                    mom.offer_quantity    AS free_qty,
+                    mom.valid_from,
+                    mom.valid_to
+                FROM sp_milk_offer_master mom
+                LEFT JOIN sp_product_variants pv ON mom.offer_variant_id = pv.id
+                WHERE mom.is_active = 1
+            """, prepared=True)
+
+            # --- Special offers ---
+            special_rows = q.fetch_all("special_offers", """
+                SELECT
+                    'Special Offer'       AS offer_type,
+                    CONCAT('Min order ₹', som.min_order_amount) AS description,
+                    pv.product_name       AS free_product,
+                    pv.variant_name       AS free_variant,
+                    sofi.free_quantity    AS free_qty,
+                    som.valid_from,
+                    som.valid_to
+                FROM sp_special_offer_master som
+                JOIN sp_special_offer_free_items sofi ON som.id = sofi.offer_id
+                JOIN sp_product_variants pv           ON sofi.free_variant_id = pv.id
+                WHERE som.is_active = 1
+            """, prepared=True)
+    except DatabaseUnavailable as e:
+        return str(e)
     except Exception as e:
         return f"Error fetching offers: {e}"
-    finally:
-        cursor.close()
-        conn.close()
+
+    all_rows = milk_rows + special_rows
+    if not all_rows:
+        return "No active offers at the moment."
+
+    return _serialize(all_rows, "offers")
 
 
 # ---------------------------------------------------------------------------
@@ -312,7 +287,7 @@ def get_subscribable_products() -> str:
           AND pv.status = 1
         ORDER BY pv.product_name, pv.variant_size
     """
-    result = _run_read(query, ())
+    result = _run_read("subscribable_products", query, (), prepared=True)
     return result if result else "No subscribable products found."
 
 
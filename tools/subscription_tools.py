@@ -13,14 +13,18 @@ subscription_tools.py — Subscription & Vacation Support Tools
   5. add_vacation_date             — mark a single date as vacation (skips delivery)
   6. cancel_vacation_date          — cancel/remove a vacation date (resumes delivery)
 
+  Tools 5 and 6 also have batch implementations (BATCHED_SUBSCRIPTION_TOOLS):
+  several calls in one AI message share one connection and one statement per step.
+
 Table: sp_customer_vacations — id, customer_name, customer_id, vacation_date, marked_by, status
 Table: sp_subscriptions      — id, user_id, product_name, plan_type, quantity, rate, status, ...
 Table: sp_subscription_logs  — id, subscription_id, user_id, action, message, level, log_time
 """
 
 from langchain_core.tools import tool
-from core.db import get_db_connection
+from core.query import DatabaseUnavailable, fetch_all, session
 from datetime import date, datetime
+from typing import Callable, Dict, List, Optional
 
 
 # ---------------------------------------------------------------------------
@@ -61,13 +65,16 @@ def _serialize(rows, array_name="data") -> str:
     return rows
 
 
-def _normalize_rows(rows: list) -> list:
-    """Convert date/datetime objects to ISO strings so TOON serializer can handle them."""
-    for row in rows:
-        for k, v in row.items():
-            if v is not None and not isinstance(v, (int, float, str, bool)):
-                row[k] = str(v)
-    return rows
+def _read(name: str, query: str, params: tuple, array_name: str, what: str,
+          prepared: bool = False) -> Optional[str]:
+    """TOON rows of a read-only query, an error message, or None when there are no rows."""
+    try:
+        rows = fetch_all(name, query, params, prepared=prepared)
+    except DatabaseUnavailable as e:
+        return str(e)
+    except Exception as e:
+        return f"Error fetching {what}: {e}"
+    return _serialize(rows, array_name) if rows else None
 
 
 # ---------------------------------------------------------------------------
@@ -83,31 +90,18 @@ def check_active_subscriptions(user_id: int) -> str:
     delivery instructions. Use this to answer 'What is my current subscription?'
     or 'Is my subscription active?'
     """
-    conn = get_db_connection()
-    if not conn:
-        return "Database connection failed."
-    cursor = conn.cursor(dictionary=True)
-    try:
-        query = """
-            SELECT
-                id, product_name, product_variant_name, plan_type, plan_days,
-                quantity, rate, total_amount,
-                start_date, end_date, custom_days,
-                locality_name, delivery_instruction, status
-            FROM sp_subscriptions
-            WHERE user_id = %s AND status = 1
-        """
-        cursor.execute(query, (user_id,))
-        rows = cursor.fetchall()
-        rows = _normalize_rows(rows)
-        result = _serialize(rows, "subscriptions")
-    except Exception as e:
-        result = f"Error fetching subscriptions: {e}"
-    finally:
-        cursor.close()
-        conn.close()
-
-    return result if (result and rows) else f"No active subscriptions found for user_id={user_id}."
+    query = """
+        SELECT
+            id, product_name, product_variant_name, plan_type, plan_days,
+            quantity, rate, total_amount,
+            start_date, end_date, custom_days,
+            locality_name, delivery_instruction, status
+        FROM sp_subscriptions
+        WHERE user_id = %s AND status = 1
+    """
+    result = _read("active_subscriptions", query, (user_id,), "subscriptions", "subscriptions",
+                   prepared=True)
+    return result or f"No active subscriptions found for user_id={user_id}."
 
 
 # ---------------------------------------------------------------------------
@@ -126,29 +120,16 @@ def check_subscription_logs(user_id: int) -> str:
 
     Returns the last 10 log entries with action, message, and timestamp.
     """
-    conn = get_db_connection()
-    if not conn:
-        return "Database connection failed."
-    cursor = conn.cursor(dictionary=True)
-    try:
-        query = """
-            SELECT id, subscription_id, action, message, level, log_time
-            FROM sp_subscription_logs
-            WHERE user_id = %s
-            ORDER BY id DESC
-            LIMIT 10
-        """
-        cursor.execute(query, (user_id,))
-        rows = cursor.fetchall()
-        rows = _normalize_rows(rows)
-        result = _serialize(rows, "subscription_logs")
-    except Exception as e:
-        result = f"Error fetching subscription logs: {e}"
-    finally:
-        cursor.close()
-        conn.close()
-
-    return result if (result and rows) else f"No recent subscription logs found for user_id={user_id}."
+    query = """
+        SELECT id, subscription_id, action, message, level, log_time
+        FROM sp_subscription_logs
+        WHERE user_id = %s
+        ORDER BY id DESC
+        LIMIT 10
+    """
+    result = _read("subscription_logs", query, (user_id,), "subscription_logs", "subscription logs",
+                   prepared=True)
+    return result or f"No recent subscription logs found for user_id={user_id}."
 
 
 # ---------------------------------------------------------------------------
@@ -183,22 +164,8 @@ def get_vacation_dates(user_id: int, month: int = None, year: int = None) -> str
         WHERE {' AND '.join(where)}
         ORDER BY vacation_date ASC
     """
-    conn = get_db_connection()
-    if not conn:
-        return "Database connection failed."
-    cursor = conn.cursor(dictionary=True)
-    try:
-        cursor.execute(query, tuple(params))
-        rows = cursor.fetchall()
-        rows = _normalize_rows(rows)
-        result = _serialize(rows, "vacations")
-    except Exception as e:
-        result = f"Error fetching vacation dates: {e}"
-    finally:
-        cursor.close()
-        conn.close()
-
-    return result if (result and rows) else f"No vacation dates found for user_id={user_id}."
+    result = _read("vacation_dates", query, tuple(params), "vacations", "vacation dates")
+    return result or f"No vacation dates found for user_id={user_id}."
 
 
 # ---------------------------------------------------------------------------
@@ -215,28 +182,198 @@ def get_upcoming_vacations(user_id: int) -> str:
     - 'Will milk be delivered next week?' (check if any vacation overlaps)
     """
     today = date.today().isoformat()
-    conn = get_db_connection()
-    if not conn:
-        return "Database connection failed."
-    cursor = conn.cursor(dictionary=True)
+    query = """
+        SELECT id, vacation_date, created_at
+        FROM sp_customer_vacations
+        WHERE customer_id = %s AND status = 1 AND vacation_date >= %s
+        ORDER BY vacation_date ASC
+    """
+    result = _read("upcoming_vacations", query, (user_id, today), "upcoming_vacations",
+                   "upcoming vacations", prepared=True)
+    return result or f"No upcoming vacations found for user_id={user_id}."
+
+# ---------------------------------------------------------------------------
+# Vacation writes — one connection and a fixed number of statements per
+# batch of dates, whatever its size. The tools below pass a single date; the
+# agents' tool node (core/tool_executor.py) passes every date of one AI
+# message through BATCHED_SUBSCRIPTION_TOOLS.
+# ---------------------------------------------------------------------------
+
+def _invalid_date(vacation_date: str) -> str:
+    return (
+        f"Invalid date format '{vacation_date}'. "
+        "Please provide the date in YYYY-MM-DD format (e.g., '2026-03-10')."
+    )
+
+
+def _parse_dates(vacation_dates: List[str], messages: Dict[str, str],
+                 allow_past: bool = True) -> Dict[str, str]:
+    """{input date: ISO date} for the valid dates; errors go into *messages*."""
+    valid = {}
+    for vacation_date in vacation_dates:
+        try:
+            vac_date = datetime.strptime(vacation_date, "%Y-%m-%d").date()
+        except ValueError:
+            messages[vacation_date] = _invalid_date(vacation_date)
+            continue
+        if not allow_past and vac_date < date.today():
+            messages[vacation_date] = (
+                f"Cannot mark vacation for a past date ({vacation_date}). "
+                "Please provide today's date or a future date."
+            )
+            continue
+        valid[vacation_date] = vac_date.isoformat()
+    return valid
+
+
+def _existing_vacations(q, user_id: int, iso_dates: List[str]) -> Dict[str, dict]:
+    """{ISO date: {id, status}} of the customer's vacation rows for *iso_dates*.
+
+    vacation_date comes back as 'YYYY-MM-DD' from a DATE column but with a
+    time part from DATETIME / TIMESTAMP, so only the date part is matched.
+    """
+    placeholders = ", ".join(["%s"] * len(iso_dates))
+    rows = q.fetch_all(
+        "existing_vacations",
+        "SELECT id, status, vacation_date FROM sp_customer_vacations "
+        f"WHERE customer_id = %s AND vacation_date IN ({placeholders})",
+        (user_id, *iso_dates)
+    )
+    existing = {}
+    for row in rows:
+        existing.setdefault(str(row["vacation_date"])[:10], row)
+    return existing
+
+
+def _add_vacation_dates(user_id: int, vacation_dates: List[str]) -> List[str]:
+    """Mark every date as vacation; one result message per input date."""
+    messages: Dict[str, str] = {}
+    valid = _parse_dates(vacation_dates, messages, allow_past=False)
+    if not valid:
+        return [messages[d] for d in vacation_dates]
+
+    try:
+        with session() as q:
+            # Resolve customer name
+            user_row = q.fetch_one(
+                "vacation_user",
+                "SELECT first_name, last_name, store_name FROM sp_users WHERE id = %s",
+                (user_id,), prepared=True
+            )
+            if not user_row:
+                return [messages.get(d, f"User not found for user_id={user_id}.") for d in vacation_dates]
+
+            customer_name = (
+                f"{user_row.get('first_name', '')} {user_row.get('last_name', '')}".strip()
+                or user_row.get("store_name", f"User_{user_id}")
+            )
+
+            iso_dates = list(dict.fromkeys(valid.values()))
+            existing = _existing_vacations(q, user_id, iso_dates)
+
+            reactivate = [existing[d]["id"] for d in iso_dates if d in existing and existing[d]["status"] != 1]
+            new_dates = [d for d in iso_dates if d not in existing]
+
+            if reactivate or new_dates:
+                # One transaction — the pool's connections autocommit each statement
+                with q.transaction():
+                    if reactivate:
+                        # Reactivate previously cancelled entries
+                        q.execute(
+                            "reactivate_vacations",
+                            "UPDATE sp_customer_vacations SET status = 1, updated_at = NOW() "
+                            f"WHERE id IN ({', '.join(['%s'] * len(reactivate))})",
+                            tuple(reactivate)
+                        )
+                    if new_dates:
+                        # Insert new vacation records
+                        q.executemany(
+                            "insert_vacations",
+                            """
+                            INSERT INTO sp_customer_vacations
+                                (customer_name, customer_id, vacation_date, marked_by, status, created_at, updated_at)
+                            VALUES (%s, %s, %s, %s, 1, NOW(), NOW())
+                            """,
+                            [(customer_name, user_id, d, user_id) for d in new_dates]
+                        )
+
+        for vacation_date, iso in valid.items():
+            if iso not in existing:
+                messages[vacation_date] = (
+                    f"Vacation successfully marked for {vacation_date}. "
+                    "Milk delivery will be skipped on this date."
+                )
+            elif existing[iso]["status"] == 1:
+                messages[vacation_date] = f"Vacation on {vacation_date} is already marked. No changes made."
+            else:
+                messages[vacation_date] = (
+                    f"Vacation on {vacation_date} has been re-activated. "
+                    "Milk delivery will be skipped on this date."
+                )
+
+    except DatabaseUnavailable as e:
+        return [messages.get(d, str(e)) for d in vacation_dates]
+    except Exception as e:
+        for vacation_date in valid:
+            messages[vacation_date] = f"Error marking vacation for {vacation_date}: {e}"
+
+    return [messages[d] for d in vacation_dates]
+
+
+def _cancel_vacation_dates(user_id: int, vacation_dates: List[str]) -> List[str]:
+    """Cancel every date's vacation; one result message per input date."""
+    messages: Dict[str, str] = {}
+    valid = _parse_dates(vacation_dates, messages)
+    if not valid:
+        return [messages[d] for d in vacation_dates]
+
     try:
-        query = """
-            SELECT id, vacation_date, created_at
-            FROM sp_customer_vacations
-            WHERE customer_id = %s AND status = 1 AND vacation_date >= %s
-            ORDER BY vacation_date ASC
-        """
-        cursor.execute(query, (user_id, today))
-        rows = cursor.fetchall()
-        rows = _normalize_rows(rows)
-        result = _serialize(rows, "upcoming_vacations")
+        with session() as q:
+            iso_dates = list(dict.fromkeys(valid.values()))
+            existing = _existing_vacations(q, user_id, iso_dates)
+
+            cancel = [existing[d]["id"] for d in iso_dates if d in existing and existing[d]["status"] != 0]
+            if cancel:
+                q.execute(
+                    "cancel_vacations",
+                    "UPDATE sp_customer_vacations SET status = 0, updated_at = NOW() "
+                    f"WHERE id IN ({', '.join(['%s'] * len(cancel))})",
+                    tuple(cancel)
+                )
+
+        for vacation_date, iso in valid.items():
+            if iso not in existing:
+                messages[vacation_date] = f"No vacation found on {vacation_date} for your account."
+            elif existing[iso]["status"] == 0:
+                messages[vacation_date] = f"Vacation on {vacation_date} is already cancelled. No changes made."
+            else:
+                messages[vacation_date] = (
+                    f"Vacation on {vacation_date} has been cancelled. "
+                    "Your milk delivery will resume on this date."
+                )
+
+    except DatabaseUnavailable as e:
+        return [messages.get(d, str(e)) for d in vacation_dates]
     except Exception as e:
-        result = f"Error fetching upcoming vacations: {e}"
-    finally:
-        cursor.close()
-        conn.close()
+        for vacation_date in valid:
+            messages[vacation_date] = f"Error cancelling vacation for {vacation_date}: {e}"
+
+    return [messages[d] for d in vacation_dates]
 
-    return result if (result and rows) else f"No upcoming vacations found for user_id={user_id}."
+
+def _per_user(write: Callable[[int, List[str]], List[str]]):
+    """Batch adapter: args of N tool calls → N results, one *write* per user_id."""
+    def batch(calls: List[dict]) -> List[str]:
+        results = [""] * len(calls)
+        by_user: Dict[int, List[int]] = {}
+        for i, args in enumerate(calls):
+            by_user.setdefault(args["user_id"], []).append(i)
+        for user_id, indexes in by_user.items():
+            outputs = write(user_id, [calls[i]["vacation_date"] for i in indexes])
+            for i, output in zip(indexes, outputs):
+                results[i] = output
+        return results
+    return batch
 
 
 # ---------------------------------------------------------------------------
@@ -258,84 +395,7 @@ def add_vacation_date(user_id: int, vacation_date: str) -> str:
     - 'I won't be home on 2026-03-05, skip delivery'
     - 'I'm going on vacation from 5th to 8th March'
     """
-    # --- Validate date format ---
-    try:
-        vac_date = datetime.strptime(vacation_date, "%Y-%m-%d").date()
-    except ValueError:
-        return (
-            f"Invalid date format '{vacation_date}'. "
-            "Please provide the date in YYYY-MM-DD format (e.g., '2026-03-10')."
-        )
-
-    if vac_date < date.today():
-        return (
-            f"Cannot mark vacation for a past date ({vacation_date}). "
-            "Please provide today's date or a future date."
-        )
-
-    conn = get_db_connection()
-    if not conn:
-        return "Database connection failed."
-    cursor = conn.cursor(dictionary=True)
-    try:
-        # Resolve customer name
-        cursor.execute(
-            "SELECT first_name, last_name, store_name FROM sp_users WHERE id = %s",
-            (user_id,)
-        )
-        user_row = cursor.fetchone()
-        if not user_row:
-            return f"User not found for user_id={user_id}."
-
-        customer_name = (
-            f"{user_row.get('first_name', '')} {user_row.get('last_name', '')}".strip()
-            or user_row.get("store_name", f"User_{user_id}")
-        )
-
-        # Check if a vacation entry already exists for this date
-        cursor.execute(
-            "SELECT id, status FROM sp_customer_vacations "
-            "WHERE customer_id = %s AND vacation_date = %s",
-            (user_id, vacation_date)
-        )
-        existing = cursor.fetchone()
-
-        if existing:
-            if existing["status"] == 1:
-                return f"Vacation on {vacation_date} is already marked. No changes made."
-            else:
-                # Reactivate a previously cancelled entry
-                cursor.execute(
-                    "UPDATE sp_customer_vacations "
-                    "SET status = 1, updated_at = NOW() WHERE id = %s",
-                    (existing["id"],)
-                )
-                conn.commit()
-                return (
-                    f"Vacation on {vacation_date} has been re-activated. "
-                    "Milk delivery will be skipped on this date."
-                )
-
-        # Insert a new vacation record
-        cursor.execute(
-            """
-            INSERT INTO sp_customer_vacations
-                (customer_name, customer_id, vacation_date, marked_by, status, created_at, updated_at)
-            VALUES (%s, %s, %s, %s, 1, NOW(), NOW())
-            """,
-            (customer_name, user_id, vacation_date, user_id)
-        )
-        conn.commit()
-        return (
-            f"Vacation successfully marked for {vacation_date}. "
-            "Milk delivery will be skipped on this date."
-        )
-
-    except Exception as e:
-        return f"Error marking vacation for {vacation_date}: {e}"
-    finally:
-        cursor.close()
-        conn.close()
+    return _add_vacation_dates(user_id, [vacation_date])[0]
 
 
 # ---------------------------------------------------------------------------
@@ -355,47 +415,7 @@ def cancel_vacation_date(user_id: int, vacation_date: str) -> str:
     - 'I changed my plans, I'll be home on 2026-03-05'
     - 'Remove vacation for 15th'
     """
-    try:
-        datetime.strptime(vacation_date, "%Y-%m-%d")
-    except ValueError:
-        return (
-            f"Invalid date format '{vacation_date}'. "
-            "Please provide the date in YYYY-MM-DD format (e.g., '2026-03-10')."
-        )
-
-    conn = get_db_connection()
-    if not conn:
-        return "Database connection failed."
-    cursor = conn.cursor(dictionary=True)
-    try:
-        cursor.execute(
-            "SELECT id, status FROM sp_customer_vacations "
-            "WHERE customer_id = %s AND vacation_date = %s",
-            (user_id, vacation_date)
-        )
-        existing = cursor.fetchone()
-
-        if not existing:
-            return f"No vacation found on {vacation_date} for your account."
-
-        if existing["status"] == 0:
-            return f"Vacation on {vacation_date} is already cancelled. No changes made."
-
-        cursor.execute(
-            "UPDATE sp_customer_vacations SET status = 0, updated_at = NOW() WHERE id = %s",
-            (existing["id"],)
-        )
-        conn.commit()
-        return (
-            f"Vacation on {vacation_date} has been cancelled. "
-            "Your milk delivery will resume on this date."
-        )
-
-    except Exception as e:
-        return f"Error cancelling vacation for {vacation_date}: {e}"
-    finally:
-        cursor.close()
-        conn.close()
+    return _cancel_vacation_dates(user_id, [vacation_date])[0]
 
 
 # ---------------------------------------------------------------------------
@@ -410,3 +430,10 @@ ALL_SUBSCRIPTION_TOOLS = [
     add_vacation_date,
     cancel_vacation_date,
 ]
+
+# Tool name → batch implementation (args of N calls → N results), used by
+# core.tool_executor to coalesce same-tool calls of one AI message
+BATCHED_SUBSCRIPTION_TOOLS = {
+    add_vacation_date.name: _per_user(_add_vacation_dates),
+    cancel_vacation_date.name: _per_user(_cancel_vacation_dates),
+}